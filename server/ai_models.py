@@ -3,12 +3,74 @@ AI Models for Player Behavior Analysis
 Python/Django backend implementation
 """
 
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import F, Q
 from django.utils import timezone
 import json
+import uuid
 from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
 import numpy as np
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .context_trie import ContextTrie, mover_symbol
+from .decay import DecayedStats, half_life_seconds
+from .instrumentation import increment, timed
+from .leaderboard import get_leaderboard
+from .predictors import get_predictor
+from .profile_cache import CachedProfile, get_profile_cache
+from .response_stats import ResponseStats
+from .sequence_sketch import SequenceCounts
+from .similarity import get_embedding_index
+from .solver import decode, encode, is_optimal_code
+from .symmetry import canonical_cell, canonical_sequence, compact, expand, fold, sequence_space, symmetry_enabled
+
+
+# Markov transition table layout: one row per two-move context
+# (previous_move * 9 + last_move), one column per next cell.
+BOARD_CELLS = 9
+MARKOV_CONTEXTS = BOARD_CELLS * BOARD_CELLS
+MARKOV_DTYPE = np.dtype('<u4')
+MARKOV_REBUILD_CHUNK = 2000
+
+# Profile columns written by game ingestion: counters are applied as F()
+# deltas, derived fields are recomputed under the row lock.
+PROFILE_COUNTER_FIELDS = ('total_games', 'wins', 'losses', 'draws')
+PROFILE_DERIVED_FIELDS = (
+    'preferred_openings', 'sequence_counts', 'common_sequences', 'average_response_time',
+    'strategy_type', 'behavioral_embedding', 'exploitability_score', 'decayed_stats', 'last_game_at',
+)
+MOVE_EVENT_BATCH_SIZE = 500
+
+# Small-integer codes behind the MoveEvent and GameRecord enum properties
+GAME_PHASES = ('opening', 'midgame', 'endgame')
+MOVE_TYPES = ('neutral', 'offensive', 'defensive')
+RESULTS = ('ongoing', 'win', 'loss', 'draw')
+NO_BOARD = 0xFFFF  # Packed board code of a move stored without a valid board
+
+# One GameRecord move: kind = move type code << 2 | game phase code
+PACKED_MOVE_DTYPE = np.dtype([
+    ('cell', 'u1'), ('kind', 'u1'), ('board', '<u2'), ('response_time', '<u4'),
+])
+# One nonzero DailySummary transition: code = a*81 + b*9 + c
+SUMMARY_TRANSITION_DTYPE = np.dtype([('code', '<u2'), ('count', '<u4')])
+PATTERN_ANALYSIS_FIELDS = [
+    'markov_counts', 'markov_built', 'markov_symmetric', 'context_trie', 'response_stats',
+    'last_analyzed',
+]
+
+# calculate_difficulty weights of (win rate, 1 - exploitability); refit with simulate_difficulty
+DIFFICULTY_WEIGHTS = (0.6, 0.4)
+
+# Anomaly thresholds over the streaming response statistics
+CONSISTENT_TIMING_STD = 50  # ms
+TIMING_SHIFT_THRESHOLD = 1.5  # EWMA drift from the long-run mean, in std units
+
+# Players with fewer games borrow transitions from their nearest neighbours
+WARM_START_GAMES = 5
+WARM_START_NEIGHBOURS = 5
 
 
 class PlayerBehaviorProfile(models.Model):
@@ -21,7 +83,8 @@ class PlayerBehaviorProfile(models.Model):
     
     # Pattern data stored as JSON
     preferred_openings = models.JSONField(default=list)  # List of first moves
-    common_sequences = models.JSONField(default=dict)  # {sequence: frequency}
+    sequence_counts = models.BinaryField(default=bytes)  # Packed SequenceCounts, fixed size
+    common_sequences = models.JSONField(default=dict)  # Legacy {sequence: frequency}, emptied once converted
     average_response_time = models.FloatField(default=0.0)
     strategy_type = models.CharField(
         max_length=20,
@@ -39,6 +102,9 @@ class PlayerBehaviorProfile(models.Model):
     # Exploitability metrics
     exploitability_score = models.FloatField(default=0.0)  # 0-100, higher = more exploitable
     
+    # Packed DecayedStats: results, response time and openings weighted by recency
+    decayed_stats = models.BinaryField(default=bytes)
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     last_updated = models.DateTimeField(auto_now=True)
@@ -49,37 +115,90 @@ class PlayerBehaviorProfile(models.Model):
         indexes = [
             models.Index(fields=['player_name']),
             models.Index(fields=['last_updated']),
+            models.Index(fields=['-wins', 'losses'], name='profile_wins_rank_idx'),
         ]
     
     def __str__(self):
         return f"{self.player_name} ({self.total_games} games, {self.wins}W/{self.losses}L)"
+    
+    def get_sequence_counts(self) -> SequenceCounts:
+        """Decoded sequence counts, converting a legacy common_sequences dict on the fly"""
+        if self.sequence_counts:
+            return SequenceCounts.from_bytes(self.sequence_counts)
+        return SequenceCounts.from_legacy(self.common_sequences or {})
+    
+    def set_sequence_counts(self, counts: SequenceCounts):
+        self.sequence_counts = counts.to_bytes()
+        self.common_sequences = {}
+    
+    def get_decayed_stats(self) -> DecayedStats:
+        """Decoded decayed stats, seeded from the all-time fields on legacy rows"""
+        if self.decayed_stats or not self.total_games:
+            return DecayedStats.from_bytes(self.decayed_stats)
+        stats = DecayedStats()
+        stats.updated_at = (self.last_game_at or timezone.now()).timestamp()
+        stats.games = float(self.total_games)
+        stats.wins, stats.losses, stats.draws = float(self.wins), float(self.losses), float(self.draws)
+        stats.responses = float(self.total_games) if self.average_response_time else 0.0
+        stats.response_mean = self.average_response_time
+        for cell, count in Counter(self.preferred_openings).items():
+            if 0 <= cell < BOARD_CELLS:
+                stats.openings[cell] = float(count)
+        return stats
+    
+    def set_decayed_stats(self, stats: DecayedStats):
+        self.decayed_stats = stats.to_bytes()
+
+
+def _choices(names: Tuple[str, ...]) -> List[Tuple[int, str]]:
+    return [(code, name.title()) for code, name in enumerate(names)]
+
+
+def _enum_code(names: Tuple[str, ...], name: Optional[str], default: str) -> int:
+    return names.index(name) if name in names else names.index(default)
+
+
+def move_events_enabled() -> bool:
+    """Whether ingestion also writes one MoveEvent row per move next to the game's record"""
+    return getattr(settings, 'BEHAVIOR_STORE_MOVE_EVENTS', False)
+
+
+def games_filter(games: Iterable[Tuple[int, str]]) -> Q:
+    """Match exactly these (player_id, game_id) pairs; game ids are only unique per player"""
+    game_ids = defaultdict(set)
+    for player_id, game_id in games:
+        game_ids[player_id].add(game_id)
+    return reduce(or_, (Q(player_id=player_id, game_id__in=ids) for player_id, ids in game_ids.items()))
+
+
+def board_code(board_state: Optional[List[str]]) -> Optional[int]:
+    """Base-3 code of a board, None if it is missing or malformed"""
+    if not board_state:
+        return None
+    try:
+        return encode(board_state)
+    except (ValueError, TypeError):
+        return None
 
 
 class MoveEvent(models.Model):
-    """Individual move event for analysis"""
+    """Individual move event for analysis
+    
+    The board and the enum columns are stored as small integers; the
+    board_state, game_phase, move_type and result properties decode them.
+    Ingestion only writes these rows with BEHAVIOR_STORE_MOVE_EVENTS;
+    every analysis reads the packed GameRecord instead.
+    """
     game_id = models.CharField(max_length=255, db_index=True)
     player = models.ForeignKey(PlayerBehaviorProfile, on_delete=models.CASCADE, related_name='moves')
-    move_index = models.IntegerField()  # 0-8
-    board_state = models.JSONField()  # Board state before move
+    move_index = models.PositiveSmallIntegerField()  # 0-8
+    board_code = models.PositiveSmallIntegerField(null=True)  # Base-3 board before move
     timestamp = models.IntegerField()  # ms since game start
     response_time = models.IntegerField()  # ms since last move
-    game_phase = models.CharField(max_length=20, choices=[
-        ('opening', 'Opening'),
-        ('midgame', 'Midgame'),
-        ('endgame', 'Endgame')
-    ])
-    move_type = models.CharField(max_length=20, choices=[
-        ('offensive', 'Offensive'),
-        ('defensive', 'Defensive'),
-        ('neutral', 'Neutral')
-    ])
-    move_number = models.IntegerField()
-    result = models.CharField(max_length=20, choices=[
-        ('win', 'Win'),
-        ('loss', 'Loss'),
-        ('draw', 'Draw'),
-        ('ongoing', 'Ongoing')
-    ], default='ongoing')
+    phase_code = models.PositiveSmallIntegerField(choices=_choices(GAME_PHASES), default=1)
+    type_code = models.PositiveSmallIntegerField(choices=_choices(MOVE_TYPES), default=0)
+    move_number = models.PositiveSmallIntegerField()
+    result_code = models.PositiveSmallIntegerField(choices=_choices(RESULTS), default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -87,19 +206,230 @@ class MoveEvent(models.Model):
         indexes = [
             models.Index(fields=['game_id']),
             models.Index(fields=['player', 'created_at']),
+            models.Index(fields=['player', 'game_id', 'move_number']),
         ]
+    
+    @property
+    def board_state(self) -> List[str]:
+        return decode(self.board_code) if self.board_code is not None else []
+    
+    @board_state.setter
+    def board_state(self, value: Optional[List[str]]):
+        self.board_code = board_code(value)
+    
+    @property
+    def game_phase(self) -> str:
+        return GAME_PHASES[self.phase_code]
+    
+    @game_phase.setter
+    def game_phase(self, value: str):
+        self.phase_code = _enum_code(GAME_PHASES, value, 'midgame')
+    
+    @property
+    def move_type(self) -> str:
+        return MOVE_TYPES[self.type_code]
+    
+    @move_type.setter
+    def move_type(self, value: str):
+        self.type_code = _enum_code(MOVE_TYPES, value, 'neutral')
+    
+    @property
+    def result(self) -> str:
+        return RESULTS[self.result_code]
+    
+    @result.setter
+    def result(self, value: str):
+        self.result_code = _enum_code(RESULTS, value, 'ongoing')
+
+
+class GameRecord(models.Model):
+    """A whole game's moves packed into one row, for full-history scans"""
+    player = models.ForeignKey(PlayerBehaviorProfile, on_delete=models.CASCADE, related_name='games')
+    game_id = models.CharField(max_length=255, db_index=True)
+    result_code = models.PositiveSmallIntegerField(choices=_choices(RESULTS), default=0)
+    packed_moves = models.BinaryField(default=bytes)  # PACKED_MOVE_DTYPE records in move order
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'game_records'
+        indexes = [
+            models.Index(fields=['player', 'id']),
+        ]
+    
+    @classmethod
+    def from_events(cls, events: List[MoveEvent]) -> 'GameRecord':
+        """Unsaved record for one game's move events"""
+        events = sorted(events, key=lambda e: e.move_number)
+        return cls(
+            player_id=events[0].player_id,
+            game_id=events[0].game_id,
+            result_code=events[-1].result_code,
+            packed_moves=pack_moves(
+                [e.move_index for e in events],
+                [e.type_code << 2 | e.phase_code for e in events],
+                [NO_BOARD if e.board_code is None else e.board_code for e in events],
+                [max(e.response_time, 0) for e in events],
+            ),
+        )
+    
+    @classmethod
+    def rebuild(cls, games: List[Tuple[int, str]]) -> int:
+        """Re-pack the records of (player_id, game_id) pairs from their move events; returns records written"""
+        if not games:
+            return 0
+        by_game = defaultdict(list)
+        for event in MoveEvent.objects.filter(games_filter(games)).order_by('id'):
+            by_game[(event.player_id, event.game_id)].append(event)
+        cls.objects.filter(games_filter(games)).delete()
+        cls.objects.bulk_create(
+            [cls.from_events(events) for events in by_game.values()], batch_size=MOVE_EVENT_BATCH_SIZE
+        )
+        return len(by_game)
+    
+    @property
+    def moves(self) -> np.ndarray:
+        """Structured PACKED_MOVE_DTYPE view of the moves, decoded on access"""
+        return unpack_moves(self.packed_moves)
+    
+    @property
+    def move_indices(self) -> np.ndarray:
+        return self.moves['cell']
+    
+    @property
+    def response_times(self) -> np.ndarray:
+        return self.moves['response_time']
+    
+    @property
+    def board_states(self) -> List[List[str]]:
+        return [decode(code) if code != NO_BOARD else [] for code in self.moves['board'].tolist()]
+    
+    @property
+    def result(self) -> str:
+        return RESULTS[self.result_code]
+
+
+def pack_moves(cells, kinds, boards, response_times) -> bytes:
+    moves = np.empty(len(cells), dtype=PACKED_MOVE_DTYPE)
+    moves['cell'] = cells
+    moves['kind'] = kinds
+    moves['board'] = boards
+    moves['response_time'] = response_times
+    return moves.tobytes()
+
+
+def unpack_moves(data) -> np.ndarray:
+    return np.frombuffer(bytes(data), dtype=PACKED_MOVE_DTYPE) if data else np.zeros(0, PACKED_MOVE_DTYPE)
+
+
+class DailySummary(models.Model):
+    """One player's games from one day, rolled up once their raw rows expire"""
+    player = models.ForeignKey(PlayerBehaviorProfile, on_delete=models.CASCADE, related_name='daily_summaries')
+    day = models.DateField()
+    games = models.IntegerField(default=0)
+    wins = models.IntegerField(default=0)
+    losses = models.IntegerField(default=0)
+    draws = models.IntegerField(default=0)
+    moves = models.IntegerField(default=0)
+    # Welford state of the positive response times
+    response_count = models.IntegerField(default=0)
+    response_mean = models.FloatField(default=0.0)
+    response_m2 = models.FloatField(default=0.0)
+    optimal_moves = models.IntegerField(default=0)
+    scored_moves = models.IntegerField(default=0)
+    transition_counts = models.BinaryField(default=bytes)  # Sparse SUMMARY_TRANSITION_DTYPE, unfolded
+    
+    class Meta:
+        db_table = 'daily_summaries'
+        constraints = [
+            models.UniqueConstraint(fields=['player', 'day'], name='daily_summary_player_day'),
+        ]
+    
+    def get_transitions(self) -> np.ndarray:
+        """Dense a*81 + b*9 + c transition counts"""
+        table = np.zeros(MARKOV_CONTEXTS * BOARD_CELLS, dtype=MARKOV_DTYPE)
+        if self.transition_counts:
+            entries = np.frombuffer(bytes(self.transition_counts), dtype=SUMMARY_TRANSITION_DTYPE)
+            table[entries['code']] = entries['count']
+        return table
+    
+    def set_transitions(self, table: np.ndarray):
+        codes = np.flatnonzero(table)
+        entries = np.empty(len(codes), dtype=SUMMARY_TRANSITION_DTYPE)
+        entries['code'] = codes
+        entries['count'] = table[codes]
+        self.transition_counts = entries.tobytes()
+    
+    @classmethod
+    def transitions_for(cls, player_ids: List[int]) -> np.ndarray:
+        """Summed transitions of each player's summaries, players x 729 in the given order"""
+        row_of = {player_id: i for i, player_id in enumerate(player_ids)}
+        totals = np.zeros((len(player_ids), MARKOV_CONTEXTS * BOARD_CELLS), dtype=MARKOV_DTYPE)
+        for player_id, packed in cls.objects.filter(player_id__in=player_ids).values_list(
+            'player_id', 'transition_counts'
+        ).iterator(chunk_size=MARKOV_REBUILD_CHUNK):
+            if packed:
+                entries = np.frombuffer(bytes(packed), dtype=SUMMARY_TRANSITION_DTYPE)
+                totals[row_of[player_id], entries['code']] += entries['count']
+        return totals
 
 
 class PatternAnalysis(models.Model):
     """Stored pattern analysis results"""
     player = models.OneToOneField(PlayerBehaviorProfile, on_delete=models.CASCADE)
-    markov_chain = models.JSONField(default=dict)  # Transition probabilities
+    markov_counts = models.BinaryField(default=bytes)  # 81x9 uint32 transition counts
+    markov_built = models.BooleanField(default=False)
+    markov_symmetric = models.BooleanField(default=False)  # Folded by symmetry, 105 counts stored
+    context_trie = models.BinaryField(default=bytes)  # Packed ContextTrie
+    response_stats = models.BinaryField(default=bytes)  # Packed ResponseStats
     move_probabilities = models.JSONField(default=dict)  # Position probabilities
     anomaly_flags = models.JSONField(default=list)  # List of flagged anomalies
     last_analyzed = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'pattern_analyses'
+    
+    def get_markov_table(self) -> np.ndarray:
+        """Decode the transition count table into a writable 81x9 array"""
+        if not self.markov_counts:
+            return np.zeros((MARKOV_CONTEXTS, BOARD_CELLS), dtype=MARKOV_DTYPE)
+        table = np.frombuffer(bytes(self.markov_counts), dtype=MARKOV_DTYPE)
+        if self.markov_symmetric:
+            return expand(table, (MARKOV_CONTEXTS, BOARD_CELLS))
+        return table.reshape(MARKOV_CONTEXTS, BOARD_CELLS).copy()
+    
+    def get_markov_row(self, context: int) -> np.ndarray:
+        """Decode a single context row without materializing the whole table"""
+        if not self.markov_counts:
+            return np.zeros(BOARD_CELLS, dtype=MARKOV_DTYPE)
+        if self.markov_symmetric:
+            return self.get_markov_table()[context]
+        return np.frombuffer(
+            bytes(self.markov_counts), dtype=MARKOV_DTYPE,
+            count=BOARD_CELLS, offset=context * BOARD_CELLS * MARKOV_DTYPE.itemsize
+        )
+    
+    def set_markov_table(self, table: np.ndarray, symmetric: bool = False):
+        """Encode an 81x9 count table back into the binary field, compacted if folded"""
+        table = np.ascontiguousarray(table, dtype=MARKOV_DTYPE)
+        self.markov_counts = (compact(table) if symmetric else table).tobytes()
+        self.markov_built = True
+        self.markov_symmetric = symmetric
+    
+    def markov_current(self) -> bool:
+        """Whether the stored table exists and matches the symmetry setting"""
+        return self.markov_built and self.markov_symmetric == symmetry_enabled()
+    
+    def get_context_trie(self) -> ContextTrie:
+        return ContextTrie.from_bytes(self.context_trie)
+    
+    def set_context_trie(self, trie: ContextTrie):
+        self.context_trie = trie.to_bytes()
+    
+    def get_response_stats(self) -> ResponseStats:
+        return ResponseStats.from_bytes(self.response_stats)
+    
+    def set_response_stats(self, stats: ResponseStats):
+        self.response_stats = stats.to_bytes()
 
 
 class BehaviorAnalyzer:
@@ -108,9 +438,76 @@ class BehaviorAnalyzer:
     @staticmethod
     def update_profile(player_name: str, game_data: Dict) -> PlayerBehaviorProfile:
         """Update player profile with new game data"""
-        profile, created = PlayerBehaviorProfile.objects.get_or_create(
-            player_name=player_name
-        )
+        return BehaviorAnalyzer._apply_games(player_name, [game_data])
+    
+    @staticmethod
+    def record_games(games: List[Dict]) -> Dict[str, PlayerBehaviorProfile]:
+        """Ingest a batch of games, one transaction per player"""
+        games_by_player = defaultdict(list)
+        for game_data in games:
+            games_by_player[game_data['playerName']].append(game_data)
+        
+        return {
+            player_name: BehaviorAnalyzer._apply_games(player_name, player_games)
+            for player_name, player_games in games_by_player.items()
+        }
+    
+    @staticmethod
+    @timed('apply_games')
+    def _apply_games(player_name: str, games: List[Dict]) -> PlayerBehaviorProfile:
+        """Fold games into one player's profile and persist their moves"""
+        with transaction.atomic():
+            profile, created = PlayerBehaviorProfile.objects.select_for_update().get_or_create(
+                player_name=player_name
+            )
+            counters_before = {field: getattr(profile, field) for field in PROFILE_COUNTER_FIELDS}
+            
+            move_events = []
+            game_records = []
+            for game_data in games:
+                BehaviorAnalyzer._apply_game(profile, game_data)
+                events = BehaviorAnalyzer._build_move_events(profile, game_data)
+                if events:
+                    move_events.extend(events)
+                    game_records.append(GameRecord.from_events(events))
+            
+            profile.last_game_at = timezone.now()
+            profile.last_updated = profile.last_game_at
+            
+            # Counters as deltas so concurrent writers never lose a game
+            updates = {
+                field: F(field) + (getattr(profile, field) - counters_before[field])
+                for field in PROFILE_COUNTER_FIELDS
+            }
+            updates.update({field: getattr(profile, field) for field in PROFILE_DERIVED_FIELDS})
+            PlayerBehaviorProfile.objects.filter(pk=profile.pk).update(
+                last_updated=profile.last_updated, **updates
+            )
+            
+            transaction.on_commit(lambda: BehaviorAnalyzer._after_commit(profile))
+            
+            if move_events:
+                if move_events_enabled():
+                    MoveEvent.objects.bulk_create(move_events, batch_size=MOVE_EVENT_BATCH_SIZE)
+                GameRecord.objects.bulk_create(game_records, batch_size=MOVE_EVENT_BATCH_SIZE)
+                BehaviorAnalyzer._update_pattern_analysis(
+                    profile, [game_data.get('moves', []) for game_data in games]
+                )
+        
+        return profile
+    
+    @staticmethod
+    def _after_commit(profile: PlayerBehaviorProfile):
+        """Propagate a committed profile write to the read-side structures"""
+        get_profile_cache().invalidate(profile.player_name)
+        get_leaderboard().record(profile)
+        get_embedding_index().update(profile.player_name, profile.behavioral_embedding)
+    
+    @staticmethod
+    def _apply_game(profile: PlayerBehaviorProfile, game_data: Dict):
+        """Update in-memory profile fields with one game"""
+        # Before the counters move, so a legacy row is seeded without this game
+        BehaviorAnalyzer._update_decayed_stats(profile, game_data)
         
         # Update game counts
         profile.total_games += 1
@@ -128,28 +525,60 @@ class BehaviorAnalyzer:
             BehaviorAnalyzer._update_strategy_type(profile, moves)
             BehaviorAnalyzer._update_embedding(profile, moves)
             BehaviorAnalyzer._calculate_exploitability(profile)
+    
+    @staticmethod
+    def _update_decayed_stats(profile: PlayerBehaviorProfile, game_data: Dict):
+        """Fold one game into the recency-weighted aggregates"""
+        moves = game_data.get('moves', [])
+        first_moves = [m['moveIndex'] for m in moves if m.get('moveNumber') == 1]
+        opening = first_moves[0] if first_moves else None
+        if opening is not None and symmetry_enabled():
+            opening = canonical_cell(opening)
         
-        profile.last_game_at = timezone.now()
-        profile.save()
-        
-        return profile
+        stats = profile.get_decayed_stats()
+        stats.add_game(
+            timezone.now().timestamp(), half_life_seconds(), game_data['result'], opening,
+            [m['responseTime'] for m in moves if m.get('responseTime', 0) > 0],
+        )
+        profile.set_decayed_stats(stats)
+    
+    @staticmethod
+    def _build_move_events(profile: PlayerBehaviorProfile, game_data: Dict) -> List[MoveEvent]:
+        """Unsaved MoveEvent rows for one game's moves"""
+        game_id = game_data.get('gameId') or uuid.uuid4().hex
+        result = game_data['result'] if game_data['result'] in ('win', 'loss') else 'draw'
+        return [
+            MoveEvent(
+                game_id=game_id,
+                player=profile,
+                move_index=m['moveIndex'],
+                board_state=m.get('boardState', []),
+                timestamp=m.get('timestamp', 0),
+                response_time=m.get('responseTime', 0),
+                game_phase=m.get('gamePhase', 'midgame'),
+                move_type=m.get('moveType', 'neutral'),
+                move_number=m.get('moveNumber', number),
+                result=result,
+            )
+            for number, m in enumerate(game_data.get('moves', []), start=1)
+        ]
     
     @staticmethod
     def _update_patterns(profile: PlayerBehaviorProfile, moves: List[Dict]):
         """Update move patterns"""
         # Preferred openings
         first_moves = [m['moveIndex'] for m in moves if m.get('moveNumber') == 1]
+        if symmetry_enabled():
+            first_moves = [canonical_cell(cell) for cell in first_moves]
         if first_moves:
             profile.preferred_openings.extend(first_moves)
             # Keep last 50
             profile.preferred_openings = profile.preferred_openings[-50:]
         
         # Common sequences
-        sequences = BehaviorAnalyzer._extract_sequences(moves)
-        current_sequences = profile.common_sequences or {}
-        for seq, count in sequences.items():
-            current_sequences[seq] = current_sequences.get(seq, 0) + count
-        profile.common_sequences = current_sequences
+        sequence_counts = profile.get_sequence_counts()
+        sequence_counts.add_sequences(BehaviorAnalyzer._extract_sequences(moves))
+        profile.set_sequence_counts(sequence_counts)
         
         # Average response time
         response_times = [m['responseTime'] for m in moves if m.get('responseTime', 0) > 0]
@@ -162,10 +591,14 @@ class BehaviorAnalyzer:
     
     @staticmethod
     def _extract_sequences(moves: List[Dict], length: int = 3) -> Dict[str, int]:
-        """Extract move sequences"""
+        """Extract move sequences, in canonical orientation when symmetry folding is on"""
+        canonical = length == 3 and symmetry_enabled()
         sequences = {}
         for i in range(len(moves) - length + 1):
-            seq = '-'.join(str(moves[i+j]['moveIndex']) for j in range(length))
+            cells = [moves[i+j]['moveIndex'] for j in range(length)]
+            if canonical:
+                cells = canonical_sequence(cells)
+            seq = '-'.join(str(cell) for cell in cells)
             sequences[seq] = sequences.get(seq, 0) + 1
         return sequences
     
@@ -216,123 +649,345 @@ class BehaviorAnalyzer:
     @staticmethod
     def _calculate_exploitability(profile: PlayerBehaviorProfile):
         """Calculate how exploitable/predictable the player is"""
-        sequences = profile.common_sequences or {}
-        if not sequences:
-            profile.exploitability_score = 0.0
-            return
-        
-        # More repetition = more exploitable
-        total_sequences = sum(sequences.values())
-        unique_sequences = len(sequences)
-        
-        if total_sequences == 0:
-            profile.exploitability_score = 0.0
-            return
-        
-        # Diversity ratio (lower = more exploitable)
-        diversity = unique_sequences / total_sequences
-        profile.exploitability_score = (1 - diversity) * 100
+        # Lower sequence entropy = more repetition = more exploitable
+        profile.exploitability_score = profile.get_sequence_counts().exploitability(sequence_space())
     
     @staticmethod
     def predict_next_move(player_name: str, current_board: List[str], 
                          move_history: List[int]) -> Optional[int]:
-        """Predict player's next move using Markov chain"""
-        try:
-            profile = PlayerBehaviorProfile.objects.get(player_name=player_name)
-        except PlayerBehaviorProfile.DoesNotExist:
+        """Most likely next move under the configured predictor"""
+        distribution = BehaviorAnalyzer.predict_distribution(player_name, current_board, move_history)
+        return int(distribution.argmax()) if distribution is not None else None
+    
+    @staticmethod
+    @timed('predict_next_move')
+    def predict_distribution(player_name: str, current_board: List[str],
+                             move_history: List[int]) -> Optional[np.ndarray]:
+        """Probability of each cell being the player's next move, None without a model"""
+        cached = BehaviorAnalyzer.get_cached_profile(player_name)
+        if cached is None:
             return None
+        return BehaviorAnalyzer._distribution_from(
+            cached, current_board, move_history,
+            lambda: BehaviorAnalyzer._neighbour_table(player_name)
+        )
+    
+    @staticmethod
+    @timed('predict_batch')
+    def predict_batch(items: List[Tuple[str, List[str], List[int]]]) -> List[Optional[np.ndarray]]:
+        """predict_distribution() for many (player, board, history) items
+        
+        Profiles missing from the cache are fetched in one query. New players
+        get no neighbour warm start here.
+        """
+        cached = BehaviorAnalyzer.get_cached_profiles([name for name, _, _ in items])
+        return get_predictor().distributions(
+            [cached.get(name) for name, _, _ in items],
+            [board for _, board, _ in items],
+            [history for _, _, history in items],
+        )
+    
+    @staticmethod
+    def _distribution_from(cached: CachedProfile, current_board: List[str], move_history: List[int],
+                           warm_start: Optional[Callable[[], np.ndarray]] = None) -> Optional[np.ndarray]:
+        """Distribution from an already loaded profile; pure in-memory compute"""
+        if cached.profile.total_games >= WARM_START_GAMES:
+            warm_start = None
+        return get_predictor().distribution(cached, current_board, move_history, warm_start)
+    
+    @staticmethod
+    def similar_players(player_name: str, k: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """Most similar players by behavioral embedding, None if not indexed"""
+        return get_embedding_index().similar(player_name, k)
+    
+    @staticmethod
+    @timed('warm_start')
+    def _neighbour_table(player_name: str) -> np.ndarray:
+        """Pooled transition tables of the player's nearest neighbours, every context at once"""
+        pooled = np.zeros((MARKOV_CONTEXTS, BOARD_CELLS), dtype=np.int64)
+        for name, _ in BehaviorAnalyzer.similar_players(player_name, WARM_START_NEIGHBOURS) or []:
+            neighbour = BehaviorAnalyzer.get_cached_profile(name)
+            if neighbour is not None:
+                pooled += neighbour.markov_table
+        return pooled
+    
+    @staticmethod
+    def get_cached_profile(player_name: str) -> Optional[CachedProfile]:
+        """Profile with its decoded Markov table, served through the profile cache"""
+        return get_profile_cache().get_or_load(player_name, BehaviorAnalyzer._load_profile)
+    
+    @staticmethod
+    def get_cached_profiles(player_names: List[str]) -> Dict[str, CachedProfile]:
+        """Cached profiles of many players; unknown players are left out"""
+        return get_profile_cache().get_or_load_many(player_names, BehaviorAnalyzer._load_profiles)
+    
+    @staticmethod
+    @timed('profile_load')
+    def _load_profile(player_name: str) -> Optional[CachedProfile]:
+        """Fetch and decode a profile and its pattern analysis for the cache"""
+        pattern_analysis = PatternAnalysis.objects.select_related('player').filter(
+            player__player_name=player_name
+        ).first()
+        if pattern_analysis is None:
+            try:
+                profile = PlayerBehaviorProfile.objects.get(player_name=player_name)
+            except PlayerBehaviorProfile.DoesNotExist:
+                return None
+            pattern_analysis, _ = PatternAnalysis.objects.get_or_create(player=profile)
+        return BehaviorAnalyzer._cached_profile(pattern_analysis.player, pattern_analysis)
+    
+    @staticmethod
+    @timed('profile_load_many')
+    def _load_profiles(player_names: List[str]) -> Dict[str, CachedProfile]:
+        """Fetch many profiles with their pattern analyses in one query"""
+        profiles = PlayerBehaviorProfile.objects.select_related('patternanalysis').in_bulk(
+            player_names, field_name='player_name'
+        )
+        loaded = {}
+        for name, profile in profiles.items():
+            pattern_analysis = getattr(profile, 'patternanalysis', None)
+            if pattern_analysis is None:
+                pattern_analysis, _ = PatternAnalysis.objects.get_or_create(player=profile)
+            loaded[name] = BehaviorAnalyzer._cached_profile(profile, pattern_analysis)
+        return loaded
+    
+    @staticmethod
+    def _cached_profile(profile: PlayerBehaviorProfile, pattern_analysis: PatternAnalysis) -> CachedProfile:
+        """Decode a fetched profile for the cache, seeding stale pattern state first"""
+        # Seed legacy rows from stored history once, and re-seed after the symmetry setting changes
+        markov_stale = not pattern_analysis.markov_current()
+        if markov_stale or not pattern_analysis.response_stats or not pattern_analysis.context_trie:
+            if markov_stale:
+                pattern_analysis.set_markov_table(
+                    BehaviorAnalyzer._rebuild_markov_table(profile), symmetry_enabled()
+                )
+            if not pattern_analysis.response_stats:
+                pattern_analysis.set_response_stats(BehaviorAnalyzer._rebuild_response_stats(profile))
+            if not pattern_analysis.context_trie:
+                pattern_analysis.set_context_trie(BehaviorAnalyzer._rebuild_context_trie(profile))
+            pattern_analysis.save(update_fields=PATTERN_ANALYSIS_FIELDS)
         
-        # Get or create pattern analysis
+        return CachedProfile(
+            profile=profile,
+            pattern_analysis=pattern_analysis,
+            markov_table=pattern_analysis.get_markov_table(),
+            openings=BehaviorAnalyzer._openings(profile),
+            response_stats=pattern_analysis.get_response_stats(),
+            context_trie=pattern_analysis.get_context_trie(),
+        )
+    
+    @staticmethod
+    def _openings(profile: PlayerBehaviorProfile) -> Counter:
+        """Opening weights favouring recent games"""
+        stats = profile.get_decayed_stats()
+        return Counter({cell: weight for cell, weight in enumerate(stats.openings) if weight > 0})
+    
+    @staticmethod
+    def _count_transitions(table: np.ndarray, move_indices: List[int]):
+        """Add the (prev, last) -> next transitions of one game to a count table"""
+        if len(move_indices) < 3:
+            return
+        moves = np.asarray(move_indices, dtype=np.intp)
+        contexts = moves[:-2] * BOARD_CELLS + moves[1:-1]
+        np.add.at(table, (contexts, moves[2:]), 1)
+    
+    @staticmethod
+    def _update_pattern_analysis(profile: PlayerBehaviorProfile, games_moves: List[List[Dict]]):
+        """Fold newly persisted games into the Markov table, context trie and response statistics"""
         pattern_analysis, _ = PatternAnalysis.objects.get_or_create(player=profile)
+        ordered_games = [
+            sorted(moves, key=lambda m: m.get('moveNumber', 0)) for moves in games_moves
+        ]
         
-        # Build Markov chain if not exists
-        if not pattern_analysis.markov_chain:
-            BehaviorAnalyzer._build_markov_chain(pattern_analysis, profile)
+        # Legacy rows are rebuilt, and the rebuild already sees the moves just persisted
+        symmetric = symmetry_enabled()
+        if pattern_analysis.markov_current():
+            table = pattern_analysis.get_markov_table()
+            for moves in ordered_games:
+                BehaviorAnalyzer._count_transitions(table, [m['moveIndex'] for m in moves])
+            if symmetric:
+                table = fold(table)
+        else:
+            table = BehaviorAnalyzer._rebuild_markov_table(profile)
+        pattern_analysis.set_markov_table(table, symmetric)
         
-        # Predict based on recent moves
-        if len(move_history) >= 2:
-            last_two = '-'.join(map(str, move_history[-2:]))
-            transitions = pattern_analysis.markov_chain.get(last_two, {})
-            
-            if transitions:
-                # Get most likely next move
-                next_move = max(transitions.items(), key=lambda x: x[1])
-                move_index = int(next_move[0])
-                
-                # Check if move is valid
-                if current_board[move_index] == '':
-                    return move_index
+        if pattern_analysis.context_trie:
+            trie = pattern_analysis.get_context_trie()
+            for moves in ordered_games:
+                if moves:
+                    first = moves[0]
+                    trie.add_game([m['moveIndex'] for m in moves], mover_symbol(first.get('boardState'), first['moveIndex']))
+        else:
+            trie = BehaviorAnalyzer._rebuild_context_trie(profile)
+        pattern_analysis.set_context_trie(trie)
         
-        # Fallback: use preferred openings or common patterns
-        if move_history:
-            # Check preferred openings
-            openings = profile.preferred_openings[-10:]  # Last 10
-            if openings:
-                most_common = Counter(openings).most_common(1)[0][0]
-                if current_board[most_common] == '':
-                    return most_common
+        if pattern_analysis.response_stats:
+            stats = pattern_analysis.get_response_stats()
+            for moves in ordered_games:
+                for m in moves:
+                    BehaviorAnalyzer._update_response_stats(
+                        stats, m.get('responseTime', 0), board_code(m.get('boardState')), m['moveIndex']
+                    )
+        else:
+            stats = BehaviorAnalyzer._rebuild_response_stats(profile)
+        pattern_analysis.set_response_stats(stats)
         
-        return None
+        pattern_analysis.save(update_fields=PATTERN_ANALYSIS_FIELDS)
     
     @staticmethod
     def _build_markov_chain(pattern_analysis: PatternAnalysis, 
                            profile: PlayerBehaviorProfile):
-        """Build Markov chain transition probabilities"""
-        moves = MoveEvent.objects.filter(player=profile).order_by('created_at')
+        """Rebuild and store the transition count table"""
+        pattern_analysis.set_markov_table(BehaviorAnalyzer._rebuild_markov_table(profile), symmetry_enabled())
+        pattern_analysis.save(update_fields=PATTERN_ANALYSIS_FIELDS)
+    
+    @staticmethod
+    @timed('markov_rebuild')
+    def _rebuild_markov_table(profile: PlayerBehaviorProfile) -> np.ndarray:
+        """Rolled-up transitions plus one streaming pass over the remaining game records, folded if enabled"""
+        rows = GameRecord.objects.filter(player=profile).values_list(
+            'packed_moves', flat=True
+        ).iterator(chunk_size=MARKOV_REBUILD_CHUNK)
         
-        transitions = defaultdict(lambda: defaultdict(int))
+        table = DailySummary.transitions_for([profile.pk])[0].reshape(MARKOV_CONTEXTS, BOARD_CELLS)
+        batch = []
+        for packed_moves in rows:
+            batch.append(bytes(packed_moves))
+            if len(batch) >= MARKOV_REBUILD_CHUNK:
+                BehaviorAnalyzer._count_packed_transitions(table, batch)
+                batch = []
+        BehaviorAnalyzer._count_packed_transitions(table, batch)
         
-        for move in moves:
-            if move.move_number > 1:
-                # Get previous moves in same game
-                prev_moves = MoveEvent.objects.filter(
-                    game_id=move.game_id,
-                    move_number__lt=move.move_number
-                ).order_by('move_number')
-                
-                if len(prev_moves) >= 2:
-                    sequence = '-'.join(str(m.move_index) for m in prev_moves[-2:])
-                    transitions[sequence][str(move.move_index)] += 1
+        return fold(table) if symmetry_enabled() else table
+    
+    @staticmethod
+    def _count_packed_transitions(table: np.ndarray, packed_games: List[bytes]):
+        """Add the transitions of many packed games to a count table in one bincount"""
+        cells = unpack_moves(b''.join(packed_games))['cell'].astype(np.intp)
+        if len(cells) < 3:
+            return
+        lengths = [len(packed) // PACKED_MOVE_DTYPE.itemsize for packed in packed_games]
+        games = np.repeat(np.arange(len(packed_games)), lengths)
+        same_game = games[2:] == games[:-2]
+        codes = (cells[:-2] * BOARD_CELLS + cells[1:-1]) * BOARD_CELLS + cells[2:]
+        table += np.bincount(
+            codes[same_game], minlength=MARKOV_CONTEXTS * BOARD_CELLS
+        ).reshape(MARKOV_CONTEXTS, BOARD_CELLS).astype(MARKOV_DTYPE)
+    
+    @staticmethod
+    def _new_context_trie() -> ContextTrie:
+        return ContextTrie(
+            order=getattr(settings, 'BEHAVIOR_PPM_ORDER', 4),
+            node_limit=getattr(settings, 'BEHAVIOR_PPM_MAX_NODES', 512),
+        )
+    
+    @staticmethod
+    @timed('context_trie_rebuild')
+    def _rebuild_context_trie(profile: PlayerBehaviorProfile) -> ContextTrie:
+        """Replay stored games in arrival order into a fresh context trie
+
+        Games already rolled up into daily summaries are not replayed.
+        """
+        rows = GameRecord.objects.filter(player=profile).order_by('id').values_list(
+            'packed_moves', flat=True
+        ).iterator(chunk_size=MARKOV_REBUILD_CHUNK)
         
-        # Convert to probabilities
-        markov_chain = {}
-        for seq, next_moves in transitions.items():
-            total = sum(next_moves.values())
-            markov_chain[seq] = {
-                move: count / total 
-                for move, count in next_moves.items()
-            }
+        trie = BehaviorAnalyzer._new_context_trie()
+        for packed_moves in rows:
+            moves = unpack_moves(packed_moves)
+            if len(moves):
+                first_board = int(moves['board'][0])
+                cells = moves['cell'].tolist()
+                symbol = mover_symbol(decode(first_board), cells[0]) if first_board != NO_BOARD else 0
+                trie.add_game(cells, symbol)
+        return trie
+    
+    @staticmethod
+    def _update_response_stats(stats: ResponseStats, response_time: float,
+                               board: Optional[int], move_index: int):
+        """Fold one move's timing and move quality (from its packed board) into running statistics"""
+        if response_time and response_time > 0:
+            stats.add_response(response_time)
+        if board is not None and board != NO_BOARD:
+            optimal = is_optimal_code(board, move_index)
+            if optimal is not None:
+                stats.add_move_quality(optimal)
+    
+    @staticmethod
+    @timed('response_stats_rebuild')
+    def _rebuild_response_stats(profile: PlayerBehaviorProfile) -> ResponseStats:
+        """Rolled-up timing plus a replay of the remaining games in arrival order"""
+        rows = GameRecord.objects.filter(player=profile).order_by('id').values_list(
+            'packed_moves', flat=True
+        ).iterator(chunk_size=MARKOV_REBUILD_CHUNK)
         
-        pattern_analysis.markov_chain = markov_chain
-        pattern_analysis.save()
+        stats = ResponseStats()
+        for count, mean, m2 in DailySummary.objects.filter(player=profile).order_by('day').values_list(
+            'response_count', 'response_mean', 'response_m2'
+        ):
+            stats.merge(count, mean, m2)
+        for packed_moves in rows:
+            moves = unpack_moves(packed_moves)
+            for cell, board, response_time in zip(
+                moves['cell'].tolist(), moves['board'].tolist(), moves['response_time'].tolist()
+            ):
+                BehaviorAnalyzer._update_response_stats(stats, response_time, board, cell)
+        return stats
     
     @staticmethod
     def calculate_difficulty(player_name: str) -> float:
         """Calculate adaptive difficulty (0.0 = easy, 1.0 = hard)"""
-        try:
-            profile = PlayerBehaviorProfile.objects.get(player_name=player_name)
-        except PlayerBehaviorProfile.DoesNotExist:
+        cached = BehaviorAnalyzer.get_cached_profile(player_name)
+        if cached is None:
             return 0.5  # Default medium
-        
+        profile = cached.profile
+        return float(BehaviorAnalyzer._difficulty(
+            profile.wins, profile.total_games, profile.exploitability_score
+        ))
+    
+    @staticmethod
+    def calculate_difficulties(player_names: List[str]) -> Dict[str, float]:
+        """calculate_difficulty() for many players from one profile fetch"""
+        cached = BehaviorAnalyzer.get_cached_profiles(player_names)
+        known = [name for name in dict.fromkeys(player_names) if name in cached]
+        profiles = [cached[name].profile for name in known]
+        difficulties = BehaviorAnalyzer._difficulty(
+            np.array([profile.wins for profile in profiles], dtype=np.float64),
+            np.array([profile.total_games for profile in profiles], dtype=np.float64),
+            np.array([profile.exploitability_score for profile in profiles], dtype=np.float64),
+        )
+        result = {name: 0.5 for name in player_names}  # Default medium
+        result.update(zip(known, difficulties.tolist()))
+        return result
+    
+    @staticmethod
+    def _difficulty(wins, total_games, exploitability_score):
+        """Difficulty formula over scalars or arrays"""
         # Base difficulty on win rate and exploitability
-        win_rate = profile.wins / max(profile.total_games, 1)
-        exploitability = profile.exploitability_score / 100
+        win_rate = wins / np.maximum(total_games, 1)
+        exploitability = exploitability_score / 100
         
         # Higher win rate + lower exploitability = harder difficulty
-        difficulty = (win_rate * 0.6) + ((1 - exploitability) * 0.4)
+        win_weight, exploit_weight = getattr(settings, 'BEHAVIOR_DIFFICULTY_WEIGHTS', DIFFICULTY_WEIGHTS)
+        difficulty = (win_rate * win_weight) + ((1 - exploitability) * exploit_weight)
         
-        return min(max(difficulty, 0.0), 1.0)
+        return np.clip(difficulty, 0.0, 1.0)
     
     @staticmethod
+    @timed('detect_anomalies')
     def detect_anomalies(player_name: str, current_move: Dict) -> List[str]:
         """Detect suspicious behavior patterns"""
+        cached = BehaviorAnalyzer.get_cached_profile(player_name)
+        if cached is None:
+            return []
+        return BehaviorAnalyzer._anomalies_from(cached.profile, cached.response_stats, current_move)
+    
+    @staticmethod
+    def _anomalies_from(profile: PlayerBehaviorProfile, stats: ResponseStats,
+                        current_move: Dict) -> List[str]:
+        """Anomaly checks against already loaded profile state"""
         anomalies = []
         
-        try:
-            profile = PlayerBehaviorProfile.objects.get(player_name=player_name)
-        except PlayerBehaviorProfile.DoesNotExist:
-            return anomalies
-        
         # Check response time (too fast = bot-like)
         if current_move.get('responseTime', 0) < 50:  # Less than 50ms
             anomalies.append('unusually_fast_response')
@@ -344,13 +999,23 @@ class BehaviorAnalyzer:
                 anomalies.append('suspicious_win_rate')
         
         # Check for consistent timing (bot-like)
-        moves = MoveEvent.objects.filter(player=profile).order_by('-created_at')[:20]
-        if len(moves) >= 10:
-            response_times = [m.response_time for m in moves if m.response_time > 0]
-            if len(response_times) >= 10:
-                std_dev = np.std(response_times)
-                if std_dev < 50:  # Very consistent timing
-                    anomalies.append('consistent_timing')
+        if stats.ring_len >= 10 and stats.recent_std() < CONSISTENT_TIMING_STD:
+            anomalies.append('consistent_timing')
+        
+        # Check for a sudden shift away from the player's usual timing
+        if stats.count >= 30 and abs(stats.timing_shift()) > TIMING_SHIFT_THRESHOLD:
+            anomalies.append('timing_shift')
+        
+        # Check how often recent moves match perfect play
+        current_optimal = None
+        current_board = board_code(current_move.get('boardState'))
+        if current_board is not None and 'moveIndex' in current_move:
+            current_optimal = is_optimal_code(current_board, current_move['moveIndex'])
+        matched, scored = stats.optimal_rate(current_optimal)
+        if scored >= 15 and matched / scored >= 0.98:
+            anomalies.append('perfect_play')
         
+        for flag in anomalies:
+            increment(f'anomaly_{flag}')
         return anomalies
 
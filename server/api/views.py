@@ -2,11 +2,50 @@
 Django API Views for Behavior Analysis
 """
 
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 import json
 from .ai_models import BehaviorAnalyzer, PlayerBehaviorProfile, MoveEvent, PatternAnalysis
+from . import solver
+from .instrumentation import CONTENT_TYPE as METRICS_CONTENT_TYPE, registry
+from .leaderboard import get_leaderboard
+from .profile_aggregator import get_aggregator, write_behind_enabled
+from .response_cache import versioned_json
+
+
+MAX_BATCH_GAMES = 1000
+MAX_BATCH_ITEMS = 1000
+MAX_LEADERBOARD_PAGE = 200
+GAME_RESULTS = ('win', 'loss', 'draw')
+
+
+def _game_data(data):
+    """Normalize one posted game into the analyzer's game_data shape"""
+    return {
+        'playerName': data.get('playerName'),
+        'gameId': data.get('gameId'),
+        'result': data.get('result'),
+        'moves': data.get('moves', []),
+        'duration': data.get('duration', 0),
+        'patterns': data.get('patterns', {})
+    }
+
+
+def _validate_game(game):
+    """Reject a game the analyzer cannot persist, before it is written or queued"""
+    if not game['playerName'] or not isinstance(game['playerName'], str):
+        raise ValueError('Every game needs a playerName')
+    if game['result'] not in GAME_RESULTS:
+        raise ValueError(f"result must be one of: {', '.join(GAME_RESULTS)}")
+    if not isinstance(game['moves'], list):
+        raise ValueError('moves must be a list')
+    for move in game['moves']:
+        if not isinstance(move, dict) or type(move.get('moveIndex')) is not int or not 0 <= move['moveIndex'] <= 8:
+            raise ValueError('Every move needs an integer moveIndex from 0 to 8')
+        if not isinstance(move.get('responseTime', 0), (int, float)):
+            raise ValueError('responseTime must be a number')
+    return game
 
 
 @csrf_exempt
@@ -15,13 +54,12 @@ def record_game(request):
     """Record a completed game"""
     try:
         data = json.loads(request.body)
-        player_name = data.get('playerName')
-        game_data = {
-            'result': data.get('result'),
-            'moves': data.get('moves', []),
-            'duration': data.get('duration', 0),
-            'patterns': data.get('patterns', {})
-        }
+        game_data = _validate_game(_game_data(data))
+        player_name = game_data['playerName']
+        
+        if write_behind_enabled():
+            get_aggregator().submit(player_name, game_data)
+            return JsonResponse({'ok': True, 'message': 'Game queued'}, status=202)
         
         profile = BehaviorAnalyzer.update_profile(player_name, game_data)
         
@@ -40,33 +78,81 @@ def record_game(request):
 
 
 @csrf_exempt
-@require_http_methods(["GET"])
-def get_profile(request, player_name):
-    """Get player behavior profile"""
+@require_http_methods(["POST"])
+def record_games(request):
+    """Record a batch of completed games"""
     try:
-        profile = PlayerBehaviorProfile.objects.get(player_name=player_name)
+        data = json.loads(request.body)
+        games = data.get('games', [])
+        if len(games) > MAX_BATCH_GAMES:
+            raise ValueError(f'At most {MAX_BATCH_GAMES} games per batch')
+        games = [_validate_game(_game_data(game)) for game in games]
+        
+        if write_behind_enabled():
+            aggregator = get_aggregator()
+            for game in games:
+                aggregator.submit(game['playerName'], game)
+            return JsonResponse({'ok': True, 'message': f'{len(games)} games queued'}, status=202)
+        
+        profiles = BehaviorAnalyzer.record_games(games)
         
         return JsonResponse({
             'ok': True,
-            'profile': {
-                'playerName': profile.player_name,
-                'totalGames': profile.total_games,
-                'wins': profile.wins,
-                'losses': profile.losses,
-                'draws': profile.draws,
-                'strategyType': profile.strategy_type,
-                'averageResponseTime': profile.average_response_time,
-                'exploitabilityScore': profile.exploitability_score,
-                'preferredOpenings': profile.preferred_openings[-10:],  # Last 10
-                'lastGameAt': profile.last_game_at.isoformat() if profile.last_game_at else None
+            'message': f'{len(games)} games recorded',
+            'profiles': {
+                name: {
+                    'wins': profile.wins,
+                    'losses': profile.losses,
+                    'totalGames': profile.total_games,
+                    'exploitabilityScore': profile.exploitability_score
+                }
+                for name, profile in profiles.items()
             }
         })
+    except Exception as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def get_profile(request, player_name):
+    """Get player behavior profile"""
+    try:
+        cached = BehaviorAnalyzer.get_cached_profile(player_name)
+        if cached is None:
+            raise PlayerBehaviorProfile.DoesNotExist
+        profile = cached.profile
+        
+        return versioned_json(
+            request, ('profile', player_name), profile.last_updated,
+            lambda: {'ok': True, 'profile': _profile_payload(profile)},
+        )
     except PlayerBehaviorProfile.DoesNotExist:
         return JsonResponse({'ok': False, 'error': 'Profile not found'}, status=404)
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
 
+def _profile_payload(profile):
+    recent = profile.get_decayed_stats()
+    return {
+        'playerName': profile.player_name,
+        'totalGames': profile.total_games,
+        'wins': profile.wins,
+        'losses': profile.losses,
+        'draws': profile.draws,
+        'strategyType': profile.strategy_type,
+        'averageResponseTime': profile.average_response_time,
+        'exploitabilityScore': profile.exploitability_score,
+        'preferredOpenings': profile.preferred_openings[-10:],  # Last 10
+        # Weighted toward recent games as of the last one, see BEHAVIOR_DECAY_HALF_LIFE_DAYS
+        'recentWinRate': round(recent.win_rate, 4),
+        'recentResponseTime': recent.response_mean,
+        'recentGames': round(recent.games, 2),
+        'lastGameAt': profile.last_game_at.isoformat() if profile.last_game_at else None
+    }
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
 def predict_move(request):
@@ -77,32 +163,135 @@ def predict_move(request):
         current_board = data.get('boardState', [])
         move_history = data.get('moveHistory', [])
         
-        predicted_move = BehaviorAnalyzer.predict_next_move(
+        distribution = BehaviorAnalyzer.predict_distribution(
             player_name, current_board, move_history
         )
         
+        return JsonResponse({'ok': True, **_prediction(distribution)})
+    except Exception as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def predict_moves(request):
+    """Predict next moves for many players and positions"""
+    try:
+        data = json.loads(request.body)
+        items = [
+            (item.get('playerName'), item.get('boardState', []), item.get('moveHistory', []))
+            for item in data.get('items', [])
+        ]
+        if len(items) > MAX_BATCH_ITEMS:
+            raise ValueError(f'At most {MAX_BATCH_ITEMS} items per batch')
+        
+        distributions = BehaviorAnalyzer.predict_batch(items)
+        
         return JsonResponse({
             'ok': True,
-            'predictedMove': predicted_move
+            'predictions': [
+                {'playerName': name, **_prediction(distribution)}
+                for (name, _, _), distribution in zip(items, distributions)
+            ]
+        })
+    except Exception as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+
+
+def _prediction(distribution):
+    if distribution is None:
+        return {'predictedMove': None, 'distribution': None}
+    return {
+        'predictedMove': int(distribution.argmax()),
+        'distribution': [round(p, 4) for p in distribution.tolist()],
+    }
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def evaluate_position(request):
+    """Evaluate a board under perfect play"""
+    try:
+        data = json.loads(request.body)
+        evaluation = solver.evaluate(data.get('boardState', []), data.get('toMove'))
+        
+        return JsonResponse({
+            'ok': True,
+            'value': evaluation.value,
+            'bestMoves': evaluation.best_moves,
+            'optimalMove': evaluation.optimal_move,
+            'distance': evaluation.distance
         })
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=400)
 
 
+@csrf_exempt
+@require_http_methods(["GET"])
+def similar_players(request, player_name):
+    """Get the players whose behavior is most similar"""
+    try:
+        k = min(max(int(request.GET.get('k', 10)), 1), 100)
+        similar = BehaviorAnalyzer.similar_players(player_name, k)
+        if similar is None:
+            return JsonResponse({'ok': False, 'error': 'Profile not found'}, status=404)
+        
+        return JsonResponse({
+            'ok': True,
+            'playerName': player_name,
+            'similar': [
+                {'playerName': name, 'similarity': round(score, 4)}
+                for name, score in similar
+            ]
+        })
+    except ValueError as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=500)
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_difficulty(request, player_name):
     """Get adaptive difficulty for player"""
     try:
-        difficulty = BehaviorAnalyzer.calculate_difficulty(player_name)
+        cached = BehaviorAnalyzer.get_cached_profile(player_name)
+        last_updated = cached.profile.last_updated if cached is not None else None
+        
+        def payload():
+            difficulty = BehaviorAnalyzer.calculate_difficulty(player_name)
+            return {'ok': True, 'difficulty': difficulty, 'level': _difficulty_level(difficulty)}
+        
+        return versioned_json(request, ('difficulty', player_name), last_updated, payload)
+    except Exception as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["POST"])
+def get_difficulties(request):
+    """Get adaptive difficulty for many players"""
+    try:
+        data = json.loads(request.body)
+        player_names = data.get('playerNames', [])
+        if len(player_names) > MAX_BATCH_ITEMS:
+            raise ValueError(f'At most {MAX_BATCH_ITEMS} players per batch')
+        
+        difficulties = BehaviorAnalyzer.calculate_difficulties(player_names)
         
         return JsonResponse({
             'ok': True,
-            'difficulty': difficulty,
-            'level': 'easy' if difficulty < 0.4 else 'hard' if difficulty > 0.6 else 'medium'
+            'difficulties': {
+                name: {'difficulty': difficulty, 'level': _difficulty_level(difficulty)}
+                for name, difficulty in difficulties.items()
+            }
         })
     except Exception as e:
-        return JsonResponse({'ok': False, 'error': str(e)}, status=500)
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+
+
+def _difficulty_level(difficulty: float) -> str:
+    return 'easy' if difficulty < 0.4 else 'hard' if difficulty > 0.6 else 'medium'
 
 
 @csrf_exempt
@@ -130,25 +319,54 @@ def check_anomalies(request):
 def leaderboard(request):
     """Get leaderboard of players by wins"""
     try:
-        profiles = PlayerBehaviorProfile.objects.filter(
-            total_games__gte=1
-        ).order_by('-wins', 'losses')[:50]
-        
-        leaderboard_data = [
-            {
-                'playerName': p.player_name,
-                'wins': p.wins,
-                'losses': p.losses,
-                'totalGames': p.total_games,
-                'winRate': round(p.wins / max(p.total_games, 1) * 100, 1)
+        ordering = request.GET.get('ordering', 'wins')
+        limit = min(max(int(request.GET.get('limit', 50)), 1), MAX_LEADERBOARD_PAGE)
+        cursor = request.GET.get('cursor')
+        board = get_leaderboard()
+        
+        def payload():
+            leaderboard_data, next_cursor = board.page(ordering, cursor, limit)
+            return {
+                'ok': True,
+                'ordering': ordering,
+                'leaderboard': leaderboard_data,
+                'nextCursor': next_cursor
             }
-            for p in profiles
-        ]
+        
+        return versioned_json(
+            request, ('leaderboard', ordering, cursor, limit), board.page_version(ordering), payload
+        )
+    except ValueError as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
+    except Exception as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=500)
+
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def leaderboard_rank(request, player_name):
+    """Get a player's leaderboard rank and the players around it"""
+    try:
+        ordering = request.GET.get('ordering', 'wins')
+        neighbours = min(max(int(request.GET.get('neighbours', 5)), 0), 50)
+        standing = get_leaderboard().rank(player_name, ordering, neighbours)
+        if standing is None:
+            return JsonResponse({'ok': False, 'error': 'Player not ranked'}, status=404)
         
         return JsonResponse({
             'ok': True,
-            'leaderboard': leaderboard_data
+            'ordering': ordering,
+            'playerName': player_name,
+            **standing
         })
+    except ValueError as e:
+        return JsonResponse({'ok': False, 'error': str(e)}, status=400)
     except Exception as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=500)
 
+
+@csrf_exempt
+@require_http_methods(["GET"])
+def metrics(request):
+    """Prometheus metrics for the behavior service"""
+    return HttpResponse(registry.render(), content_type=METRICS_CONTENT_TYPE)
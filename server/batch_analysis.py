@@ -0,0 +1,294 @@
+"""
+Vectorized Batch Re-Analysis
+Recomputes derived profile fields and Markov tables from the stored
+GameRecord history and daily summaries with grouped NumPy operations
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional
+
+import numpy as np
+from django.db import connections
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Mod
+from django.utils import timezone
+
+from .ai_models import (
+    BOARD_CELLS, MARKOV_CONTEXTS, MOVE_TYPES, PACKED_MOVE_DTYPE,
+    DailySummary, GameRecord, PatternAnalysis, PlayerBehaviorProfile,
+)
+from .profile_cache import get_profile_cache
+from .sequence_sketch import SEQUENCE_CODES, SequenceCounts, exploitability
+from .symmetry import fold, sequence_space, symmetry_enabled
+
+
+TRANSITION_SPACE = MARKOV_CONTEXTS * BOARD_CELLS  # a*81 + b*9 + c, same layout as the Markov table
+EMBEDDING_DECAY = 0.7  # Weight kept by the old embedding in _update_embedding
+WRITE_BATCH_SIZE = 500
+
+RECORD_COLUMNS = ('id', 'player_id', 'packed_moves')
+MOVE_COLUMNS = ('id', 'player_id', 'game_id', 'move_number', 'move_index',
+                'response_time', 'move_type')
+OFFENSIVE, DEFENSIVE = MOVE_TYPES.index('offensive'), MOVE_TYPES.index('defensive')
+_POPCOUNT = np.array([bin(i).count('1') for i in range(1 << BOARD_CELLS)], dtype=np.int64)
+
+
+def _to_arrays(rows: List[tuple]) -> Dict[str, np.ndarray]:
+    """Expand game records into one entry per move; the record id stands in for the game"""
+    moves = np.frombuffer(b''.join(bytes(packed) for _, _, packed in rows), dtype=PACKED_MOVE_DTYPE)
+    lengths = np.array([len(packed) // PACKED_MOVE_DTYPE.itemsize for _, _, packed in rows], dtype=np.int64)
+    record_ids = np.repeat(np.array([row[0] for row in rows], dtype=np.int64), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    return {
+        'id': record_ids,
+        'player_id': np.repeat(np.array([row[1] for row in rows], dtype=np.int64), lengths),
+        'game_id': record_ids,
+        'move_number': np.arange(len(moves), dtype=np.int64) - starts + 1,
+        'move_index': moves['cell'].astype(np.int64),
+        'response_time': moves['response_time'].astype(np.int64),
+        'move_type': (moves['kind'] >> 2).astype(np.int64),
+    }
+
+
+def _slice(arrays: Dict[str, np.ndarray], start: int, stop: Optional[int] = None):
+    return {name: values[start:stop] for name, values in arrays.items()}
+
+
+def _concat(a: Optional[Dict[str, np.ndarray]], b: Dict[str, np.ndarray]):
+    if a is None:
+        return b
+    return {name: np.concatenate([a[name], b[name]]) for name in MOVE_COLUMNS}
+
+
+def iter_player_batches(queryset, chunk_size: int) -> Iterator[Dict[str, np.ndarray]]:
+    """Stream game records ordered by player and yield move arrays holding only complete players
+
+    Memory is bounded by chunk_size games plus the history of the largest
+    single player, whose moves are carried over until the next player starts.
+    """
+    rows = queryset.order_by('player_id', 'id').values_list(*RECORD_COLUMNS).iterator(
+        chunk_size=chunk_size
+    )
+    carry = None
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) < chunk_size:
+            continue
+        arrays = _concat(carry, _to_arrays(buffer))
+        buffer = []
+        if not len(arrays['player_id']):
+            continue
+        players = arrays['player_id']
+        last_start = int(np.searchsorted(players, players[-1]))
+        if last_start > 0:
+            yield _slice(arrays, 0, last_start)
+        carry = _slice(arrays, last_start)
+
+    arrays = _concat(carry, _to_arrays(buffer))
+    if len(arrays['player_id']):
+        yield arrays
+
+
+def analyze_batch(arrays: Dict[str, np.ndarray],
+                  rolled_up: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """Grouped features for every player in a batch of complete histories
+
+    rolled_up holds transitions from daily summaries, one row per player in
+    ascending player id order, added before sequences are derived.
+    """
+    players = arrays['player_id']
+
+    # Games are keyed per player and ordered by their first stored row
+    _, game_inverse = np.unique(arrays['game_id'], return_inverse=True)
+    game_key = players * (game_inverse.max() + 1) + game_inverse
+    _, key_inverse = np.unique(game_key, return_inverse=True)
+    game_first_id = np.full(key_inverse.max() + 1, np.iinfo(np.int64).max)
+    np.minimum.at(game_first_id, key_inverse, arrays['id'])
+
+    order = np.lexsort((arrays['move_number'], game_first_id[key_inverse], players))
+    players = players[order]
+    key_inverse = key_inverse[order]
+    moves = arrays['move_index'][order]
+    response_times = arrays['response_time'][order].astype(np.float64)
+    move_types = arrays['move_type'][order]
+
+    # Per-game features, matching _update_embedding and _update_strategy_type
+    game_starts = np.flatnonzero(np.r_[True, key_inverse[1:] != key_inverse[:-1]])
+    game_lengths = np.diff(np.r_[game_starts, len(moves)])
+    offensive = np.add.reduceat((move_types == OFFENSIVE).astype(np.int64), game_starts)
+    defensive = np.add.reduceat((move_types == DEFENSIVE).astype(np.int64), game_starts)
+    features = np.column_stack([
+        game_lengths,
+        np.add.reduceat(response_times, game_starts) / game_lengths,
+        _POPCOUNT[np.bitwise_or.reduceat(1 << moves, game_starts)],
+        offensive,
+        defensive,
+        moves[game_starts],
+    ]).astype(np.float64)
+
+    # Embedding: closed form of the per-game 0.7/0.3 exponential blend
+    game_players = players[game_starts]
+    player_starts = np.flatnonzero(np.r_[True, game_players[1:] != game_players[:-1]])
+    games_per_player = np.diff(np.r_[player_starts, len(game_starts)])
+    position = np.arange(len(game_starts)) - np.repeat(player_starts, games_per_player)
+    remaining = np.repeat(games_per_player, games_per_player) - 1 - position
+    weights = np.where(
+        position == 0,
+        EMBEDDING_DECAY ** remaining,
+        (1 - EMBEDDING_DECAY) * EMBEDDING_DECAY ** remaining,
+    )
+    embeddings = np.add.reduceat(features * weights[:, None], player_starts, axis=0)
+
+    # Strategy type comes from each player's most recent game
+    last_games = player_starts + games_per_player - 1
+    offensive_ratio = offensive[last_games] / game_lengths[last_games]
+    defensive_ratio = defensive[last_games] / game_lengths[last_games]
+    strategy_types = np.where(
+        offensive_ratio > 0.4, 'aggressive',
+        np.where(defensive_ratio > 0.4, 'defensive', 'balanced')
+    )
+
+    # 3-move sequences double as Markov transitions (same flat index)
+    player_of_row = np.repeat(np.arange(len(player_starts)), np.add.reduceat(game_lengths, player_starts))
+    same_game = key_inverse[2:] == key_inverse[:-2]
+    codes = moves[:-2] * MARKOV_CONTEXTS + moves[1:-1] * BOARD_CELLS + moves[2:]
+    transition_counts = np.bincount(
+        player_of_row[:-2][same_game] * TRANSITION_SPACE + codes[same_game],
+        minlength=len(player_starts) * TRANSITION_SPACE,
+    ).reshape(len(player_starts), TRANSITION_SPACE)
+    if rolled_up is not None:
+        transition_counts += rolled_up
+
+    return {
+        'player_ids': game_players[player_starts],
+        'strategy_types': strategy_types,
+        'embeddings': embeddings,
+        **_transition_features(transition_counts),
+    }
+
+
+def analyze_summaries(player_ids: List[int], rolled_up: np.ndarray) -> Dict[str, np.ndarray]:
+    """Transition-derived features of players whose every game is rolled up
+
+    Embeddings and strategy types need raw games, so they are left out and
+    keep their stored values.
+    """
+    return {'player_ids': np.array(player_ids, dtype=np.int64), **_transition_features(rolled_up)}
+
+
+def _transition_features(transition_counts: np.ndarray) -> Dict[str, np.ndarray]:
+    """Markov tables, sequence counts and exploitability from players x 729 transition counts"""
+    if symmetry_enabled():
+        transition_counts = fold(transition_counts)
+
+    # Sequence counts are the transitions over three distinct cells
+    sequence_counts = transition_counts[:, SEQUENCE_CODES]
+    c_log_c = np.where(sequence_counts > 1, sequence_counts * np.log(np.maximum(sequence_counts, 1)), 0.0)
+    return {
+        'exploitability': exploitability(sequence_counts.sum(axis=1), c_log_c.sum(axis=1), sequence_space()),
+        'transition_counts': transition_counts,
+        'sequence_counts': sequence_counts,
+    }
+
+
+def write_results(results: Dict[str, np.ndarray]) -> int:
+    """Persist one analyzed batch with bulk_update; returns players written"""
+    player_ids = [int(pid) for pid in results['player_ids']]
+    now = timezone.now()
+
+    profiles = [
+        PlayerBehaviorProfile(
+            pk=pid,
+            exploitability_score=float(results['exploitability'][i]),
+            sequence_counts=SequenceCounts.from_counts(results['sequence_counts'][i]).to_bytes(),
+            common_sequences={},
+            last_updated=now,
+        )
+        for i, pid in enumerate(player_ids)
+    ]
+    fields = ['exploitability_score', 'sequence_counts', 'common_sequences', 'last_updated']
+    if 'embeddings' in results:  # Absent for players analyzed from summaries alone
+        for i, profile in enumerate(profiles):
+            profile.strategy_type = str(results['strategy_types'][i])
+            profile.behavioral_embedding = results['embeddings'][i].tolist()
+        fields += ['strategy_type', 'behavioral_embedding']
+    PlayerBehaviorProfile.objects.bulk_update(profiles, fields, batch_size=WRITE_BATCH_SIZE)
+
+    existing = dict(PatternAnalysis.objects.filter(
+        player_id__in=player_ids
+    ).values_list('player_id', 'id'))
+    missing = [PatternAnalysis(player_id=pid) for pid in player_ids if pid not in existing]
+    if missing:
+        PatternAnalysis.objects.bulk_create(missing, batch_size=WRITE_BATCH_SIZE)
+        existing = dict(PatternAnalysis.objects.filter(
+            player_id__in=player_ids
+        ).values_list('player_id', 'id'))
+
+    symmetric = symmetry_enabled()
+    analyses = []
+    for i, pid in enumerate(player_ids):
+        analysis = PatternAnalysis(pk=existing[pid])
+        analysis.set_markov_table(results['transition_counts'][i], symmetric)
+        analyses.append(analysis)
+    PatternAnalysis.objects.bulk_update(
+        analyses, ['markov_counts', 'markov_built', 'markov_symmetric'], batch_size=WRITE_BATCH_SIZE
+    )
+
+    cache = get_profile_cache()
+    for name in PlayerBehaviorProfile.objects.filter(pk__in=player_ids).values_list(
+        'player_name', flat=True
+    ):
+        cache.invalidate(name)
+    return len(player_ids)
+
+
+def _in_shard(queryset, shard: int, shards: int):
+    if shards > 1:
+        queryset = queryset.annotate(shard=Mod('player_id', shards)).filter(shard=shard)
+    return queryset
+
+
+def reanalyze_shard(shard: int = 0, shards: int = 1, chunk_size: int = 20000) -> int:
+    """Re-analyze every player whose id falls in one shard
+
+    Players with stored games are analyzed from them plus their summaries;
+    players whose games were all rolled up are analyzed from the summaries.
+    """
+    written = 0
+    for arrays in iter_player_batches(_in_shard(GameRecord.objects.all(), shard, shards), chunk_size):
+        rolled_up = DailySummary.transitions_for(np.unique(arrays['player_id']).tolist())
+        written += write_results(analyze_batch(arrays, rolled_up))
+
+    summarized = _in_shard(DailySummary.objects.all(), shard, shards).filter(
+        ~Exists(GameRecord.objects.filter(player_id=OuterRef('player_id')))
+    ).order_by('player_id').values_list('player_id', flat=True).distinct()
+    player_ids = list(summarized)
+    for start in range(0, len(player_ids), WRITE_BATCH_SIZE):
+        batch = player_ids[start:start + WRITE_BATCH_SIZE]
+        written += write_results(analyze_summaries(batch, DailySummary.transitions_for(batch)))
+    return written
+
+
+def _init_worker():
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def reanalyze_all(workers: int = 1, chunk_size: int = 20000) -> int:
+    """Re-analyze every player, split by player id across a process pool
+
+    SQLite cannot take concurrent writers alongside open read cursors, so
+    the pool is only used on server databases.
+    """
+    if workers <= 1 or connections['default'].vendor == 'sqlite':
+        return reanalyze_shard(0, 1, chunk_size)
+
+    connections.close_all()  # Never share a connection with the children
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        futures = [
+            pool.submit(reanalyze_shard, shard, workers, chunk_size)
+            for shard in range(workers)
+        ]
+        return sum(future.result() for future in futures)
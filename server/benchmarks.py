@@ -0,0 +1,319 @@
+"""
+Behavior API Benchmarks
+Synthetic players and games, per-endpoint latency and query counts, and
+BehaviorAnalyzer microbenchmarks at growing history sizes
+"""
+
+import json
+import platform
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import django
+import numpy as np
+from django.db import connection, reset_queries
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .ai_models import (
+    BOARD_CELLS, MOVE_EVENT_BATCH_SIZE, BehaviorAnalyzer,
+    GameRecord, MoveEvent, PlayerBehaviorProfile, move_events_enabled,
+)
+from .profile_cache import get_profile_cache
+from .solver import WIN_LINES
+
+
+SEED_BATCH_GAMES = 200
+MICRO_GAME_LENGTH = 4
+MICRO_INSERT_BATCH = 5000
+BATCH_ITEMS = 100  # Items per predict-moves / difficulties request
+REBUILD_BUDGET = 100000  # Stored moves scanned per _build_markov_chain benchmark
+
+
+def _winner(board: List[str]) -> Optional[str]:
+    for a, b, c in WIN_LINES:
+        if board[a] and board[a] == board[b] == board[c]:
+            return board[a]
+    return None
+
+
+class SyntheticPlayers:
+    """Players with their own opening and cell preferences and timing
+
+    Activity follows a Zipf-like law: player i plays with weight
+    1 / (i + 1) ** skew, so skew=0 is uniform and larger values
+    concentrate games on a few heavy players.
+    """
+
+    def __init__(self, players: int, skew: float = 1.0, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        self.names = [f'bench-{i}' for i in range(players)]
+        weights = 1.0 / np.arange(1, players + 1) ** skew
+        self._cumulative = np.cumsum(weights / weights.sum())
+        self.preferences = self.rng.dirichlet(np.full(BOARD_CELLS, 0.5), size=players)
+        self.response_ms = self.rng.uniform(250, 1500, size=players)
+        self.played = set()
+
+    def pick_player(self) -> int:
+        index = int(np.searchsorted(self._cumulative, self.rng.random(), side='right'))
+        return min(index, len(self.names) - 1)
+
+    def game(self, player: Optional[int] = None, game_id: Optional[str] = None) -> Dict:
+        """One legal game against a random opponent, in record-game payload shape"""
+        player = self.pick_player() if player is None else player
+        self.played.add(player)
+        board = [''] * BOARD_CELLS
+        moves = []
+        winner = None
+        while winner is None and '' in board:
+            legal = np.array([cell == '' for cell in board])
+            weights = self.preferences[player] * legal
+            cell = int(self.rng.choice(BOARD_CELLS, p=weights / weights.sum()))
+            filled = BOARD_CELLS - board.count('')
+            moves.append({
+                'moveIndex': cell,
+                'boardState': list(board),
+                'responseTime': int(self.rng.lognormal(np.log(self.response_ms[player]), 0.3)),
+                'moveNumber': len(moves) + 1,
+                'gamePhase': 'opening' if filled <= 2 else 'midgame' if filled <= 6 else 'endgame',
+                'moveType': str(self.rng.choice(['offensive', 'defensive', 'neutral'])),
+            })
+            board[cell] = 'X'
+            winner = _winner(board)
+            if winner is None and '' in board:
+                board[int(self.rng.choice(np.flatnonzero([c == '' for c in board])))] = 'O'
+                winner = _winner(board)
+        return {
+            'playerName': self.names[player],
+            'gameId': game_id or f'bench-{self.rng.integers(1 << 62):x}',
+            'result': 'win' if winner == 'X' else 'loss' if winner == 'O' else 'draw',
+            'moves': moves,
+        }
+
+    def games(self, count: int) -> Iterator[Dict]:
+        for _ in range(count):
+            yield self.game()
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    if not samples.size:
+        return {}
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        'count': int(samples.size),
+        'meanMs': round(float(samples.mean()), 4),
+        'p50Ms': round(float(p50), 4),
+        'p95Ms': round(float(p95), 4),
+        'p99Ms': round(float(p99), 4),
+        'maxMs': round(float(samples.max()), 4),
+    }
+
+
+def seed(players: SyntheticPlayers, games: int) -> int:
+    """Record synthetic games through the analyzer; returns moves stored"""
+    moves = 0
+    batch = []
+    for game in players.games(games):
+        batch.append(game)
+        moves += len(game['moves'])
+        if len(batch) >= SEED_BATCH_GAMES:
+            BehaviorAnalyzer.record_games(batch)
+            batch = []
+    if batch:
+        BehaviorAnalyzer.record_games(batch)
+    return moves
+
+
+def _endpoint_requests(players: SyntheticPlayers) -> Dict[str, Callable[[], tuple]]:
+    """One request builder per route in urls.py, returning (method, path, body)"""
+    def name():
+        # Same skew as the games, limited to players that have a profile
+        player = players.pick_player()
+        while players.played and player not in players.played:
+            player = players.pick_player()
+        return players.names[player]
+
+    def position():
+        game = players.game()
+        move = game['moves'][int(players.rng.integers(len(game['moves'])))]
+        return game, move
+
+    def predict_payload():
+        game, move = position()
+        history = [m['moveIndex'] for m in game['moves'][:move['moveNumber'] - 1]]
+        return {'playerName': game['playerName'], 'boardState': move['boardState'], 'moveHistory': history}
+
+    def anomaly_payload():
+        game, move = position()
+        return {'playerName': game['playerName'], 'move': move}
+
+    return {
+        'record_game': lambda: ('post', reverse('record_game'), players.game()),
+        'record_games': lambda: ('post', reverse('record_games'), {'games': list(players.games(10))}),
+        'get_profile': lambda: ('get', reverse('get_profile', args=[name()]), None),
+        'predict_move': lambda: ('post', reverse('predict_move'), predict_payload()),
+        'predict_moves': lambda: (
+            'post', reverse('predict_moves'), {'items': [predict_payload() for _ in range(BATCH_ITEMS)]}
+        ),
+        'evaluate_position': lambda: (
+            'post', reverse('evaluate_position'), {'boardState': position()[1]['boardState']}
+        ),
+        'similar_players': lambda: ('get', reverse('similar_players', args=[name()]), None),
+        'get_difficulty': lambda: ('get', reverse('get_difficulty', args=[name()]), None),
+        'get_difficulties': lambda: (
+            'post', reverse('get_difficulties'), {'playerNames': [name() for _ in range(BATCH_ITEMS)]}
+        ),
+        'check_anomalies': lambda: ('post', reverse('check_anomalies'), anomaly_payload()),
+        'leaderboard': lambda: ('get', reverse('leaderboard') + '?limit=50', None),
+        'leaderboard_rank': lambda: ('get', reverse('leaderboard_rank', args=[name()]), None),
+        'metrics': lambda: ('get', reverse('metrics'), None),
+    }
+
+
+def bench_endpoints(players: SyntheticPlayers, requests: int,
+                    endpoints: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """Drive each view sequentially through the test client
+
+    Payloads are built before the clock starts; latency covers the full
+    request/response cycle through URL routing and middleware.
+    """
+    client = Client()
+    results = {}
+    for endpoint, build in _endpoint_requests(players).items():
+        if endpoints and endpoint not in endpoints:
+            continue
+        latencies = []
+        queries = 0
+        errors = 0
+        for _ in range(requests):
+            method, path, payload = build()
+            body = json.dumps(payload) if payload is not None else None
+            reset_queries()  # A full query log would make the capture count zero
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                if method == 'post':
+                    response = client.post(path, body, content_type='application/json')
+                else:
+                    response = client.get(path)
+                latencies.append((time.perf_counter() - started) * 1000)
+            queries += len(captured)
+            errors += response.status_code >= 400
+        results[endpoint] = {
+            **summarize(latencies),
+            'throughputRps': round(1000 * len(latencies) / sum(latencies), 2),
+            'queriesPerRequest': round(queries / requests, 3),
+            'errors': errors,
+        }
+    return results
+
+
+def _store_history(player_name: str, moves: int, players: SyntheticPlayers) -> PlayerBehaviorProfile:
+    """Give one player exactly `moves` stored moves without going through ingestion"""
+    profile = PlayerBehaviorProfile.objects.create(
+        player_name=player_name, total_games=-(-moves // MICRO_GAME_LENGTH), last_game_at=timezone.now()
+    )
+    rng = players.rng
+    for start in range(0, moves, MICRO_INSERT_BATCH):
+        count = min(MICRO_INSERT_BATCH, moves - start)
+        cells = rng.integers(BOARD_CELLS, size=count)
+        times = rng.integers(100, 2000, size=count)
+        events = [
+            MoveEvent(
+                game_id=f'{player_name}-{(start + i) // MICRO_GAME_LENGTH}',
+                player=profile,
+                move_index=int(cells[i]),
+                board_state=[''] * BOARD_CELLS,
+                timestamp=0,
+                response_time=int(times[i]),
+                game_phase='midgame',
+                move_type='neutral',
+                move_number=(start + i) % MICRO_GAME_LENGTH + 1,
+                result='draw',
+            )
+            for i in range(count)
+        ]
+        if move_events_enabled():
+            MoveEvent.objects.bulk_create(events, batch_size=MOVE_EVENT_BATCH_SIZE)
+        by_game = {}
+        for event in events:
+            by_game.setdefault(event.game_id, []).append(event)
+        GameRecord.objects.bulk_create(
+            [GameRecord.from_events(game) for game in by_game.values()], batch_size=MOVE_EVENT_BATCH_SIZE
+        )
+    return profile
+
+
+def _time(call: Callable[[], object], repeat: int, before: Optional[Callable[[], None]] = None) -> Dict:
+    samples = []
+    queries = 0
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        reset_queries()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            call()
+            samples.append((time.perf_counter() - started) * 1000)
+        queries += len(captured)
+    return {**summarize(samples), 'queriesPerCall': round(queries / repeat, 3)}
+
+
+def bench_analyzer(players: SyntheticPlayers, sizes: List[int], repeat: int) -> Dict[str, Dict]:
+    """Time BehaviorAnalyzer methods for a player with each history size"""
+    cache = get_profile_cache()
+    results = {}
+    for size in sizes:
+        name = f'micro-{size}'
+        profile = _store_history(name, size, players)
+        # The first load seeds the Markov table and response statistics
+        pattern_analysis = BehaviorAnalyzer.get_cached_profile(name).pattern_analysis
+        game = players.game()
+        move = game['moves'][-1]
+        board = move['boardState']
+        history = [m['moveIndex'] for m in game['moves'][:-1]]
+        new_games = iter([{**players.game(), 'playerName': name} for _ in range(repeat)])
+
+        results[str(size)] = {
+            '_build_markov_chain': _time(
+                lambda: BehaviorAnalyzer._build_markov_chain(pattern_analysis, profile),
+                max(1, min(repeat, REBUILD_BUDGET // max(size, 1))),
+            ),
+            'update_profile': _time(lambda: BehaviorAnalyzer.update_profile(name, next(new_games)), repeat),
+            'predict_next_move_cold': _time(
+                lambda: BehaviorAnalyzer.predict_next_move(name, board, history), repeat,
+                before=lambda: cache.invalidate(name),
+            ),
+            'predict_next_move': _time(
+                lambda: BehaviorAnalyzer.predict_next_move(name, board, history), repeat
+            ),
+            'detect_anomalies': _time(lambda: BehaviorAnalyzer.detect_anomalies(name, move), repeat),
+        }
+    return results
+
+
+def environment() -> Dict[str, str]:
+    return {
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'numpy': np.__version__,
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def compare(baseline: Dict, current: Dict, metric: str = 'p95Ms') -> Dict[str, Dict[str, float]]:
+    """Ratio current / baseline of one latency metric for every endpoint and method in both runs"""
+    ratios = {'endpoints': {}, 'analyzer': {}}
+    for endpoint, stats in current.get('endpoints', {}).items():
+        before = baseline.get('endpoints', {}).get(endpoint, {}).get(metric)
+        if before:
+            ratios['endpoints'][endpoint] = round(stats[metric] / before, 3)
+    for size, methods in current.get('analyzer', {}).items():
+        for method, stats in methods.items():
+            before = baseline.get('analyzer', {}).get(size, {}).get(method, {}).get(metric)
+            if before:
+                ratios['analyzer'][f'{method}@{size}'] = round(stats[metric] / before, 3)
+    return ratios
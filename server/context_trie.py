@@ -0,0 +1,170 @@
+"""
+Variable-Order Move Context Trie
+Array-backed trie over a player's move sequences with PPM-style backoff
+from the longest matching context down to order 0
+"""
+
+import struct
+from typing import List, Optional
+
+import numpy as np
+
+
+BOARD_CELLS = 9
+START = BOARD_CELLS  # Context symbol before a game's first move
+ALPHABET = BOARD_CELLS + 1
+ROOTS = 2  # One root per player mark: 0 moves first (X), 1 moves second (O)
+MAX_NODE_LIMIT = 0xFFFF  # Child links are uint16
+
+# order, node count, node limit
+_HEADER = struct.Struct('<HHI')
+CHILD_DTYPE = np.dtype('<u2')
+COUNT_DTYPE = np.dtype('<u4')
+
+
+def player_symbol(board: Optional[List[str]]) -> int:
+    """Trie root for the side about to move on a board: 0 if it moved first"""
+    if not board:
+        return 0
+    return 0 if board.count('X') == board.count('O') else 1
+
+
+def mover_symbol(board: Optional[List[str]], move: int) -> int:
+    """Trie root for the player who made `move`, from a board recorded before or after it
+
+    Clients record the board with the move already placed, so the move's
+    own cell is cleared before the marks are counted.
+    """
+    if board and 0 <= move < len(board) and board[move]:
+        board = list(board)
+        board[move] = ''
+    return player_symbol(board)
+
+
+class ContextTrie:
+    """Next-move counts for every context of up to `order` previous moves
+
+    Node n stores the counts of the move that followed its context and the
+    child reached by extending the context one move further back. A context
+    reaching past the start of a game ends with START, so opening moves are
+    not mixed with mid-game ones. Once node_limit nodes exist the trie stops
+    growing and only existing contexts keep counting.
+    """
+
+    __slots__ = ('order', 'node_limit', 'node_count', 'children', 'counts')
+
+    def __init__(self, order: int = 4, node_limit: int = 512):
+        self.order = order
+        self.node_limit = min(max(node_limit, ROOTS), MAX_NODE_LIMIT)
+        self.node_count = ROOTS
+        capacity = min(self.node_limit, 64)
+        self.children = np.zeros((capacity, ALPHABET), dtype=CHILD_DTYPE)
+        self.counts = np.zeros((capacity, BOARD_CELLS), dtype=COUNT_DTYPE)
+
+    def _new_node(self) -> int:
+        if self.node_count >= self.node_limit:
+            return 0
+        if self.node_count == len(self.counts):
+            capacity = min(self.node_limit, 2 * len(self.counts))
+            self.children = np.resize(self.children, (capacity, ALPHABET))
+            self.counts = np.resize(self.counts, (capacity, BOARD_CELLS))
+            self.children[self.node_count:] = 0
+            self.counts[self.node_count:] = 0
+        self.node_count += 1
+        return self.node_count - 1
+
+    def add_game(self, moves: List[int], symbol: int = 0):
+        """Count every move of one game under each of its contexts"""
+        for i, move in enumerate(moves):
+            node = symbol
+            self.counts[node, move] += 1
+            for depth in range(1, self.order + 1):
+                previous = moves[i - depth] if depth <= i else START
+                child = int(self.children[node, previous])
+                if not child:
+                    child = self._new_node()
+                    if not child:
+                        break
+                    self.children[node, previous] = child
+                node = child
+                self.counts[node, move] += 1
+                if previous == START:
+                    break
+
+    def _path(self, history: List[int], symbol: int) -> List[int]:
+        """Nodes of the longest stored context, order 0 first"""
+        nodes = [symbol]
+        for depth in range(1, self.order + 1):
+            previous = history[-depth] if depth <= len(history) else START
+            if depth <= len(history) and not 0 <= previous < BOARD_CELLS:
+                raise ValueError(f'Invalid move in history: {previous}')
+            child = int(self.children[nodes[-1], previous])
+            if not child:
+                break
+            nodes.append(child)
+            if previous == START:
+                break
+        return nodes
+
+    def distribution(self, history: List[int], symbol: int, legal: np.ndarray) -> Optional[np.ndarray]:
+        """Probability of each cell being played next, zero on illegal cells
+
+        Blends from the longest matching context down with PPM-C escapes,
+        excluding cells already predicted by a longer context. Mass left
+        after order 0 is spread over the remaining legal cells. A player
+        with no moves counted under this mark is looked up under the other
+        one; None if neither has any.
+        """
+        if not self.counts[symbol].any():
+            symbol = ROOTS - 1 - symbol
+        if not self.counts[symbol].any() or not legal.any():
+            return None
+        # Rows are tiny, so plain lists beat per-row NumPy calls here
+        probabilities = [0.0] * BOARD_CELLS
+        remaining = 1.0
+        allowed = legal.tolist()
+        for row in self.counts[self._path(history, symbol)[::-1]].tolist():
+            counts = [count if ok else 0 for count, ok in zip(row, allowed)]
+            total = sum(counts)
+            if not total:
+                continue
+            distinct = BOARD_CELLS - counts.count(0)
+            scale = remaining / (total + distinct)
+            probabilities = [p + count * scale for p, count in zip(probabilities, counts)]
+            remaining *= distinct / (total + distinct)
+            allowed = [ok and not count for ok, count in zip(allowed, counts)]
+        
+        free = allowed.count(True)
+        if free:
+            share = remaining / free
+            probabilities = [p + share if ok else p for p, ok in zip(probabilities, allowed)]
+        else:
+            probabilities = [p / (1 - remaining) for p in probabilities]
+        return np.array(probabilities)
+
+    @property
+    def nbytes(self) -> int:
+        return self.node_count * (ALPHABET * CHILD_DTYPE.itemsize + BOARD_CELLS * COUNT_DTYPE.itemsize)
+
+    def to_bytes(self) -> bytes:
+        used = self.node_count
+        return (
+            _HEADER.pack(self.order, used, self.node_limit)
+            + self.children[:used].tobytes() + self.counts[:used].tobytes()
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'ContextTrie':
+        data = bytes(data)
+        order, used, node_limit = _HEADER.unpack_from(data)
+        trie = cls(order, node_limit)
+        offset = _HEADER.size
+        trie.children = np.frombuffer(
+            data, dtype=CHILD_DTYPE, count=used * ALPHABET, offset=offset
+        ).reshape(used, ALPHABET).copy()
+        offset += trie.children.nbytes
+        trie.counts = np.frombuffer(
+            data, dtype=COUNT_DTYPE, count=used * BOARD_CELLS, offset=offset
+        ).reshape(used, BOARD_CELLS).copy()
+        trie.node_count = used
+        return trie
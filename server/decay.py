@@ -0,0 +1,96 @@
+"""
+Time-Decayed Profile Aggregates
+Exponentially decayed game, result, response-time and opening weights with
+a configurable half-life, packed into one small binary blob
+"""
+
+import struct
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+
+BOARD_CELLS = 9
+DAY_SECONDS = 86400.0
+
+# updated_at, games, wins, losses, draws, responses, response_mean, 9 opening weights
+_PACKED = struct.Struct(f'<7d{BOARD_CELLS}d')
+PACKED_SIZE = _PACKED.size
+
+
+def half_life_seconds() -> float:
+    return getattr(settings, 'BEHAVIOR_DECAY_HALF_LIFE_DAYS', 30) * DAY_SECONDS
+
+
+class DecayedStats:
+    """Per-player weights that halve every half-life
+
+    Every weight is stored as of updated_at (unix seconds); means are
+    weighted by the decayed weights, so they need no decay of their own.
+    """
+
+    __slots__ = ('updated_at', 'games', 'wins', 'losses', 'draws', 'responses',
+                 'response_mean', 'openings')
+
+    def __init__(self):
+        self.updated_at = 0.0
+        self.games = 0.0
+        self.wins = 0.0
+        self.losses = 0.0
+        self.draws = 0.0
+        self.responses = 0.0
+        self.response_mean = 0.0
+        self.openings = [0.0] * BOARD_CELLS
+
+    def decay_to(self, when: float, half_life: float):
+        """Age every weight to `when`; earlier times leave the stats untouched"""
+        if when <= self.updated_at:
+            return
+        if self.updated_at:
+            factor = 0.5 ** ((when - self.updated_at) / half_life)
+            self.games *= factor
+            self.wins *= factor
+            self.losses *= factor
+            self.draws *= factor
+            self.responses *= factor
+            self.openings = [weight * factor for weight in self.openings]
+        self.updated_at = when
+
+    def add_game(self, when: float, half_life: float, result: str, opening: Optional[int],
+                 response_times: Iterable[float]):
+        """Fold one game played at `when` in; a game older than updated_at counts already decayed"""
+        self.decay_to(when, half_life)
+        weight = 0.5 ** ((self.updated_at - when) / half_life)
+        self.games += weight
+        if result == 'win':
+            self.wins += weight
+        elif result == 'loss':
+            self.losses += weight
+        else:
+            self.draws += weight
+        if opening is not None and 0 <= opening < BOARD_CELLS:
+            self.openings[opening] += weight
+        for response_time in response_times:
+            self.responses += weight
+            self.response_mean += weight * (response_time - self.response_mean) / self.responses
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+    def to_bytes(self) -> bytes:
+        return _PACKED.pack(
+            self.updated_at, self.games, self.wins, self.losses, self.draws,
+            self.responses, self.response_mean, *self.openings
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'DecayedStats':
+        stats = cls()
+        if not data:
+            return stats
+        values = _PACKED.unpack(bytes(data))
+        (stats.updated_at, stats.games, stats.wins, stats.losses, stats.draws,
+         stats.responses, stats.response_mean) = values[:7]
+        stats.openings = list(values[7:])
+        return stats
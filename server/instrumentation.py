@@ -0,0 +1,367 @@
+"""
+Behavior Service Instrumentation
+Request and analyzer metrics in Prometheus text format, plus an opt-in
+profiler for slow requests
+"""
+
+import cProfile
+import functools
+import io
+import itertools
+import logging
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import traceback
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (
+        (key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _labels(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(labels)} {value}' for labels, value in values]
+
+
+class Histogram:
+    """Fixed-bucket histogram; observations cost a bisect and three additions"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...]):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self._series: Dict[Labels, list] = {}  # labels -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _labels(labels)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bucket] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = [(labels, list(counts), total, count)
+                      for labels, (counts, total, count) in self._series.items()]
+        lines = []
+        for labels, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{self.name}_bucket{_format_labels(labels, ("le", le))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(labels)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(labels)} {count}')
+        return lines
+
+
+class Registry:
+    """Named metric families plus collectors sampled at scrape time"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: List[Callable[[], Iterable[tuple]]] = []
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[tuple]]):
+        """collector() yields (name, type, help, value, labels) samples"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        for metric in metrics:
+            kind = 'histogram' if isinstance(metric, Histogram) else 'counter'
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {kind}')
+            lines.extend(metric.render())
+
+        declared = set()
+        for collector in collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                logger.exception('Metrics collector failed')
+                continue
+            for name, kind, help_text, value, labels in samples:
+                if name not in declared:
+                    declared.add(name)
+                    lines.append(f'# HELP {name} {help_text}')
+                    lines.append(f'# TYPE {name} {kind}')
+                lines.append(f'{name}{_format_labels(_labels(labels))} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram('behavior_request_duration_seconds', 'View latency')
+REQUESTS = registry.counter('behavior_requests_total', 'Requests by view and status code')
+REQUEST_QUERIES = registry.histogram('behavior_request_db_queries', 'Database queries per request', QUERY_BUCKETS)
+REQUEST_DB_SECONDS = registry.histogram('behavior_request_db_seconds', 'Database time per request')
+REQUEST_BYTES = registry.histogram('behavior_request_bytes', 'Request body size', SIZE_BUCKETS)
+RESPONSE_BYTES = registry.histogram('behavior_response_bytes', 'Response body size', SIZE_BUCKETS)
+ANALYZER_SECONDS = registry.histogram('behavior_analyzer_duration_seconds', 'Analyzer operation latency')
+ANALYZER_EVENTS = registry.counter('behavior_analyzer_events_total', 'Analyzer events')
+SLOW_REQUESTS = registry.counter('behavior_slow_requests_total', 'Requests over the slow-request threshold')
+
+
+def increment(event: str, amount: float = 1):
+    """Count one named analyzer event"""
+    ANALYZER_EVENTS.inc(amount, event=event)
+
+
+@contextmanager
+def timer(operation: str):
+    """Time a block into the analyzer latency histogram"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        ANALYZER_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+
+def timed(operation: str):
+    """Decorator form of timer()"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                ANALYZER_SECONDS.observe(time.perf_counter() - started, operation=operation)
+        return wrapper
+    return decorator
+
+
+def _service_collector():
+    """Cache and write-behind state, read when scraped"""
+    from . import profile_aggregator
+    from .profile_cache import get_profile_cache
+
+    stats = get_profile_cache().stats()
+    yield ('behavior_profile_cache_hits_total', 'counter', 'Profile cache hits', stats['hits'], {})
+    yield ('behavior_profile_cache_misses_total', 'counter', 'Profile cache misses', stats['misses'], {})
+    if 'size' in stats:
+        yield ('behavior_profile_cache_entries', 'gauge', 'Profiles held in the local cache', stats['size'], {})
+        yield ('behavior_profile_cache_evictions_total', 'counter', 'Local cache evictions',
+               stats['evictions'], {})
+    if profile_aggregator._aggregator is not None:
+        yield ('behavior_write_behind_pending_games', 'gauge', 'Games queued for write-behind',
+               profile_aggregator._aggregator.pending_games, {})
+
+
+registry.register_collector(_service_collector)
+
+
+class _QueryStats:
+    """execute_wrapper that counts queries and their time"""
+
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.seconds += time.perf_counter() - started
+
+
+class SlowRequestWatchdog:
+    """Dumps the stack of any request still running past the threshold
+
+    A single background thread polls the in-flight requests, so requests
+    pay only for registering themselves.
+    """
+
+    def __init__(self, threshold: float, dump: Callable[[str, str, str], None]):
+        self.threshold = threshold
+        self.dump = dump
+        self._inflight: Dict[int, list] = {}  # thread id -> [started, label, dumped]
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def begin(self, label: str):
+        with self._lock:
+            self._inflight[threading.get_ident()] = [time.monotonic(), label, False]
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='slow-request-watchdog', daemon=True)
+                self._thread.start()
+
+    def end(self):
+        with self._lock:
+            self._inflight.pop(threading.get_ident(), None)
+
+    def _run(self):
+        while True:
+            time.sleep(self.threshold / 2)
+            now = time.monotonic()
+            with self._lock:
+                overdue = [
+                    (thread_id, entry) for thread_id, entry in self._inflight.items()
+                    if not entry[2] and now - entry[0] > self.threshold
+                ]
+                for _, entry in overdue:
+                    entry[2] = True
+            frames = sys._current_frames()
+            for thread_id, (_, label, _) in overdue:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    self.dump(label, 'stack.txt', ''.join(traceback.format_stack(frame)))
+
+
+class MetricsMiddleware:
+    """Per-view latency, status, query and payload metrics
+
+    Slow-request profiling is opt-in: BEHAVIOR_SLOW_REQUEST_MS sets the
+    threshold; requests over it get a stack dump, and a
+    BEHAVIOR_PROFILE_SAMPLE_RATE fraction of requests run under cProfile,
+    keeping the profile when they turn out slow. Only one request per
+    process is profiled at a time, since Python 3.12 allows a single active
+    profiler. Dumps go to BEHAVIOR_PROFILE_DIR, or to the log when it is
+    unset.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        threshold_ms = getattr(settings, 'BEHAVIOR_SLOW_REQUEST_MS', None)
+        self.slow_threshold = threshold_ms / 1000 if threshold_ms else None
+        self.sample_rate = getattr(settings, 'BEHAVIOR_PROFILE_SAMPLE_RATE', 0.0)
+        self.profile_dir = getattr(settings, 'BEHAVIOR_PROFILE_DIR', None)
+        self.watchdog = (
+            SlowRequestWatchdog(self.slow_threshold, self._dump) if self.slow_threshold else None
+        )
+        self._dump_ids = itertools.count()
+        self._profiling = threading.Lock()
+
+    def __call__(self, request):
+        label = request.path
+        profiler = None
+        if (self.slow_threshold and self.sample_rate and random.random() < self.sample_rate
+                and self._profiling.acquire(blocking=False)):
+            profiler = cProfile.Profile()
+        if self.watchdog is not None:
+            self.watchdog.begin(f'{request.method} {label}')
+
+        query_stats = _QueryStats()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(query_stats))
+                if profiler is not None:
+                    try:
+                        profiler.enable()
+                    except ValueError:  # Another profiler, e.g. a debugger or coverage, is active
+                        profiler = None
+                        self._profiling.release()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler is not None:
+                        profiler.disable()
+        finally:
+            if profiler is not None:
+                self._profiling.release()
+            if self.watchdog is not None:
+                self.watchdog.end()
+        elapsed = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        REQUEST_SECONDS.observe(elapsed, view=view)
+        REQUESTS.inc(view=view, status=response.status_code)
+        REQUEST_QUERIES.observe(query_stats.queries, view=view)
+        REQUEST_DB_SECONDS.observe(query_stats.seconds, view=view)
+        REQUEST_BYTES.observe(int(request.META.get('CONTENT_LENGTH') or 0), view=view)
+        if not response.streaming:
+            RESPONSE_BYTES.observe(len(response.content), view=view)
+
+        if self.slow_threshold and elapsed > self.slow_threshold:
+            SLOW_REQUESTS.inc(view=view)
+            if profiler is not None:
+                self._dump(f'{request.method} {label}', 'prof', profiler)
+        return response
+
+    def _dump(self, label: str, kind: str, payload):
+        if self.profile_dir is None:
+            if isinstance(payload, cProfile.Profile):
+                out = io.StringIO()
+                pstats.Stats(payload, stream=out).sort_stats('cumulative').print_stats(30)
+                payload = out.getvalue()
+            logger.warning('Slow request %s\n%s', label, payload)
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        slug = ''.join(c if c.isalnum() else '-' for c in label).strip('-')[:80]
+        name = f'{time.strftime("%Y%m%d-%H%M%S")}-{os.getpid()}-{next(self._dump_ids)}-{slug}.{kind}'
+        path = os.path.join(self.profile_dir, name)
+        if isinstance(payload, cProfile.Profile):
+            payload.dump_stats(path)
+        else:
+            with open(path, 'w') as fp:
+                fp.write(payload)
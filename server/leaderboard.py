@@ -0,0 +1,254 @@
+"""
+Incrementally Maintained Leaderboard
+Sorted in-process rankings with cursor pagination and rank lookups
+"""
+
+import base64
+import json
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+
+ORDERINGS = ('wins', 'win_rate', 'recent')
+LOAD_CHUNK = 5000
+
+
+class PlayerStanding(NamedTuple):
+    wins: int
+    losses: int
+    total_games: int
+    last_game_ts: Optional[float]  # Epoch seconds of the last game
+
+
+def encode_cursor(key: Tuple) -> str:
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+# Element types of each ordering's sort key, as they come back from JSON
+KEY_SHAPES = {
+    'wins': (int, int, str),
+    'win_rate': (float, int, str),
+    'recent': (float, str),
+}
+
+
+def _matches(value, kind: type) -> bool:
+    if isinstance(value, bool):
+        return False
+    if kind is float:
+        return isinstance(value, (int, float))
+    return isinstance(value, kind)
+
+
+def decode_cursor(cursor: str, ordering: str = 'wins') -> Tuple:
+    """Sort key from a page cursor; ValueError unless it has the ordering's key shape"""
+    try:
+        key = tuple(json.loads(base64.urlsafe_b64decode(cursor.encode())))
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+    shape = KEY_SHAPES[ordering]
+    if len(key) != len(shape) or not all(_matches(value, kind) for value, kind in zip(key, shape)):
+        raise ValueError('Invalid cursor')
+    return key
+
+
+class Leaderboard:
+    """One sorted key list per ordering, kept in step with profile updates
+
+    Lookups are binary searches, so rank queries are O(log n) and a page
+    costs O(log n + limit). Updates from this process are applied on
+    commit; writes from other workers are picked up by an indexed
+    last_updated range scan at most every sync_interval seconds. Writers
+    stamp last_updated before they commit, so each scan reaches back
+    sync_interval + sync_overlap seconds past the previous one.
+    """
+
+    def __init__(self, min_games: int = 10, recent_days: float = 7,
+                 sync_interval: float = 5.0, sync_overlap: float = 30.0):
+        self.min_games = min_games
+        self.recent_window = timedelta(days=recent_days).total_seconds()
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+
+        self._standings: Dict[str, PlayerStanding] = {}
+        self._keys: Dict[str, List[Tuple]] = {ordering: [] for ordering in ORDERINGS}
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._synced_at = None
+        self._next_sync = 0.0
+        self.version = 0
+
+    def _key(self, ordering: str, name: str, standing: PlayerStanding) -> Optional[Tuple]:
+        if ordering == 'wins':
+            return (-standing.wins, standing.losses, name)
+        if ordering == 'win_rate':
+            if standing.total_games < self.min_games:
+                return None
+            win_rate = round(standing.wins / standing.total_games, 6)
+            return (-win_rate, -standing.total_games, name)
+        if standing.last_game_ts is None:
+            return None
+        return (-standing.last_game_ts, name)
+
+    def _apply(self, name: str, standing: Optional[PlayerStanding]):
+        if self._standings.get(name) == standing:
+            return  # Rows seen again in an overlapping sync
+        previous = self._standings.pop(name, None)
+        for ordering, keys in self._keys.items():
+            if previous is not None:
+                old_key = self._key(ordering, name, previous)
+                if old_key is not None:
+                    del keys[bisect_left(keys, old_key)]
+            if standing is not None:
+                new_key = self._key(ordering, name, standing)
+                if new_key is not None:
+                    insort(keys, new_key)
+        if standing is not None:
+            self._standings[name] = standing
+        self.version += 1
+
+    @staticmethod
+    def _standing(wins, losses, total_games, last_game_at) -> Optional[PlayerStanding]:
+        if total_games < 1:
+            return None
+        return PlayerStanding(
+            wins, losses, total_games,
+            last_game_at.timestamp() if last_game_at else None
+        )
+
+    def record(self, profile):
+        """Apply a profile's fresh counters; no-op until the board is loaded"""
+        with self._lock:
+            if self._loaded:
+                self._apply(profile.player_name, self._standing(
+                    profile.wins, profile.losses, profile.total_games, profile.last_game_at
+                ))
+
+    def _load(self):
+        from .ai_models import PlayerBehaviorProfile
+
+        self._synced_at = timezone.now()
+        rows = PlayerBehaviorProfile.objects.filter(total_games__gte=1).values_list(
+            'player_name', 'wins', 'losses', 'total_games', 'last_game_at'
+        ).iterator(chunk_size=LOAD_CHUNK)
+        for name, wins, losses, total_games, last_game_at in rows:
+            standing = self._standing(wins, losses, total_games, last_game_at)
+            self._standings[name] = standing
+            for ordering, keys in self._keys.items():
+                key = self._key(ordering, name, standing)
+                if key is not None:
+                    keys.append(key)
+        for keys in self._keys.values():
+            keys.sort()
+        self._loaded = True
+        self.version += 1
+
+    def _sync(self):
+        from .ai_models import PlayerBehaviorProfile
+
+        synced_at = timezone.now()
+        rows = PlayerBehaviorProfile.objects.filter(
+            last_updated__gte=self._synced_at - timedelta(seconds=self.sync_interval + self.sync_overlap)
+        ).values_list('player_name', 'wins', 'losses', 'total_games', 'last_game_at')
+        for name, wins, losses, total_games, last_game_at in rows:
+            self._apply(name, self._standing(wins, losses, total_games, last_game_at))
+        self._synced_at = synced_at
+
+    def ensure_fresh(self):
+        """Load on first use, then pull rows other workers changed"""
+        with self._lock:
+            now = time.monotonic()
+            if not self._loaded:
+                self._load()
+            elif now >= self._next_sync:
+                self._sync()
+            else:
+                return
+            self._next_sync = now + self.sync_interval
+
+    def _window_end(self, ordering: str, keys: List[Tuple]) -> int:
+        if ordering != 'recent':
+            return len(keys)
+        cutoff = time.time() - self.recent_window
+        return bisect_left(keys, (-cutoff,))
+
+    def _entry(self, rank: int, name: str) -> Dict:
+        standing = self._standings[name]
+        return {
+            'rank': rank,
+            'playerName': name,
+            'wins': standing.wins,
+            'losses': standing.losses,
+            'totalGames': standing.total_games,
+            'winRate': round(standing.wins / max(standing.total_games, 1) * 100, 1)
+        }
+
+    def page_version(self, ordering: str = 'wins') -> Tuple[int, int]:
+        """Changes whenever a page of this ordering may change, including players leaving the recent window"""
+        if ordering not in ORDERINGS:
+            raise ValueError(f'Unknown ordering: {ordering}')
+        self.ensure_fresh()
+        with self._lock:
+            return self.version, self._window_end(ordering, self._keys[ordering])
+
+    def page(self, ordering: str = 'wins', cursor: Optional[str] = None,
+             limit: int = 50) -> Tuple[List[Dict], Optional[str]]:
+        """One page of entries plus the cursor for the next page"""
+        if ordering not in ORDERINGS:
+            raise ValueError(f'Unknown ordering: {ordering}')
+        self.ensure_fresh()
+        with self._lock:
+            keys = self._keys[ordering]
+            start = bisect_right(keys, decode_cursor(cursor, ordering)) if cursor else 0
+            end = min(start + limit, self._window_end(ordering, keys))
+            entries = [self._entry(i + 1, keys[i][-1]) for i in range(start, end)]
+            has_more = end < self._window_end(ordering, keys)
+            next_cursor = encode_cursor(keys[end - 1]) if has_more and entries else None
+        return entries, next_cursor
+
+    def rank(self, player_name: str, ordering: str = 'wins',
+             neighbours: int = 5) -> Optional[Dict]:
+        """Rank of one player plus the entries around it, None if unranked"""
+        if ordering not in ORDERINGS:
+            raise ValueError(f'Unknown ordering: {ordering}')
+        self.ensure_fresh()
+        with self._lock:
+            standing = self._standings.get(player_name)
+            key = self._key(ordering, player_name, standing) if standing else None
+            if key is None:
+                return None
+            keys = self._keys[ordering]
+            index = bisect_left(keys, key)
+            end = self._window_end(ordering, keys)
+            if index >= end:
+                return None
+            lo, hi = max(index - neighbours, 0), min(index + neighbours + 1, end)
+            return {
+                'rank': index + 1,
+                'total': end,
+                'neighbours': [self._entry(i + 1, keys[i][-1]) for i in range(lo, hi)]
+            }
+
+
+_leaderboard: Optional[Leaderboard] = None
+_leaderboard_lock = threading.Lock()
+
+
+def get_leaderboard() -> Leaderboard:
+    """Process-wide leaderboard configured from settings"""
+    global _leaderboard
+    with _leaderboard_lock:
+        if _leaderboard is None:
+            _leaderboard = Leaderboard(
+                min_games=getattr(settings, 'BEHAVIOR_LEADERBOARD_MIN_GAMES', 10),
+                recent_days=getattr(settings, 'BEHAVIOR_LEADERBOARD_RECENT_DAYS', 7),
+                sync_interval=getattr(settings, 'BEHAVIOR_LEADERBOARD_SYNC_INTERVAL', 5.0),
+                sync_overlap=getattr(settings, 'BEHAVIOR_SYNC_OVERLAP', 30.0),
+            )
+        return _leaderboard
@@ -0,0 +1,81 @@
+"""
+Benchmark the behavior API and analyzer against a throwaway test database
+"""
+
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from ...benchmarks import (
+    SyntheticPlayers, bench_analyzer, bench_endpoints, compare, environment, seed,
+)
+from ...profile_cache import isolated_profile_cache
+
+
+class Command(BaseCommand):
+    help = 'Measure endpoint latency, throughput and query counts plus analyzer microbenchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', type=int, default=1000)
+        parser.add_argument('--games', type=int, default=5000, help='Games seeded before measuring')
+        parser.add_argument('--skew', type=float, default=1.0,
+                            help='Zipf exponent of player activity (0 = uniform)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--endpoints', help='Comma-separated view names (default: all)')
+        parser.add_argument('--sizes', default='100,10000,1000000',
+                            help='Stored-move history sizes for the analyzer microbenchmarks')
+        parser.add_argument('--repeat', type=int, default=50, help='Calls per microbenchmark')
+        parser.add_argument('--skip-endpoints', action='store_true')
+        parser.add_argument('--skip-analyzer', action='store_true')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+        parser.add_argument('--baseline', help='Earlier report to compare p95 latency against')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            # Entries from the throwaway database must never reach the real cache
+            with isolated_profile_cache():
+                report = self._run(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options['baseline']:
+            with open(options['baseline']) as fp:
+                report['comparison'] = compare(json.load(fp), report)
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fp:
+                fp.write(output)
+            self.stderr.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _run(self, options):
+        players = SyntheticPlayers(options['players'], options['skew'], options['seed'])
+        report = {
+            'startedAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'environment': environment(),
+            'parameters': {
+                key: options[key]
+                for key in ('players', 'games', 'skew', 'requests', 'sizes', 'repeat', 'seed')
+            },
+        }
+
+        if not options['skip_endpoints']:
+            started = time.perf_counter()
+            report['seededMoves'] = seed(players, options['games'])
+            report['seedSeconds'] = round(time.perf_counter() - started, 3)
+            endpoints = options['endpoints'].split(',') if options['endpoints'] else None
+            report['endpoints'] = bench_endpoints(players, options['requests'], endpoints)
+
+        if not options['skip_analyzer']:
+            sizes = [int(size) for size in options['sizes'].split(',') if size]
+            report['analyzer'] = bench_analyzer(players, sizes, options['repeat'])
+        return report
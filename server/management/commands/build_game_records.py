@@ -0,0 +1,50 @@
+"""
+Pack stored MoveEvent history into per-game records
+"""
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Exists, Max, Min, OuterRef
+
+from ...ai_models import BOARD_CELLS, GameRecord, MoveEvent, PatternAnalysis
+
+
+RESET_CHUNK = 1000
+
+
+class Command(BaseCommand):
+    help = 'Write a GameRecord for every stored game that does not have one yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Games packed per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        unpacked = MoveEvent.objects.filter(~Exists(
+            GameRecord.objects.filter(player_id=OuterRef('player_id'), game_id=OuterRef('game_id'))
+        ))
+        bounds = MoveEvent.objects.aggregate(low=Min('id'), high=Max('id'))
+
+        # Walk the events in id ranges of at most batch_size games each
+        written = 0
+        touched = set()
+        if bounds['low'] is not None:
+            span = batch_size * BOARD_CELLS
+            for start in range(bounds['low'], bounds['high'] + 1, span):
+                games = list(unpacked.filter(id__gte=start, id__lt=start + span).values_list(
+                    'player_id', 'game_id'
+                ).distinct())
+                if not games:
+                    continue
+                with transaction.atomic():
+                    written += GameRecord.rebuild(games)
+                touched.update(player_id for player_id, _ in games)
+
+        # Markov tables, context tries and response statistics of these players are rebuilt on next read
+        touched = sorted(touched)
+        for start in range(0, len(touched), RESET_CHUNK):
+            PatternAnalysis.objects.filter(player_id__in=touched[start:start + RESET_CHUNK]).update(
+                markov_built=False, response_stats=b'', context_trie=b''
+            )
+        self.stdout.write(self.style.SUCCESS(f'Packed {written} games for {len(touched)} players'))
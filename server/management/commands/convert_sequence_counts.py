@@ -0,0 +1,43 @@
+"""
+Convert legacy common_sequences JSON into fixed-size sequence counts
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ...ai_models import PlayerBehaviorProfile
+
+
+class Command(BaseCommand):
+    help = 'Convert every profile still carrying a common_sequences dict'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Profiles written per bulk_update')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        # last_updated moves too, so cached profile responses are re-encoded
+        fields = ['sequence_counts', 'common_sequences', 'exploitability_score', 'last_updated']
+        now = timezone.now()
+        pending = PlayerBehaviorProfile.objects.filter(sequence_counts=b'').only(
+            'id', 'common_sequences', 'sequence_counts'
+        ).order_by('id')
+
+        converted = 0
+        batch = []
+        for profile in pending.iterator(chunk_size=batch_size):
+            counts = profile.get_sequence_counts()
+            profile.set_sequence_counts(counts)
+            profile.exploitability_score = counts.exploitability()
+            profile.last_updated = now
+            batch.append(profile)
+            if len(batch) >= batch_size:
+                PlayerBehaviorProfile.objects.bulk_update(batch, fields)
+                converted += len(batch)
+                batch = []
+        if batch:
+            PlayerBehaviorProfile.objects.bulk_update(batch, fields)
+            converted += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Converted {converted} profiles'))
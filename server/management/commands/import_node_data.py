@@ -0,0 +1,35 @@
+"""
+Import the Node server's data.json into the behavior models
+"""
+
+from django.core.management.base import BaseCommand
+
+from ...node_import import PROFILE_BATCH_SIZE, import_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Import players, sessions and AI move history from a Node data.json snapshot'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to data.json')
+        parser.add_argument('--state-file',
+                            help='Checkpoint file (default: <path>.import-state)')
+        parser.add_argument('--batch-size', type=int, default=PROFILE_BATCH_SIZE,
+                            help='Players written per batch')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint and re-read the whole snapshot')
+
+    def handle(self, *args, **options):
+        summary = import_snapshot(
+            options['path'],
+            state_path=options['state_file'],
+            batch_size=options['batch_size'],
+            restart=options['restart'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Profiles: {summary.get('profiles_created', 0)} created, "
+            f"{summary.get('profiles_updated', 0)} updated, "
+            f"{summary.get('profiles_unchanged', 0)} unchanged; "
+            f"moves: {summary.get('moves', 0)} in {summary.get('games', 0)} games"
+        ))
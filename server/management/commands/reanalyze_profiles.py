@@ -0,0 +1,27 @@
+"""
+Recompute strategy type, behavioral embedding, exploitability and Markov
+tables for every player from the stored game records
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...batch_analysis import reanalyze_all
+
+
+class Command(BaseCommand):
+    help = 'Re-analyze every player profile from stored moves'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes to split players across')
+        parser.add_argument('--chunk-size', type=int, default=20000,
+                            help='GameRecord rows fetched per chunk')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        players = reanalyze_all(workers=options['workers'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Re-analyzed {players} players in {time.monotonic() - started:.1f}s'
+        ))
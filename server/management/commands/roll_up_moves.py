@@ -0,0 +1,29 @@
+"""
+Roll expired move history into per-player, per-day summaries
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from ...retention import retention_cutoff, roll_up
+
+
+class Command(BaseCommand):
+    help = 'Summarize and delete game records and move events older than the retention window'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Keep this many days of raw moves (default: BEHAVIOR_RETENTION_DAYS or 90)')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Games summarized and deleted per transaction')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        cutoff = retention_cutoff(options['days'])
+        rolled = roll_up(cutoff, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rolled up {rolled['games']} games ({rolled['moves']} moves) from before "
+            f"{cutoff:%Y-%m-%d %H:%M} into {rolled['summaries']} new daily summaries "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
@@ -0,0 +1,60 @@
+"""
+Simulate stored players against AI opponents of graded strength and refit
+the calculate_difficulty weights
+"""
+
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...self_play import run
+
+
+class Command(BaseCommand):
+    help = 'Play player models against AI strengths and report outcomes and fitted difficulty weights'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--players', help='Comma-separated player names (default: most active)')
+        parser.add_argument('--max-players', type=int, default=1000)
+        parser.add_argument('--min-games', type=int, default=5,
+                            help='Stored games a player needs to be simulated')
+        parser.add_argument('--strengths', default='0,0.25,0.5,0.75,1',
+                            help='AI strengths: the share of moves played perfectly')
+        parser.add_argument('--games', type=int, default=1000, help='Games per player and strength')
+        parser.add_argument('--target-win-rate', type=float, default=0.25,
+                            help='Player win rate the ideal difficulty aims for')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=50000, help='Games played per task')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+
+    def handle(self, *args, **options):
+        strengths = [float(strength) for strength in options['strengths'].split(',') if strength]
+        if not strengths or not all(0 <= strength <= 1 for strength in strengths):
+            raise CommandError('Strengths must lie between 0 and 1')
+
+        report = run(
+            player_names=options['players'].split(',') if options['players'] else None,
+            min_games=options['min_games'],
+            max_players=options['max_players'],
+            strengths=strengths,
+            games=options['games'],
+            target_win_rate=options['target_win_rate'],
+            workers=options['workers'],
+            batch_size=options['batch_size'],
+            seed=options['seed'],
+        )
+        if not report['games']:
+            raise CommandError('No stored players to simulate')
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as fp:
+                fp.write(output)
+            self.stderr.write(self.style.SUCCESS(
+                f"Simulated {report['games']} games ({report['gamesPerMinute']}/min); "
+                f"fitted weights {report['fit']['fittedWeights']}, report written to {options['output']}"
+            ))
+        else:
+            self.stdout.write(output)
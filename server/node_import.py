@@ -0,0 +1,544 @@
+"""
+Node Data Import
+Streams the Node server's data.json into the behavior models in bounded
+memory, skipping everything a previous import already wrote
+"""
+
+import json
+import os
+import re
+from array import array
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone as dt_timezone
+from json.decoder import scanstring
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from .ai_models import (
+    MOVE_EVENT_BATCH_SIZE, GameRecord, MoveEvent, PatternAnalysis, PlayerBehaviorProfile,
+)
+from .profile_cache import get_profile_cache
+from .sequence_sketch import SequenceCounts
+from .symmetry import canonical_cell, fold_sequences, sequence_space, symmetry_enabled
+from .solver import WIN_LINES
+
+
+READ_CHUNK = 1 << 20  # characters
+PROFILE_BATCH_SIZE = 500
+GAME_BATCH_SIZE = 200
+GAME_IDLE_ENTRIES = 100  # moveHistory entries after which an unseen game is complete
+OUTCOME_WINDOW_MS = 60000  # A win/loss session event this soon after a game settles it
+OPENINGS_KEPT = 50
+PLAYER_MARK, AI_MARK = 'X', 'O'  # As in behavior_analyzer.js
+
+PROFILE_IMPORT_FIELDS = [
+    'total_games', 'wins', 'losses', 'draws', 'preferred_openings', 'sequence_counts',
+    'common_sequences', 'average_response_time', 'exploitability_score', 'decayed_stats',
+    'last_game_at', 'last_updated',
+]
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRUCTURE = re.compile(r'["{}\[\]]')
+_GAME_ID_START = re.compile(r'game_(\d+)_')
+_decoder = json.JSONDecoder()
+
+
+class JsonStream:
+    """Pull parser over a JSON document read in fixed-size chunks
+
+    Containers are walked with items()/elements(); the caller consumes
+    each member with value() or skip() before advancing.
+    """
+
+    def __init__(self, fp, chunk_size: int = READ_CHUNK):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+
+    def _fill(self) -> bool:
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def _expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f'Expected one of {chars!r} at {char!r}')
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decode the value at the cursor"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number or literal may run on into the next chunk
+            if end == len(self.buffer) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def skip(self):
+        """Step over the value at the cursor without building it"""
+        if self.peek() not in '{[':
+            self.value()
+            return
+        depth = 0
+        while True:
+            match = _STRUCTURE.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self._fill():
+                    raise ValueError('Unexpected end of JSON')
+                continue
+            char = match.group()
+            if char == '"':
+                try:
+                    _, self.pos = scanstring(self.buffer, match.end())
+                except json.JSONDecodeError:
+                    self.pos = match.start()
+                    if not self._fill():
+                        raise
+                continue
+            self.pos = match.end()
+            depth += 1 if char in '{[' else -1
+            if depth == 0:
+                return
+
+    def items(self) -> Iterator[str]:
+        """Yield the keys of the object at the cursor"""
+        self._expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self._expect(':')
+            yield key
+            if self._expect(',}') == '}':
+                return
+
+    def elements(self) -> Iterator[int]:
+        """Yield the positions of the array at the cursor"""
+        self._expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        position = 0
+        while True:
+            yield position
+            position += 1
+            if self._expect(',]') == ']':
+                return
+
+
+def _ms_to_datetime(ms) -> Optional[datetime]:
+    if not isinstance(ms, (int, float)) or ms <= 0:
+        return None
+    return datetime.fromtimestamp(ms / 1000, tz=dt_timezone.utc)
+
+
+def _count(value) -> int:
+    return int(value) if isinstance(value, (int, float)) and value > 0 else 0
+
+
+def profile_fields(record: Dict) -> Dict:
+    """PlayerBehaviorProfile columns carried by one players[name] record"""
+    stats = record.get('behaviorStats') or {}
+    if stats:
+        wins, losses, draws = (_count(stats.get(key)) for key in ('wins', 'losses', 'draws'))
+        total_games = max(_count(stats.get('totalGames')), wins + losses + draws)
+    else:
+        wins, losses, draws = _count(record.get('wins')), _count(record.get('losses')), 0
+        total_games = wins + losses
+
+    # Most frequent openings last, so the recent window favours them
+    opening_counts = sorted(
+        (_count(count), int(cell))
+        for cell, count in (stats.get('preferredOpenings') or {}).items()
+        if cell.isdigit() and int(cell) < 9
+    )
+    openings = []
+    for count, cell in opening_counts:
+        openings.extend([cell] * min(count, OPENINGS_KEPT))
+
+    sequences = SequenceCounts.from_legacy(stats.get('commonSequences') or {})
+    if symmetry_enabled():
+        openings = [canonical_cell(cell) for cell in openings]
+        sequences = SequenceCounts.from_counts(fold_sequences(sequences.counts))
+    return {
+        'total_games': total_games,
+        'wins': wins,
+        'losses': losses,
+        'draws': draws,
+        'preferred_openings': openings[-OPENINGS_KEPT:],
+        'sequence_counts': sequences.to_bytes(),
+        'common_sequences': {},
+        'average_response_time': float(stats.get('averageResponseTime') or 0),
+        'exploitability_score': sequences.exploitability(sequence_space()),
+        'decayed_stats': b'',  # Re-seeded from the imported totals on next use
+        'last_game_at': _ms_to_datetime(stats.get('lastGameAt') or record.get('lastActive')),
+    }
+
+
+def _invalidate(names: List[str]):
+    cache = get_profile_cache()
+    for name in names:
+        cache.invalidate(name)
+
+
+def write_profiles(batch: List[Tuple[str, Dict]], summary: Dict[str, int]):
+    """Upsert one batch of player records, leaving rows that are already as new"""
+    now = timezone.now()
+    with transaction.atomic():
+        existing = {
+            profile.player_name: profile
+            for profile in PlayerBehaviorProfile.objects.filter(
+                player_name__in=[name for name, _ in batch]
+            ).only('id', 'player_name', 'last_game_at')
+        }
+        created, updated = [], []
+        for name, record in batch:
+            fields = profile_fields(record)
+            profile = existing.get(name)
+            if profile is None:
+                created.append(PlayerBehaviorProfile(player_name=name, **fields))
+            elif profile.last_game_at is not None and (
+                fields['last_game_at'] is None or profile.last_game_at >= fields['last_game_at']
+            ):
+                summary['profiles_unchanged'] += 1
+            else:
+                for field, value in fields.items():
+                    setattr(profile, field, value)
+                profile.last_updated = now
+                updated.append(profile)
+
+        PlayerBehaviorProfile.objects.bulk_create(created, batch_size=MOVE_EVENT_BATCH_SIZE)
+        PlayerBehaviorProfile.objects.bulk_update(
+            updated, PROFILE_IMPORT_FIELDS, batch_size=MOVE_EVENT_BATCH_SIZE
+        )
+        names = [profile.player_name for profile in updated]
+        transaction.on_commit(lambda: _invalidate(names))
+
+    summary['profiles_created'] += len(created)
+    summary['profiles_updated'] += len(updated)
+
+
+class SessionLog:
+    """Session events held as integer arrays, for attributing games to players
+
+    Node records who started playing and who won or lost, but not which
+    game each event belongs to: a game goes to the player with the latest
+    start before it, and takes its result from that player's next win/loss.
+    """
+
+    def __init__(self):
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._start_times = array('q')
+        self._start_names = array('q')
+        self._outcomes: Dict[int, array] = defaultdict(lambda: array('q'))  # time * 2 + won
+
+    def add(self, event):
+        if not isinstance(event, dict):
+            return
+        name, time = event.get('name'), event.get('time')
+        if not isinstance(name, str) or not isinstance(time, (int, float)):
+            return
+        name_id = self._ids.get(name)
+        if name_id is None:
+            name_id = self._ids[name] = len(self.names)
+            self.names.append(name)
+        if event.get('type') == 'start':
+            self._start_times.append(int(time))
+            self._start_names.append(name_id)
+        elif event.get('type') in ('win', 'loss'):
+            self._outcomes[name_id].append(int(time) * 2 + (event['type'] == 'win'))
+
+    def finish(self):
+        """Sort the collected events for lookups"""
+        times = np.frombuffer(self._start_times, dtype=np.int64) if self._start_times else np.zeros(0, np.int64)
+        names = np.frombuffer(self._start_names, dtype=np.int64) if self._start_names else np.zeros(0, np.int64)
+        order = np.argsort(times, kind='stable')
+        self._start_times, self._start_names = times[order], names[order]
+        self._outcomes = {
+            name_id: np.sort(np.frombuffer(events, dtype=np.int64))
+            for name_id, events in self._outcomes.items()
+        }
+
+    def player_at(self, time_ms: int) -> Optional[str]:
+        i = int(np.searchsorted(self._start_times, time_ms, side='right')) - 1
+        return self.names[self._start_names[i]] if i >= 0 else None
+
+    def outcome(self, player_name: str, after_ms: int) -> str:
+        events = self._outcomes.get(self._ids.get(player_name))
+        if events is None:
+            return 'ongoing'
+        i = int(np.searchsorted(events, after_ms * 2))
+        if i < len(events) and events[i] // 2 <= after_ms + OUTCOME_WINDOW_MS:
+            return 'win' if events[i] & 1 else 'loss'
+        return 'ongoing'
+
+
+def _game_phase(board: List[str]) -> str:
+    filled = sum(1 for cell in board if cell)
+    if filled <= 2:
+        return 'opening'
+    return 'midgame' if filled <= 6 else 'endgame'
+
+
+def _move_type(board: List[str], move_index: int) -> str:
+    """Offensive if the move wins, defensive if it takes the AI's winning cell"""
+    lines = [line for line in WIN_LINES if move_index in line]
+    others = [[board[i] for i in line if i != move_index] for line in lines]
+    if any(cells == [PLAYER_MARK, PLAYER_MARK] for cells in others):
+        return 'offensive'
+    if any(cells == [AI_MARK, AI_MARK] for cells in others):
+        return 'defensive'
+    return 'neutral'
+
+
+def player_moves(entries: List[Tuple[int, List[str]]], game_start: int) -> List[Dict]:
+    """The player's moves rebuilt from one game's AI entries, oldest first
+
+    Each entry holds the board the AI saw before moving, so player marks
+    that appeared since the previous entry are the player's replies.
+    """
+    moves = []
+    previous = None
+    for timestamp, board in sorted(entries, key=lambda entry: entry[0]):
+        if previous is None:
+            placed = [i for i, cell in enumerate(board) if cell == PLAYER_MARK]
+            if len(placed) > 1:
+                placed = []  # History starts mid-game; the order is lost
+        else:
+            placed = [
+                i for i, cell in enumerate(board)
+                if cell == PLAYER_MARK and previous[1][i] != PLAYER_MARK
+            ]
+        before = ['' if i in placed else cell for i, cell in enumerate(board)]
+        for cell in placed:
+            moves.append({
+                'moveIndex': cell,
+                'boardState': list(before),
+                'timestamp': max(timestamp - game_start, 0),
+                'responseTime': timestamp - previous[0] if previous and len(placed) == 1 else 0,
+                'gamePhase': _game_phase(before),
+                'moveType': _move_type(before, cell),
+                'moveNumber': before.count(PLAYER_MARK) + 1,
+            })
+            before[cell] = PLAYER_MARK
+        previous = (timestamp, board)
+    return moves
+
+
+def write_games(games: List[Tuple[str, List]], sessions: SessionLog, summary: Dict[str, int]):
+    """Persist the moves of finished games that are not stored yet"""
+    rebuilt = []
+    for game_id, entries in games:
+        match = _GAME_ID_START.match(game_id)
+        game_start = int(match.group(1)) if match else min(entry[0] for entry in entries)
+        player_name = sessions.player_at(game_start)
+        moves = player_moves(entries, game_start) if player_name else []
+        if not moves:
+            summary['games_skipped'] += 1
+            continue
+        result = sessions.outcome(player_name, max(entry[0] for entry in entries))
+        rebuilt.append((game_id, player_name, moves, result))
+    if not rebuilt:
+        return
+
+    names = {player_name for _, player_name, _, _ in rebuilt}
+    with transaction.atomic():
+        profile_ids = dict(PlayerBehaviorProfile.objects.filter(
+            player_name__in=names
+        ).values_list('player_name', 'id'))
+        missing = names - profile_ids.keys()
+        if missing:
+            PlayerBehaviorProfile.objects.bulk_create(
+                [PlayerBehaviorProfile(player_name=name) for name in missing],
+                ignore_conflicts=True,
+            )
+            profile_ids = dict(PlayerBehaviorProfile.objects.filter(
+                player_name__in=names
+            ).values_list('player_name', 'id'))
+
+        stored = set(MoveEvent.objects.filter(
+            game_id__in=[game_id for game_id, _, _, _ in rebuilt]
+        ).values_list('game_id', 'move_number'))
+        events = []
+        touched = {}
+        written_games = []
+        for game_id, player_name, moves, result in rebuilt:
+            new_moves = [m for m in moves if (game_id, m['moveNumber']) not in stored]
+            if not new_moves:
+                continue
+            touched[profile_ids[player_name]] = player_name
+            written_games.append((profile_ids[player_name], game_id))
+            summary['games'] += 1
+            events.extend(
+                MoveEvent(
+                    game_id=game_id,
+                    player_id=profile_ids[player_name],
+                    move_index=m['moveIndex'],
+                    board_state=m['boardState'],
+                    timestamp=m['timestamp'],
+                    response_time=m['responseTime'],
+                    game_phase=m['gamePhase'],
+                    move_type=m['moveType'],
+                    move_number=m['moveNumber'],
+                    result=result,
+                )
+                for m in new_moves
+            )
+        MoveEvent.objects.bulk_create(events, batch_size=MOVE_EVENT_BATCH_SIZE)
+        summary['moves'] += len(events)
+        GameRecord.rebuild(written_games)
+
+        if touched:
+            # Markov tables, context tries and response statistics are rebuilt from history on next read
+            analysed = set(PatternAnalysis.objects.filter(
+                player_id__in=touched
+            ).values_list('player_id', flat=True))
+            PatternAnalysis.objects.bulk_create(
+                [PatternAnalysis(player_id=pid) for pid in touched if pid not in analysed]
+            )
+            PatternAnalysis.objects.filter(player_id__in=touched).update(
+                markov_built=False, response_stats=b'', context_trie=b''
+            )
+            transaction.on_commit(lambda: _invalidate(list(touched.values())))
+
+
+def _load_state(state_path: str, fingerprint: List[int]) -> Dict:
+    fresh = {'fingerprint': fingerprint, 'players': 0, 'moves': False}
+    try:
+        with open(state_path) as fp:
+            state = json.load(fp)
+    except (OSError, ValueError):
+        return fresh
+    return state if state.get('fingerprint') == fingerprint else fresh
+
+
+def _save_state(state_path: str, state: Dict):
+    temp_path = f'{state_path}.tmp'
+    with open(temp_path, 'w') as fp:
+        json.dump(state, fp)
+    os.replace(temp_path, state_path)
+
+
+def import_snapshot(path: str, state_path: Optional[str] = None,
+                    batch_size: int = PROFILE_BATCH_SIZE, restart: bool = False,
+                    log: Optional[Callable[[str], None]] = None) -> Dict[str, int]:
+    """Import one data.json snapshot; safe to rerun and to resume
+
+    Progress is checkpointed to state_path after every committed batch and
+    only trusted while the snapshot is unchanged. Every write is also
+    idempotent on its own: profiles no newer than the stored row are left
+    alone and moves already stored for a game are not inserted again, so
+    a newer snapshot imports as a delta. Memory holds one batch, the games
+    still open in moveHistory and the session log as integer arrays.
+    """
+    log = log or (lambda message: None)
+    state_path = state_path or f'{path}.import-state'
+    stat = os.stat(path)
+    state = {'fingerprint': [stat.st_size, stat.st_mtime_ns], 'players': 0, 'moves': False}
+    if not restart:
+        state = _load_state(state_path, state['fingerprint'])
+    summary = defaultdict(int)
+    sessions = SessionLog()
+
+    # Pass 1: players in batches, plus the session log for attributing games
+    with open(path, encoding='utf-8') as fp:
+        stream = JsonStream(fp)
+        for section in stream.items():
+            if section == 'players':
+                seen = 0
+                batch = []
+                for name in stream.items():
+                    seen += 1
+                    if seen <= state['players']:
+                        stream.skip()
+                        continue
+                    record = stream.value()
+                    if isinstance(record, dict) and 0 < len(name) <= 255:
+                        batch.append((name, record))
+                    if len(batch) >= batch_size:
+                        write_profiles(batch, summary)
+                        batch = []
+                        state['players'] = seen
+                        _save_state(state_path, state)
+                if batch:
+                    write_profiles(batch, summary)
+                state['players'] = seen
+                _save_state(state_path, state)
+                log(f'Players: {seen} read')
+            elif section == 'sessions' and not state['moves']:
+                for _ in stream.elements():
+                    sessions.add(stream.value())
+            else:
+                stream.skip()
+    sessions.finish()
+
+    if state['moves']:
+        return dict(summary)
+
+    # Pass 2: ai.moveHistory, grouped into games as they go idle
+    with open(path, encoding='utf-8') as fp:
+        stream = JsonStream(fp)
+        for section in stream.items():
+            if section != 'ai':
+                stream.skip()
+                continue
+            for key in stream.items():
+                if key != 'moveHistory':
+                    stream.skip()
+                    continue
+                open_games: 'OrderedDict[str, Tuple[int, List]]' = OrderedDict()
+                finished = []
+                for position in stream.elements():
+                    entry = stream.value()
+                    if not isinstance(entry, dict):
+                        continue
+                    game_id, board = entry.get('gameId'), entry.get('boardState')
+                    timestamp = entry.get('timestamp')
+                    if (not isinstance(game_id, str) or not isinstance(timestamp, (int, float))
+                            or not isinstance(board, list) or len(board) != 9):
+                        continue
+                    _, entries = open_games.pop(game_id, (position, []))
+                    entries.append((int(timestamp), board))
+                    open_games[game_id] = (position, entries)
+
+                    while open_games:
+                        oldest_id, (last_seen, _) = next(iter(open_games.items()))
+                        if position - last_seen < GAME_IDLE_ENTRIES:
+                            break
+                        finished.append((oldest_id, open_games.pop(oldest_id)[1]))
+                    if len(finished) >= GAME_BATCH_SIZE:
+                        write_games(finished, sessions, summary)
+                        finished = []
+                finished.extend((game_id, entries) for game_id, (_, entries) in open_games.items())
+                for start in range(0, len(finished), GAME_BATCH_SIZE):
+                    write_games(finished[start:start + GAME_BATCH_SIZE], sessions, summary)
+                log(f'Games: {summary["games"]} imported')
+
+    state['moves'] = True
+    _save_state(state_path, state)
+    return dict(summary)
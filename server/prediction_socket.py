@@ -0,0 +1,185 @@
+"""
+Streaming Prediction Channel
+Session-scoped WebSocket endpoint served straight from ASGI: a game opens
+once, then each move is pushed and answered from the profile held in memory
+"""
+
+import asyncio
+import json
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .ai_models import BOARD_CELLS, WARM_START_GAMES, BehaviorAnalyzer, board_code
+from .profile_cache import CachedProfile
+from .response_stats import ResponseStats
+
+
+SOCKET_PATH = '/api/behavior/stream'
+PLAYER_MARK, AI_MARK = 'X', 'O'
+
+
+class GameSession:
+    """One game's board and the player's model, loaded once when the game opens"""
+
+    __slots__ = ('player_name', 'game_id', 'cached', 'stats', 'warm_table',
+                 'board', 'move_history', 'last_event_at')
+
+    def __init__(self, player_name: str, game_id: Optional[str],
+                 cached: Optional[CachedProfile], warm_table: Optional[np.ndarray]):
+        self.player_name = player_name
+        self.game_id = game_id
+        self.cached = cached
+        # Moves in this game count towards timing checks before the game is recorded
+        self.stats = (
+            ResponseStats.from_bytes(cached.response_stats.to_bytes()) if cached else ResponseStats()
+        )
+        self.warm_table = warm_table
+        self.board = [''] * BOARD_CELLS
+        self.move_history: List[int] = []
+        self.last_event_at = time.monotonic()
+
+    @classmethod
+    def open(cls, player_name: str, game_id: Optional[str] = None) -> 'GameSession':
+        """Load everything a session needs; touches the database, so run it off the event loop"""
+        cached = BehaviorAnalyzer.get_cached_profile(player_name)
+        warm_table = None
+        if cached is not None and cached.profile.total_games < WARM_START_GAMES:
+            warm_table = BehaviorAnalyzer._neighbour_table(player_name)
+        return cls(player_name, game_id, cached, warm_table)
+
+    def _place(self, move_index, mark: str) -> int:
+        if not isinstance(move_index, int) or not 0 <= move_index < BOARD_CELLS:
+            raise ValueError('moveIndex must be a cell 0-8')
+        if self.board[move_index]:
+            raise ValueError(f'Cell {move_index} is already taken')
+        self.board[move_index] = mark
+        return move_index
+
+    def player_move(self, move_index, response_time: Optional[float] = None) -> List[str]:
+        """Apply the player's move and return its anomaly flags"""
+        now = time.monotonic()
+        if response_time is None:
+            response_time = (now - self.last_event_at) * 1000
+        move = {'moveIndex': move_index, 'boardState': list(self.board), 'responseTime': response_time}
+        self._place(move_index, PLAYER_MARK)
+
+        anomalies = []
+        if self.cached is not None:
+            anomalies = BehaviorAnalyzer._anomalies_from(self.cached.profile, self.stats, move)
+        BehaviorAnalyzer._update_response_stats(self.stats, response_time, board_code(move['boardState']), move_index)
+        self.move_history.append(move_index)
+        self.last_event_at = now
+        return anomalies
+
+    def ai_move(self, move_index) -> Dict:
+        """Apply the AI's move and predict the player's reply"""
+        self._place(move_index, AI_MARK)
+        self.last_event_at = time.monotonic()
+        return self.predict()
+
+    def predict(self) -> Dict:
+        """Predicted reply and the full distribution it was taken from"""
+        distribution = None
+        if self.cached is not None:
+            warm_start = (lambda: self.warm_table) if self.warm_table is not None else None
+            distribution = BehaviorAnalyzer._distribution_from(
+                self.cached, self.board, self.move_history, warm_start
+            )
+        if distribution is None:
+            return {'predictedMove': None, 'distribution': None}
+        return {
+            'predictedMove': int(distribution.argmax()),
+            'distribution': [round(p, 4) for p in distribution.tolist()],
+        }
+
+
+async def _handle(session: Optional[GameSession], message: Dict):
+    """Apply one client message; returns the session to keep and the reply"""
+    kind = message.get('type')
+    if kind == 'open':
+        player_name = message.get('playerName')
+        if not player_name:
+            raise ValueError('playerName is required')
+        session = await sync_to_async(GameSession.open)(player_name, message.get('gameId'))
+        return session, {
+            'type': 'opened',
+            'ok': True,
+            'gameId': session.game_id,
+            'knownPlayer': session.cached is not None,
+            **session.predict(),
+        }
+
+    if session is None:
+        raise ValueError('Open a game first')
+    if kind == 'move':
+        anomalies = session.player_move(message.get('moveIndex'), message.get('responseTime'))
+        return session, {
+            'type': 'anomalies',
+            'ok': True,
+            'moveNumber': len(session.move_history),
+            'anomalies': anomalies,
+            'flagged': len(anomalies) > 0,
+        }
+    if kind == 'ai-move':
+        return session, {
+            'type': 'prediction',
+            'ok': True,
+            **session.ai_move(message.get('moveIndex')),
+        }
+    raise ValueError(f'Unknown message type: {kind}')
+
+
+async def prediction_socket(scope, receive, send):
+    """ASGI application for one WebSocket connection
+
+    Client messages are JSON: {"type": "open", "playerName", "gameId"},
+    {"type": "move", "moveIndex", "responseTime"} for the player's moves
+    (answered with anomaly flags), {"type": "ai-move", "moveIndex"}
+    (answered with the predicted reply and its distribution over the 9
+    cells) and {"type": "close"}. A connection that sends nothing for
+    BEHAVIOR_SOCKET_IDLE_TIMEOUT seconds is closed and its session dropped.
+    """
+    idle_timeout = getattr(settings, 'BEHAVIOR_SOCKET_IDLE_TIMEOUT', 300.0)
+    session = None
+    while True:
+        try:
+            event = await asyncio.wait_for(receive(), idle_timeout)
+        except asyncio.TimeoutError:
+            await send({'type': 'websocket.close', 'code': 1001})
+            return
+        if event['type'] == 'websocket.connect':
+            await send({'type': 'websocket.accept'})
+        elif event['type'] == 'websocket.disconnect':
+            return
+        elif event['type'] == 'websocket.receive':
+            try:
+                message = json.loads(event.get('text') or event.get('bytes') or '')
+                if message.get('type') == 'close':
+                    await send({'type': 'websocket.close', 'code': 1000})
+                    return
+                session, reply = await _handle(session, message)
+            except Exception as e:
+                reply = {'type': 'error', 'ok': False, 'error': str(e)}
+            await send({'type': 'websocket.send', 'text': json.dumps(reply)})
+
+
+async def _reject_websocket(receive, send):
+    """Refuse a WebSocket handshake; Django's ASGI handler only serves HTTP"""
+    event = await receive()
+    if event['type'] == 'websocket.connect':
+        await send({'type': 'websocket.close', 'code': 1000})
+
+
+def with_prediction_socket(http_application, path: str = SOCKET_PATH):
+    """Wrap Django's ASGI application so WebSocket connections on path reach the channel"""
+    async def application(scope, receive, send):
+        if scope['type'] == 'websocket':
+            if scope['path'] == path:
+                return await prediction_socket(scope, receive, send)
+            return await _reject_websocket(receive, send)
+        return await http_application(scope, receive, send)
+    return application
@@ -0,0 +1,157 @@
+"""
+Move Predictors
+Interchangeable models turning a cached profile and the current game into
+a probability distribution over the 9 cells, selected by BEHAVIOR_PREDICTOR
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from django.conf import settings
+
+from .context_trie import player_symbol
+from .profile_cache import CachedProfile
+from .symmetry import (
+    CANONICAL_TRIPLES, TRIPLE_MULTIPLICITY, canonical_cell, oriented_cell, oriented_row,
+)
+
+
+BOARD_CELLS = 9
+
+
+def legal_cells(board: List[str]) -> Optional[np.ndarray]:
+    """Mask of empty cells, None for a malformed board"""
+    legal = np.array([cell == '' for cell in board[:BOARD_CELLS]])
+    return legal if legal.size == BOARD_CELLS else None
+
+
+class MovePredictor(ABC):
+    """Base predictor: subclasses return next-move probabilities or None"""
+
+    name = ''
+
+    @abstractmethod
+    def distribution(self, cached: CachedProfile, board: List[str], history: List[int],
+                     warm_start: Optional[Callable[[], np.ndarray]] = None) -> Optional[np.ndarray]:
+        """Next-move probabilities over the 9 cells, None when the model has nothing to go on"""
+
+    def distributions(self, cached: List[Optional[CachedProfile]], boards: List[List[str]],
+                      histories: List[List[int]]) -> List[Optional[np.ndarray]]:
+        """distribution() for many positions at once, without warm starts"""
+        return [
+            self.distribution(entry, board, history) if entry is not None else None
+            for entry, board, history in zip(cached, boards, histories)
+        ]
+
+
+class MarkovPredictor(MovePredictor):
+    """Second-order Markov table with the preferred opening as fallback
+
+    warm_start supplies a pooled table used when the player's own row is
+    empty.
+    """
+
+    name = 'markov'
+
+    def distribution(self, cached, board, history, warm_start=None):
+        symmetric = cached.pattern_analysis.markov_symmetric
+        legal = legal_cells(board)
+
+        # Predict based on recent moves
+        if len(history) >= 2:
+            context = history[-2] * BOARD_CELLS + history[-1]
+            row = (lambda table: oriented_row(table, context)) if symmetric else (lambda table: table[context])
+            transitions = row(cached.markov_table)
+            if not transitions.any() and warm_start is not None:
+                transitions = row(warm_start())
+
+            # Most likely next move among the empty cells
+            if legal is not None:
+                transitions = transitions * legal
+                total = transitions.sum()
+                if total:
+                    return transitions / total
+
+        # Fallback: use preferred openings or common patterns
+        if history and cached.openings:  # Last 10
+            most_common = cached.openings.most_common(1)[0][0]
+            if symmetric:
+                most_common = oriented_cell(canonical_cell(most_common), board)
+            if board[most_common] == '':
+                probabilities = np.zeros(BOARD_CELLS)
+                probabilities[most_common] = 1.0
+                return probabilities
+
+        return None
+
+    def distributions(self, cached, boards, histories):
+        """One gather over the stacked tables of every player in the batch
+
+        Positions without a usable transition row take the scalar path for
+        the opening fallback.
+        """
+        results = [None] * len(cached)
+        rows = [
+            i for i, (entry, board, history) in enumerate(zip(cached, boards, histories))
+            if entry is not None and len(history) >= 2 and len(board) >= BOARD_CELLS
+        ]
+        if rows:
+            players = {}
+            player_index = np.array([players.setdefault(id(cached[i]), len(players)) for i in rows])
+            entries = {id(cached[i]): cached[i] for i in rows}
+            tables = np.stack([entries[key].markov_table.reshape(-1) for key in players])
+            symmetric = np.array([entries[key].pattern_analysis.markov_symmetric for key in players])
+
+            contexts = np.array([histories[i][-2:] for i in rows])
+            if not ((contexts >= 0) & (contexts < BOARD_CELLS)).all():
+                raise ValueError('moveHistory must hold cells 0-8')
+            codes = (contexts[:, 0] * BOARD_CELLS + contexts[:, 1])[:, None] * BOARD_CELLS + np.arange(BOARD_CELLS)
+            folded = symmetric[player_index][:, None]
+            codes = np.where(folded, CANONICAL_TRIPLES[codes], codes)
+            weights = tables[player_index[:, None], codes] / np.where(folded, TRIPLE_MULTIPLICITY[codes], 1)
+
+            legal = np.array([[cell == '' for cell in boards[i][:BOARD_CELLS]] for i in rows])
+            weights *= legal
+            totals = weights.sum(axis=1)
+            for row, i in enumerate(rows):
+                if totals[row]:
+                    results[i] = weights[row] / totals[row]
+
+        for i, (entry, board, history) in enumerate(zip(cached, boards, histories)):
+            if results[i] is None and entry is not None:
+                results[i] = self.distribution(entry, board, history)
+        return results
+
+
+class ContextTreePredictor(MovePredictor):
+    """Variable-order context model over the player's own move sequences"""
+
+    name = 'ppm'
+
+    def distribution(self, cached, board, history, warm_start=None):
+        legal = legal_cells(board)
+        if legal is None:
+            return None
+        return cached.context_trie.distribution(history, player_symbol(board), legal)
+
+
+PREDICTORS = {predictor.name: predictor for predictor in (MarkovPredictor, ContextTreePredictor)}
+
+_predictors: Dict[str, MovePredictor] = {}
+_predictors_lock = threading.Lock()
+
+
+def get_predictor(name: Optional[str] = None) -> MovePredictor:
+    """Shared predictor instance, settings.BEHAVIOR_PREDICTOR by default"""
+    name = name or getattr(settings, 'BEHAVIOR_PREDICTOR', 'markov')
+    predictor = _predictors.get(name)
+    if predictor is not None:
+        return predictor
+    with _predictors_lock:
+        if name not in _predictors:
+            if name not in PREDICTORS:
+                raise ValueError(f'Unknown predictor: {name}')
+            _predictors[name] = PREDICTORS[name]()
+        return _predictors[name]
@@ -0,0 +1,176 @@
+"""
+Write-Behind Profile Aggregator
+Coalesces game results per player and persists them in periodic flushes
+
+Durability: a game is acknowledged once it is queued in process memory.
+Anything still pending when the process dies without calling stop() or
+flush() is lost - at most max_pending games, or roughly flush_interval
+seconds of traffic. Profile reads can lag behind by the same window.
+A player whose games keep failing to persist is retried for max_attempts
+flushes; after that each game is tried alone and the ones that still fail
+are logged and dropped.
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .ai_models import BehaviorAnalyzer
+from .instrumentation import increment, timed
+
+
+logger = logging.getLogger(__name__)
+
+
+class ProfileAggregator:
+    """Per-player pending games, flushed on a size or time threshold"""
+
+    def __init__(self, max_pending: int = 5000, flush_threshold: int = 500,
+                 flush_interval: float = 5.0, max_attempts: int = 3):
+        self.max_pending = max_pending
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+
+        self._pending: 'OrderedDict[str, List[Dict]]' = OrderedDict()
+        self._pending_games = 0
+        self._lock = threading.Lock()
+        self._not_full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # Keeps per-player order across flushes
+        self._attempts: Dict[str, int] = {}  # Failed flushes per player, guarded by _flush_lock
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending_games(self) -> int:
+        return self._pending_games
+
+    def submit(self, player_name: str, game_data: Dict, timeout: Optional[float] = None):
+        """Queue one game; blocks while the queue is full, raises queue.Full on timeout"""
+        with self._not_full:
+            if not self._not_full.wait_for(
+                lambda: self._pending_games < self.max_pending, timeout=timeout
+            ):
+                raise queue.Full('Write-behind queue is full')
+            self._pending.setdefault(player_name, []).append(game_data)
+            self._pending_games += 1
+            if self._pending_games >= self.flush_threshold:
+                self._wake.set()
+
+    @timed('write_behind_flush')
+    def flush(self) -> int:
+        """Persist everything queued so far; returns the number of games written"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, OrderedDict()
+                self._pending_games = 0
+                self._not_full.notify_all()
+
+            written = 0
+            failed = OrderedDict()
+            for player_name, games in batch.items():
+                try:
+                    BehaviorAnalyzer._apply_games(player_name, games)
+                    written += len(games)
+                    self._attempts.pop(player_name, None)
+                except Exception:
+                    logger.exception('Write-behind flush failed for %s', player_name)
+                    increment('write_behind_flush_failure')
+                    attempts = self._attempts.get(player_name, 0) + 1
+                    if attempts < self.max_attempts:
+                        self._attempts[player_name] = attempts
+                        failed[player_name] = games
+                    else:
+                        self._attempts.pop(player_name, None)
+                        written += self._apply_each(player_name, games)
+
+            if failed:
+                self._requeue(failed)
+            return written
+
+    def _apply_each(self, player_name: str, games: List[Dict]) -> int:
+        """Write a repeatedly failing batch one game at a time, dropping the games that fail"""
+        written = 0
+        for game_data in games:
+            try:
+                BehaviorAnalyzer._apply_games(player_name, [game_data])
+                written += 1
+            except Exception:
+                logger.exception(
+                    'Dropping write-behind game %s of %s after %d failed flushes',
+                    game_data.get('gameId'), player_name, self.max_attempts,
+                )
+                increment('write_behind_dropped')
+        return written
+
+    def _requeue(self, failed: 'OrderedDict[str, List[Dict]]'):
+        """Put failed games back ahead of anything queued during the flush"""
+        with self._lock:
+            for player_name, games in self._pending.items():
+                failed.setdefault(player_name, []).extend(games)
+            self._pending = failed
+            self._pending_games = sum(len(games) for games in failed.values())
+
+    def start(self):
+        """Start the background flusher thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name='profile-aggregator', daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop the flusher and write out whatever is still pending"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        next_flush = time.monotonic() + self.flush_interval
+        while not self._stopping.is_set():
+            self._wake.wait(max(next_flush - time.monotonic(), 0))
+            self._wake.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+            next_flush = time.monotonic() + self.flush_interval
+
+
+_aggregator: Optional[ProfileAggregator] = None
+_aggregator_lock = threading.Lock()
+
+
+def write_behind_enabled() -> bool:
+    return getattr(settings, 'BEHAVIOR_WRITE_BEHIND', False)
+
+
+def get_aggregator() -> ProfileAggregator:
+    """Process-wide aggregator, started on first use and flushed at exit"""
+    global _aggregator
+    with _aggregator_lock:
+        if _aggregator is None:
+            _aggregator = ProfileAggregator(
+                max_pending=getattr(settings, 'BEHAVIOR_WRITE_BEHIND_MAX_PENDING', 5000),
+                flush_threshold=getattr(settings, 'BEHAVIOR_WRITE_BEHIND_FLUSH_AT', 500),
+                flush_interval=getattr(settings, 'BEHAVIOR_WRITE_BEHIND_INTERVAL', 5.0),
+                max_attempts=getattr(settings, 'BEHAVIOR_WRITE_BEHIND_MAX_ATTEMPTS', 3),
+            )
+            _aggregator.start()
+            atexit.register(_aggregator.stop)
+        return _aggregator
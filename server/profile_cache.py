@@ -0,0 +1,253 @@
+"""
+Read-Through Profile Cache
+Decoded player profiles shared by the profile, difficulty, prediction
+and anomaly views
+"""
+
+import math
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+
+
+class CachedProfile(NamedTuple):
+    """Profile plus everything the read paths derive from it"""
+    profile: Any  # PlayerBehaviorProfile
+    pattern_analysis: Any  # PatternAnalysis
+    markov_table: np.ndarray  # 81x9 transition counts
+    openings: Counter  # Counts over the last 10 preferred openings
+    response_stats: Any  # ResponseStats
+    context_trie: Any  # ContextTrie
+
+
+class LocalLRUBackend:
+    """In-process LRU with a size bound and per-entry TTL"""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        entries = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                entries[key] = value
+        return entries
+
+    def set_many(self, entries: Dict[str, Any]):
+        for key, value in entries.items():
+            self.set(key, value)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """Entries stored through Django's cache framework; eviction is the backend's"""
+
+    def __init__(self, alias: str = 'default', ttl: float = 300.0,
+                 key_prefix: str = 'behavior-profile'):
+        self.alias = alias
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+
+    @property
+    def _cache(self):
+        return caches[self.alias]
+
+    def _key(self, key: str) -> str:
+        return f'{self.key_prefix}:{key}'
+
+    def get(self, key: str):
+        return self._cache.get(self._key(key))
+
+    def set(self, key: str, value, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self._cache.set(self._key(key), value, timeout=None if ttl == math.inf else ttl)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        keys = list(keys)
+        found = self._cache.get_many([self._key(key) for key in keys])
+        return {key: found[self._key(key)] for key in keys if self._key(key) in found}
+
+    def set_many(self, entries: Dict[str, Any]):
+        self._cache.set_many({self._key(key): value for key, value in entries.items()}, timeout=self.ttl)
+
+    def delete(self, key: str):
+        self._cache.delete(self._key(key))
+
+
+NAMESPACE_KEY = 'namespace'
+
+
+def _entry_key(player_name: str) -> str:
+    return f'profile:{player_name}'
+
+
+def _generation_key(player_name: str) -> str:
+    return f'generation:{player_name}'
+
+
+def _token() -> str:
+    return uuid.uuid4().hex
+
+
+class ProfileCache:
+    """Read-through cache keyed by player name, with hit/miss counters
+
+    Entries are stored with the cache namespace and the player's generation
+    read before they were loaded. invalidate() and clear() replace those
+    tokens, so a load that raced an invalidation is never served, and a
+    clear only drops this cache's entries from a shared backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, player_names: List[str]):
+        """Valid entries, and the stamp each missing player's load must be stored with"""
+        keys = [NAMESPACE_KEY]
+        for name in player_names:
+            keys += [_entry_key(name), _generation_key(name)]
+        found = self.backend.get_many(keys)
+
+        namespace = found.get(NAMESPACE_KEY)
+        entries, stamps = {}, {}
+        for name in player_names:
+            stamp = (namespace, found.get(_generation_key(name)))
+            stored = found.get(_entry_key(name))
+            if stored is not None and stored[0] == stamp:
+                entries[name] = stored[1]
+            else:
+                stamps[name] = stamp
+        return entries, stamps
+
+    def get_or_load(self, player_name: str,
+                    loader: Callable[[str], Optional[CachedProfile]]) -> Optional[CachedProfile]:
+        entries, stamps = self._lookup([player_name])
+        with self._lock:
+            if player_name in entries:
+                self.hits += 1
+                return entries[player_name]
+            self.misses += 1
+
+        entry = loader(player_name)
+        if entry is not None:
+            self.backend.set(_entry_key(player_name), (stamps[player_name], entry))
+        return entry
+
+    def get_or_load_many(self, player_names: Iterable[str],
+                         loader: Callable[[List[str]], Dict[str, CachedProfile]]) -> Dict[str, CachedProfile]:
+        """Cached entries for many players, loading every miss with one loader call"""
+        entries, stamps = self._lookup(list(dict.fromkeys(player_names)))
+        with self._lock:
+            self.hits += len(entries)
+            self.misses += len(stamps)
+
+        if stamps:
+            loaded = loader(list(stamps))
+            self.backend.set_many({
+                _entry_key(name): (stamps[name], entry) for name, entry in loaded.items()
+            })
+            entries.update(loaded)
+        return entries
+
+    def invalidate(self, player_name: str):
+        # Outlives the entries it guards, so an expired generation cannot revive a stale load
+        self.backend.set(_generation_key(player_name), _token(), ttl=2 * self.backend.ttl)
+        self.backend.delete(_entry_key(player_name))
+
+    def clear(self):
+        """Drop every entry of this cache, leaving the rest of a shared backend alone"""
+        self.backend.set(NAMESPACE_KEY, _token(), ttl=math.inf)
+
+    def stats(self) -> Dict[str, int]:
+        lookups = self.hits + self.misses
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hitRate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+        if isinstance(self.backend, LocalLRUBackend):
+            stats['size'] = len(self.backend)
+            stats['evictions'] = self.backend.evictions
+        return stats
+
+
+_profile_cache: Optional[ProfileCache] = None
+_profile_cache_lock = threading.Lock()
+
+
+def _build_profile_cache(key_prefix: str = 'behavior-profile') -> ProfileCache:
+    config = getattr(settings, 'BEHAVIOR_PROFILE_CACHE', {})
+    ttl = config.get('TTL', 300.0)
+    if config.get('BACKEND', 'local') == 'django':
+        backend = DjangoCacheBackend(alias=config.get('ALIAS', 'default'), ttl=ttl, key_prefix=key_prefix)
+    else:
+        backend = LocalLRUBackend(max_entries=config.get('MAX_ENTRIES', 1000), ttl=ttl)
+    return ProfileCache(backend)
+
+
+def get_profile_cache() -> ProfileCache:
+    """Process-wide cache configured by settings.BEHAVIOR_PROFILE_CACHE"""
+    global _profile_cache
+    with _profile_cache_lock:
+        if _profile_cache is None:
+            _profile_cache = _build_profile_cache()
+        return _profile_cache
+
+
+@contextmanager
+def isolated_profile_cache() -> Iterator[ProfileCache]:
+    """Serve get_profile_cache() from a fresh cache of the configured kind
+
+    A shared backend gets a key prefix of its own, so nothing stored under
+    it reaches, or is read by, the real cache.
+    """
+    global _profile_cache
+    with _profile_cache_lock:
+        previous = _profile_cache
+        _profile_cache = _build_profile_cache(f'behavior-profile-{_token()}')
+    try:
+        yield _profile_cache
+    finally:
+        with _profile_cache_lock:
+            _profile_cache = previous
@@ -0,0 +1,87 @@
+"""
+Versioned JSON Responses
+Response bodies encoded once per version of their data and revalidated
+with an ETag, so unchanged polls are answered with a 304
+
+No Last-Modified is sent: it only has one-second resolution, so a client
+revalidating with If-Modified-Since would get a 304 for a second update
+within the same second as its copy.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Tuple
+
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library encoder is used instead
+    orjson = None
+
+
+JSON_CONTENT_TYPE = 'application/json'
+MAX_BODIES = 4096
+
+
+def dumps(payload: Any) -> bytes:
+    """Compact JSON bytes, through orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(',', ':')).encode()
+
+
+class BodyCache:
+    """LRU of encoded bodies and their ETags, keyed by (key, version)
+
+    The ETag is a digest of the body, so workers that encode the same data
+    hand out the same tag.
+    """
+
+    def __init__(self, max_entries: int = MAX_BODIES):
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Tuple, Tuple[bytes, str]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_encode(self, key: Hashable, version: Hashable,
+                      build: Callable[[], Any]) -> Tuple[bytes, str]:
+        cache_key = (key, version)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                return entry
+
+        body = dumps(build())
+        entry = (body, f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+        with self._lock:
+            self._entries[cache_key] = entry
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_bodies = BodyCache()
+
+
+def get_body_cache() -> BodyCache:
+    return _bodies
+
+
+def versioned_json(request, key: Hashable, version: Hashable, build: Callable[[], Any]) -> HttpResponse:
+    """JSON response whose body is built once per version, or a 304 if the client's copy is current"""
+    body, etag = _bodies.get_or_encode(key, version, build)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(body, content_type=JSON_CONTENT_TYPE)
+    response['ETag'] = etag
+    # Stored copies must be revalidated, or browsers may skip polls on heuristic freshness
+    response['Cache-Control'] = 'no-cache'
+    return response
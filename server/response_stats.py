@@ -0,0 +1,122 @@
+"""
+Streaming Response-Time Statistics
+Welford mean/variance, EWMA, a ring of recent response times and a
+sliding window of move quality, packed into one small binary blob
+"""
+
+import math
+import struct
+from typing import List, Optional, Tuple
+
+
+RING_SIZE = 20
+OPTIMAL_WINDOW = 20
+EWMA_ALPHA = 0.1
+
+# count, mean, m2, ewma, optimal_bits, optimal_window, ring_head, ring_len
+_HEADER = struct.Struct('<IdddIBBB')
+_RING = struct.Struct(f'<{RING_SIZE}I')
+PACKED_SIZE = _HEADER.size + _RING.size
+
+
+class ResponseStats:
+    """Running per-player timing and move-quality state"""
+
+    __slots__ = ('count', 'mean', 'm2', 'ewma', 'optimal_bits', 'optimal_window',
+                 'ring', 'ring_head', 'ring_len')
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.ewma = 0.0
+        self.optimal_bits = 0  # Newest move in bit 0
+        self.optimal_window = 0
+        self.ring = [0] * RING_SIZE
+        self.ring_head = 0
+        self.ring_len = 0
+
+    def add_response(self, response_time: float):
+        """Fold one positive response time (ms) into every statistic"""
+        self.count += 1
+        delta = response_time - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (response_time - self.mean)
+        if self.count == 1:
+            self.ewma = float(response_time)
+        else:
+            self.ewma += EWMA_ALPHA * (response_time - self.ewma)
+
+        self.ring[self.ring_head] = int(response_time)
+        self.ring_head = (self.ring_head + 1) % RING_SIZE
+        self.ring_len = min(self.ring_len + 1, RING_SIZE)
+
+    def merge(self, count: int, mean: float, m2: float):
+        """Fold in the Welford state of earlier response times, e.g. a rolled-up summary"""
+        if not count:
+            return
+        total = self.count + count
+        delta = mean - self.mean
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.mean += delta * count / total
+        self.count = total
+        self.ewma = self.mean
+
+    def add_move_quality(self, optimal: bool):
+        """Push whether a move matched perfect play into the sliding window"""
+        mask = (1 << OPTIMAL_WINDOW) - 1
+        self.optimal_bits = ((self.optimal_bits << 1) | int(optimal)) & mask
+        self.optimal_window = min(self.optimal_window + 1, OPTIMAL_WINDOW)
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.m2 / self.count) if self.count > 1 else 0.0
+
+    def recent(self) -> List[int]:
+        """Recent response times, oldest first"""
+        start = (self.ring_head - self.ring_len) % RING_SIZE
+        return [self.ring[(start + i) % RING_SIZE] for i in range(self.ring_len)]
+
+    def recent_std(self) -> float:
+        recent = self.recent()
+        if not recent:
+            return 0.0
+        mean = sum(recent) / len(recent)
+        return math.sqrt(sum((t - mean) ** 2 for t in recent) / len(recent))
+
+    def optimal_rate(self, current: Optional[bool] = None) -> Tuple[int, int]:
+        """(optimal, scored) over the window, optionally counting one more move"""
+        matched = bin(self.optimal_bits).count('1')
+        scored = self.optimal_window
+        if current is not None:
+            if scored == OPTIMAL_WINDOW:
+                # The current move pushes the oldest one out
+                matched -= (self.optimal_bits >> (OPTIMAL_WINDOW - 1)) & 1
+                scored -= 1
+            matched += int(current)
+            scored += 1
+        return matched, scored
+
+    def timing_shift(self) -> float:
+        """How far recent timing (EWMA) has drifted from the long-run mean, in std units"""
+        std = self.std
+        if std == 0:
+            return 0.0
+        return (self.ewma - self.mean) / std
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(
+            self.count, self.mean, self.m2, self.ewma, self.optimal_bits,
+            self.optimal_window, self.ring_head, self.ring_len
+        ) + _RING.pack(*self.ring)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'ResponseStats':
+        stats = cls()
+        if not data:
+            return stats
+        data = bytes(data)
+        (stats.count, stats.mean, stats.m2, stats.ewma, stats.optimal_bits,
+         stats.optimal_window, stats.ring_head, stats.ring_len) = _HEADER.unpack_from(data)
+        stats.ring = list(_RING.unpack_from(data, _HEADER.size))
+        return stats
@@ -0,0 +1,183 @@
+"""
+Move History Retention
+Rolls game records and move events older than a cutoff into per-player,
+per-day summaries and deletes them in bounded batches
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .ai_models import (
+    BOARD_CELLS, MARKOV_CONTEXTS, NO_BOARD, RESULTS,
+    DailySummary, GameRecord, MoveEvent, games_filter, unpack_moves,
+)
+from .response_stats import ResponseStats
+from .solver import is_optimal_code
+
+
+TRANSITION_SPACE = MARKOV_CONTEXTS * BOARD_CELLS
+WIN, LOSS = RESULTS.index('win'), RESULTS.index('loss')
+
+
+def retention_cutoff(days: Optional[int] = None) -> datetime:
+    days = days if days is not None else getattr(settings, 'BEHAVIOR_RETENTION_DAYS', 90)
+    return timezone.now() - timedelta(days=days)
+
+
+class _DayTotals:
+    """Counts for one (player, day) before they are merged into its summary"""
+
+    __slots__ = ('games', 'wins', 'losses', 'draws', 'moves', 'response_times',
+                 'optimal', 'scored', 'transitions')
+
+    def __init__(self):
+        self.games = self.wins = self.losses = self.draws = self.moves = 0
+        self.response_times = []
+        self.optimal = self.scored = 0
+        self.transitions = np.zeros(TRANSITION_SPACE, dtype=np.int64)
+
+    def add_game(self, result_code: int, moves: np.ndarray):
+        self.games += 1
+        if result_code == WIN:
+            self.wins += 1
+        elif result_code == LOSS:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+        self.moves += len(moves)
+        response_times = moves['response_time']
+        self.response_times.extend(response_times[response_times > 0].tolist())
+        for cell, board in zip(moves['cell'].tolist(), moves['board'].tolist()):
+            optimal = is_optimal_code(board, cell) if board != NO_BOARD else None
+            if optimal is not None:
+                self.optimal += optimal
+                self.scored += 1
+
+        cells = moves['cell'].astype(np.intp)
+        if len(cells) >= 3:
+            np.add.at(self.transitions, (cells[:-2] * BOARD_CELLS + cells[1:-1]) * BOARD_CELLS + cells[2:], 1)
+
+    def merge_into(self, summary: DailySummary):
+        summary.games += self.games
+        summary.wins += self.wins
+        summary.losses += self.losses
+        summary.draws += self.draws
+        summary.moves += self.moves
+        summary.optimal_moves += self.optimal
+        summary.scored_moves += self.scored
+        summary.set_transitions(summary.get_transitions() + self.transitions)
+
+        if self.response_times:
+            times = np.asarray(self.response_times, dtype=np.float64)
+            stats = ResponseStats()
+            stats.merge(summary.response_count, summary.response_mean, summary.response_m2)
+            stats.merge(len(times), float(times.mean()), float(((times - times.mean()) ** 2).sum()))
+            summary.response_count, summary.response_mean, summary.response_m2 = stats.count, stats.mean, stats.m2
+
+
+def _write_summaries(totals: Dict[Tuple[int, object], _DayTotals]) -> int:
+    """Merge day totals into their summary rows; returns summaries created"""
+    existing = {}
+    for summary in DailySummary.objects.select_for_update().filter(
+        player_id__in={player_id for player_id, _ in totals},
+        day__in={day for _, day in totals},
+    ):
+        existing[(summary.player_id, summary.day)] = summary
+
+    created, updated = [], []
+    for (player_id, day), day_totals in totals.items():
+        summary = existing.get((player_id, day))
+        if summary is None:
+            summary = DailySummary(player_id=player_id, day=day)
+            created.append(summary)
+        else:
+            updated.append(summary)
+        day_totals.merge_into(summary)
+
+    DailySummary.objects.bulk_create(created)
+    DailySummary.objects.bulk_update(updated, [
+        'games', 'wins', 'losses', 'draws', 'moves', 'response_count', 'response_mean',
+        'response_m2', 'optimal_moves', 'scored_moves', 'transition_counts',
+    ])
+    return len(created)
+
+
+def _roll_up_records(cutoff: datetime, batch_size: int) -> Optional[Dict[str, int]]:
+    """Summarize and delete the oldest batch of expired game records with their move events"""
+    with transaction.atomic():
+        records = list(GameRecord.objects.filter(created_at__lt=cutoff).order_by('id').values_list(
+            'id', 'player_id', 'game_id', 'result_code', 'packed_moves', 'created_at'
+        )[:batch_size])
+        if not records:
+            return None
+
+        totals = defaultdict(_DayTotals)
+        for _, player_id, _, result_code, packed_moves, created_at in records:
+            totals[(player_id, created_at.date())].add_game(result_code, unpack_moves(packed_moves))
+        summaries = _write_summaries(totals)
+
+        GameRecord.objects.filter(id__in=[record[0] for record in records]).delete()
+        events, _ = MoveEvent.objects.filter(
+            games_filter((record[1], record[2]) for record in records)
+        ).delete()
+        return {'games': len(records), 'moves': events, 'summaries': summaries}
+
+
+def _roll_up_events(cutoff: datetime, batch_size: int) -> Optional[Dict[str, int]]:
+    """Summarize and delete expired move events of games that were never packed into a record
+
+    Only events before the cutoff are summarized and deleted, so the moves
+    of a game straddling it that come later stay for the next run.
+    """
+    with transaction.atomic():
+        expired = MoveEvent.objects.filter(created_at__lt=cutoff).filter(~Exists(
+            GameRecord.objects.filter(player_id=OuterRef('player_id'), game_id=OuterRef('game_id'))
+        ))
+        pairs = list(dict.fromkeys(
+            expired.order_by('id').values_list('player_id', 'game_id')[:batch_size * BOARD_CELLS]
+        ))[:batch_size]
+        if not pairs:
+            return None
+
+        by_game = defaultdict(list)
+        for event in expired.filter(games_filter(pairs)).order_by('id'):
+            by_game[(event.player_id, event.game_id)].append(event)
+
+        totals = defaultdict(_DayTotals)
+        for events in by_game.values():
+            record = GameRecord.from_events(events)
+            day = min(event.created_at for event in events).date()
+            totals[(record.player_id, day)].add_game(record.result_code, record.moves)
+        summaries = _write_summaries(totals)
+
+        events, _ = MoveEvent.objects.filter(
+            id__in=[event.id for events in by_game.values() for event in events]
+        ).delete()
+        return {'games': len(by_game), 'moves': events, 'summaries': summaries}
+
+
+def roll_up(cutoff: datetime, batch_size: int = 500) -> Dict[str, int]:
+    """Roll every game stored before cutoff into daily summaries
+
+    Each batch commits on its own, so the job can be interrupted and rerun.
+    Profiles, Markov tables and response statistics already include these
+    games and stay as they are; later rebuilds read the summaries plus the
+    remaining records.
+    """
+    rolled = {'games': 0, 'moves': 0, 'summaries': 0}
+    for step in (_roll_up_records, _roll_up_events):
+        while True:
+            batch = step(cutoff, batch_size)
+            if batch is None:
+                break
+            for key, value in batch.items():
+                rolled[key] += value
+    return rolled
@@ -0,0 +1,291 @@
+"""
+Self-Play Simulator
+Plays models of stored players against AI opponents of graded strength in
+batched NumPy games, to check and refit the calculate_difficulty weights
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from django.conf import settings
+
+from .ai_models import (
+    BOARD_CELLS, DIFFICULTY_WEIGHTS, MARKOV_CONTEXTS, BehaviorAnalyzer, PlayerBehaviorProfile,
+)
+from .solver import BEST_MOVES, POSITION_COUNT, POWERS, WIN_LINES
+from .symmetry import CANONICAL_TRIPLES, TRIPLE_MULTIPLICITY
+
+
+# Player outcomes, indexing the last axis of simulation counts
+WIN, DRAW, LOSS = 0, 1, 2
+OUTCOMES = ('win', 'draw', 'loss')
+PLAYER, AI = 1, 2  # Solver marks: the player is X and moves first
+
+# Chance of taking an immediate win and of blocking an immediate AI win,
+# by strategy type; otherwise the player follows its Markov table
+STRATEGY_TACTICS = {
+    'aggressive': (0.9, 0.5),
+    'defensive': (0.6, 0.9),
+    'balanced': (0.75, 0.75),
+}
+
+CELL_BITS = np.arange(BOARD_CELLS)
+_POWERS = np.array(POWERS, dtype=np.int64)
+
+
+def _build_tables():
+    """Winner, empty cells and line-completing cells of every board code"""
+    digits = np.arange(POSITION_COUNT)[:, None] // _POWERS % 3
+    lines = digits[:, np.array(WIN_LINES)]  # positions x 8 lines x 3 cells
+    complete = (lines[..., 0] != 0) & (lines[..., 0] == lines[..., 1]) & (lines[..., 1] == lines[..., 2])
+    winner = np.where(complete, lines[..., 0], 0).max(axis=1).astype(np.int8)
+
+    empty = ((digits == 0) << CELL_BITS).sum(axis=1).astype(np.uint16)
+    completing = np.zeros((POSITION_COUNT, 2), dtype=np.uint16)
+    for mark in (PLAYER, AI):
+        for line in WIN_LINES:
+            for cell in line:
+                others = [c for c in line if c != cell]
+                hit = (digits[:, cell] == 0) & (digits[:, others[0]] == mark) & (digits[:, others[1]] == mark)
+                completing[hit, mark - 1] |= 1 << cell
+    return winner, empty, completing
+
+
+WINNERS, EMPTY_CELLS, COMPLETING_CELLS = _build_tables()
+
+
+class PlayerModels(NamedTuple):
+    """Move policies of a set of stored players, stacked for batched play"""
+    names: List[str]
+    transitions: np.ndarray  # players x 81 x 9 next-move weights
+    openings: np.ndarray  # players x 9 opening weights
+    tactics: np.ndarray  # players x (take win, block)
+    win_rates: np.ndarray  # Stored win rate
+    exploitability: np.ndarray  # Stored exploitability score, 0-100
+
+
+def load_player_models(player_names: List[str]) -> PlayerModels:
+    """Player models from stored profiles: Markov table, openings and strategy type"""
+    cached = BehaviorAnalyzer.get_cached_profiles(player_names)
+    names = [name for name in dict.fromkeys(player_names) if name in cached]
+    transitions = np.zeros((len(names), MARKOV_CONTEXTS, BOARD_CELLS), dtype=np.float32)
+    openings = np.zeros((len(names), BOARD_CELLS), dtype=np.float32)
+    for i, name in enumerate(names):
+        entry = cached[name]
+        table = entry.markov_table
+        if entry.pattern_analysis.markov_symmetric:
+            # Split folded counts back over every orientation, as oriented_row does per context
+            table = table.reshape(-1)[CANONICAL_TRIPLES] / TRIPLE_MULTIPLICITY
+        transitions[i] = table.reshape(MARKOV_CONTEXTS, BOARD_CELLS)
+        for cell, count in entry.openings.items():
+            if 0 <= cell < BOARD_CELLS:
+                openings[i, cell] = count
+
+    profiles = [cached[name].profile for name in names]
+    return PlayerModels(
+        names=names,
+        transitions=transitions,
+        openings=openings,
+        tactics=np.array(
+            [STRATEGY_TACTICS.get(profile.strategy_type, STRATEGY_TACTICS['balanced']) for profile in profiles],
+            dtype=np.float64,
+        ).reshape(-1, 2),
+        win_rates=np.array([profile.wins / max(profile.total_games, 1) for profile in profiles]),
+        exploitability=np.array([profile.exploitability_score for profile in profiles], dtype=np.float64),
+    )
+
+
+def _cells(masks: np.ndarray) -> np.ndarray:
+    """Cell bitmasks as a games x 9 boolean array"""
+    return (masks[:, None].astype(np.int64) >> CELL_BITS & 1).astype(bool)
+
+
+def _sample(weights: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """One cell per row, drawn in proportion to its weights"""
+    cumulative = np.cumsum(weights, axis=1)
+    draws = rng.random(len(weights)) * cumulative[:, -1]
+    return (cumulative > draws[:, None]).argmax(axis=1)
+
+
+def _player_moves(models: PlayerModels, players, codes, history, rng) -> np.ndarray:
+    legal = _cells(EMPTY_CELLS[codes])
+    wins = _cells(COMPLETING_CELLS[codes, PLAYER - 1])
+    threats = _cells(COMPLETING_CELLS[codes, AI - 1])
+    tactics = models.tactics[players]
+    draws = rng.random((len(codes), 2))
+    take_win = (draws[:, 0] < tactics[:, 0]) & wins.any(axis=1)
+    block = ~take_win & (draws[:, 1] < tactics[:, 1]) & threats.any(axis=1)
+
+    # Markov row of the last two moves, then the preferred openings, then any empty cell
+    weights = np.zeros(legal.shape, dtype=np.float32)
+    known = history[:, 0] >= 0
+    weights[known] = models.transitions[players[known], history[known, 0] * BOARD_CELLS + history[known, 1]]
+    weights *= legal
+    missing = weights.sum(axis=1) == 0
+    weights[missing] = models.openings[players[missing]] * legal[missing]
+    missing = weights.sum(axis=1) == 0
+    weights[missing] = legal[missing]
+    weights[block] = threats[block]
+    weights[take_win] = wins[take_win]
+    return _sample(weights, rng)
+
+
+def _ai_moves(strengths, codes, rng) -> np.ndarray:
+    """Perfect play with probability `strength`, otherwise a random empty cell"""
+    best = rng.random(len(codes)) < strengths
+    weights = np.where(best[:, None], _cells(BEST_MOVES[AI - 1, codes]), _cells(EMPTY_CELLS[codes]))
+    return _sample(weights, rng)
+
+
+def play_games(models: PlayerModels, players: np.ndarray, strengths: np.ndarray,
+               rng: np.random.Generator) -> np.ndarray:
+    """Play one game per (player, AI strength) pair in lockstep; the player's outcome of each"""
+    codes = np.zeros(len(players), dtype=np.int64)
+    history = np.full((len(players), 2), -1, dtype=np.int64)  # Player's previous two moves
+    outcomes = np.full(len(players), DRAW, dtype=np.int8)
+    active = np.arange(len(players))
+    for ply in range(BOARD_CELLS):
+        if not active.size:
+            break
+        current = codes[active]
+        if ply % 2 == 0:
+            cells = _player_moves(models, players[active], current, history[active], rng)
+            history[active] = np.column_stack((history[active, 1], cells))
+            current = current + PLAYER * _POWERS[cells]
+        else:
+            cells = _ai_moves(strengths[active], current, rng)
+            current = current + AI * _POWERS[cells]
+        codes[active] = current
+        won = WINNERS[current] != 0
+        outcomes[active[won]] = WIN if ply % 2 == 0 else LOSS
+        active = active[~won]
+    return outcomes
+
+
+_worker_models: Optional[PlayerModels] = None
+
+
+def _init_worker(models: PlayerModels):
+    global _worker_models
+    _worker_models = models
+
+
+def _simulate_range(start: int, stop: int, games: int, strengths: np.ndarray,
+                    seed: np.random.SeedSequence, models: Optional[PlayerModels] = None) -> np.ndarray:
+    """Outcome counts (players x strengths x 3) of games start..stop
+
+    Game i belongs to pair i // games, pairs running over players then
+    strengths.
+    """
+    models = models if models is not None else _worker_models
+    pairs = np.arange(start, stop) // games
+    players, strength_index = np.divmod(pairs, len(strengths))
+    outcomes = play_games(models, players, strengths[strength_index], np.random.default_rng(seed))
+    shape = (len(models.names), len(strengths), len(OUTCOMES))
+    return np.bincount(pairs * len(OUTCOMES) + outcomes, minlength=np.prod(shape)).reshape(shape)
+
+
+def simulate(models: PlayerModels, strengths: Sequence[float], games: int, workers: int = 1,
+             batch_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """Play `games` games for every player against every AI strength
+
+    Returns outcome counts, players x strengths x (win, draw, loss). Batches
+    are spread over a process pool that receives the models once.
+    """
+    strengths = np.asarray(strengths, dtype=np.float64)
+    total = len(models.names) * len(strengths) * games
+    ranges = [(start, min(start + batch_size, total)) for start in range(0, total, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(ranges))
+    counts = np.zeros((len(models.names), len(strengths), len(OUTCOMES)), dtype=np.int64)
+
+    if workers <= 1 or len(ranges) <= 1:
+        for (start, stop), child in zip(ranges, seeds):
+            counts += _simulate_range(start, stop, games, strengths, child, models)
+        return counts
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(models,)) as pool:
+        futures = [
+            pool.submit(_simulate_range, start, stop, games, strengths, child)
+            for (start, stop), child in zip(ranges, seeds)
+        ]
+        for future in futures:
+            counts += future.result()
+    return counts
+
+
+def ideal_difficulty(counts: np.ndarray, strengths: Sequence[float], target_win_rate: float) -> np.ndarray:
+    """Per player, the AI strength at which the simulated win rate falls to the target
+
+    Strengths are read as difficulties on the same 0-1 scale, linearly
+    interpolated between the simulated ones.
+    """
+    order = np.argsort(strengths)
+    strengths = np.asarray(strengths, dtype=np.float64)[order]
+    win_rates = counts[:, order, WIN] / np.maximum(counts[:, order].sum(axis=2), 1)
+    win_rates = np.minimum.accumulate(win_rates, axis=1)  # Stronger AI never helps the player
+    return np.array([
+        np.interp(target_win_rate, rates[::-1], strengths[::-1]) for rates in win_rates
+    ])
+
+
+def fit_difficulty_weights(models: PlayerModels, ideal: np.ndarray) -> Dict:
+    """Least-squares (win rate, 1 - exploitability) weights against the ideal difficulties"""
+    features = np.column_stack((models.win_rates, 1 - models.exploitability / 100))
+    weights = np.linalg.lstsq(features, ideal, rcond=None)[0] if len(ideal) else np.zeros(2)
+    fitted = np.clip(features @ weights, 0.0, 1.0)
+    current = BehaviorAnalyzer._difficulty(models.win_rates, 1.0, models.exploitability)
+
+    def rmse(predicted):
+        return round(float(np.sqrt(np.mean((predicted - ideal) ** 2))), 4) if len(ideal) else None
+
+    return {
+        'currentWeights': list(getattr(settings, 'BEHAVIOR_DIFFICULTY_WEIGHTS', DIFFICULTY_WEIGHTS)),
+        'fittedWeights': [round(float(w), 4) for w in weights],
+        'fittedRmse': rmse(fitted),
+        'currentRmse': rmse(current),
+    }
+
+
+def run(player_names: Optional[List[str]] = None, min_games: int = 5, max_players: Optional[int] = None,
+        strengths: Sequence[float] = (0.0, 0.25, 0.5, 0.75, 1.0), games: int = 1000,
+        target_win_rate: float = 0.25, workers: int = 1, batch_size: int = 50000, seed: int = 0) -> Dict:
+    """Simulate stored players (the most active first by default) and refit the difficulty weights"""
+    if player_names is None:
+        player_names = list(
+            PlayerBehaviorProfile.objects.filter(total_games__gte=min_games)
+            .order_by('-total_games').values_list('player_name', flat=True)[:max_players]
+        )
+    models = load_player_models(player_names)
+
+    started = time.perf_counter()
+    counts = simulate(models, strengths, games, workers, batch_size, seed)
+    seconds = time.perf_counter() - started
+    played = int(counts.sum())
+
+    ideal = ideal_difficulty(counts, strengths, target_win_rate)
+    current = BehaviorAnalyzer._difficulty(models.win_rates, 1.0, models.exploitability)
+    totals = counts.sum(axis=0)
+    return {
+        'parameters': {
+            'players': len(models.names), 'strengths': list(strengths), 'gamesPerPair': games,
+            'targetWinRate': target_win_rate, 'workers': workers, 'seed': seed,
+        },
+        'games': played,
+        'seconds': round(seconds, 3),
+        'gamesPerMinute': round(played / seconds * 60) if seconds else None,
+        'outcomes': {
+            str(strength): dict(zip(OUTCOMES, (totals[i] / max(totals[i].sum(), 1)).round(4).tolist()))
+            for i, strength in enumerate(strengths)
+        },
+        'fit': fit_difficulty_weights(models, ideal),
+        'players': {
+            name: {
+                'difficulty': round(float(current[i]), 4),
+                'idealDifficulty': round(float(ideal[i]), 4),
+                'winRates': (counts[i, :, WIN] / np.maximum(counts[i].sum(axis=1), 1)).round(4).tolist(),
+            }
+            for i, name in enumerate(models.names)
+        },
+    }
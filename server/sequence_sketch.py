@@ -0,0 +1,120 @@
+"""
+Bounded 3-Move Sequence Counts
+Dense counts over the 504 possible sequences of three distinct cells,
+with running totals for O(1) entropy-based exploitability
+"""
+
+import math
+import struct
+from itertools import permutations
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+BOARD_CELLS = 9
+SEQUENCES = tuple(permutations(range(BOARD_CELLS), 3))
+SEQUENCE_SPACE = len(SEQUENCES)  # 504
+
+# a*81 + b*9 + c (the Markov table layout) -> dense index, -1 when cells repeat
+SEQUENCE_CODES = np.array([a * 81 + b * 9 + c for a, b, c in SEQUENCES], dtype=np.intp)
+CODE_TO_INDEX = np.full(BOARD_CELLS ** 3, -1, dtype=np.intp)
+CODE_TO_INDEX[SEQUENCE_CODES] = np.arange(SEQUENCE_SPACE)
+
+# total, sum(c * log c)
+_HEADER = struct.Struct('<Qd')
+COUNT_DTYPE = np.dtype('<u4')
+PACKED_SIZE = _HEADER.size + SEQUENCE_SPACE * COUNT_DTYPE.itemsize
+
+
+def _c_log_c(count: int) -> float:
+    return count * math.log(count) if count > 1 else 0.0
+
+
+def exploitability(total, sum_c_log_c, space: int = SEQUENCE_SPACE):
+    """Predictability in [0, 100] from sequence entropy; works on scalars or arrays
+
+    Entropy is normalized by the largest value the observed number of
+    sequences could reach among `space` distinct sequences (fewer when
+    counts are folded under symmetry), so a handful of all-distinct
+    sequences scores 0 and a single repeated sequence scores 100.
+    """
+    total = np.asarray(total, dtype=np.float64)
+    safe_total = np.maximum(total, 2)
+    entropy = np.log(safe_total) - np.asarray(sum_c_log_c) / safe_total
+    max_entropy = np.log(np.minimum(safe_total, space))
+    score = np.clip(1 - entropy / max_entropy, 0.0, 1.0) * 100
+    score = np.where(total >= 2, score, 0.0)
+    return float(score) if score.ndim == 0 else score
+
+
+def parse_sequence(key: str) -> Optional[int]:
+    """Dense index of an 'a-b-c' key, None if it is not three distinct cells"""
+    try:
+        a, b, c = (int(part) for part in key.split('-'))
+    except ValueError:
+        return None
+    if not all(0 <= cell < BOARD_CELLS for cell in (a, b, c)):
+        return None
+    index = int(CODE_TO_INDEX[a * 81 + b * 9 + c])
+    return index if index >= 0 else None
+
+
+class SequenceCounts:
+    """Fixed-size replacement for the common_sequences JSON dict"""
+
+    __slots__ = ('counts', 'total', 'sum_c_log_c')
+
+    def __init__(self, counts: Optional[np.ndarray] = None, total: int = 0,
+                 sum_c_log_c: float = 0.0):
+        self.counts = counts if counts is not None else np.zeros(SEQUENCE_SPACE, dtype=COUNT_DTYPE)
+        self.total = total
+        self.sum_c_log_c = sum_c_log_c
+
+    def add(self, index: int, count: int = 1):
+        previous = int(self.counts[index])
+        self.counts[index] = previous + count
+        self.total += count
+        self.sum_c_log_c += _c_log_c(previous + count) - _c_log_c(previous)
+
+    def add_sequences(self, sequences: Dict[str, int]):
+        """Fold {'a-b-c': count} into the counts, skipping impossible sequences"""
+        for key, count in sequences.items():
+            index = parse_sequence(key)
+            if index is not None and count > 0:
+                self.add(index, int(count))
+
+    def exploitability(self, space: int = SEQUENCE_SPACE) -> float:
+        return exploitability(self.total, self.sum_c_log_c, space)
+
+    def most_common(self, k: int = 10) -> List[Tuple[str, int]]:
+        top = np.argsort(-self.counts.astype(np.int64), kind='stable')[:k]
+        return [
+            ('-'.join(map(str, SEQUENCES[i])), int(self.counts[i]))
+            for i in top if self.counts[i]
+        ]
+
+    @classmethod
+    def from_legacy(cls, sequences: Dict[str, int]) -> 'SequenceCounts':
+        counts = cls()
+        counts.add_sequences(sequences)
+        return counts
+
+    @classmethod
+    def from_counts(cls, counts: np.ndarray) -> 'SequenceCounts':
+        """Build from a dense 504 array, recomputing the running totals exactly"""
+        counts = np.ascontiguousarray(counts, dtype=COUNT_DTYPE)
+        nonzero = counts[counts > 1].astype(np.float64)
+        return cls(counts, int(counts.sum()), float((nonzero * np.log(nonzero)).sum()))
+
+    def to_bytes(self) -> bytes:
+        return _HEADER.pack(self.total, self.sum_c_log_c) + self.counts.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'SequenceCounts':
+        if not data:
+            return cls()
+        data = bytes(data)
+        total, sum_c_log_c = _HEADER.unpack_from(data)
+        counts = np.frombuffer(data, dtype=COUNT_DTYPE, offset=_HEADER.size).copy()
+        return cls(counts, total, sum_c_log_c)
@@ -0,0 +1,172 @@
+"""
+Similar-Player Search
+Nearest-neighbour index over behavioral embeddings
+"""
+
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+
+EMBEDDING_SIZE = 6
+# Typical magnitude of each _update_embedding feature: game length, avg
+# response time (ms), unique cells, offensive moves, defensive moves, opening
+FEATURE_SCALES = np.array([9.0, 1000.0, 9.0, 5.0, 5.0, 8.0], dtype=np.float32)
+LOAD_CHUNK = 5000
+
+
+def normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+    """Scale features to comparable ranges and project onto the unit sphere"""
+    if len(embedding) != EMBEDDING_SIZE:
+        return None
+    vector = np.asarray(embedding, dtype=np.float32) / FEATURE_SCALES
+    norm = float(np.linalg.norm(vector))
+    if norm == 0:
+        return None
+    return vector / norm
+
+
+class EmbeddingIndex:
+    """Row-normalized embedding matrix with cosine top-k by matrix multiply
+
+    Rows are updated in place as profiles change; writes from other
+    workers are pulled through the last_updated index every
+    sync_interval seconds, reaching back sync_interval + sync_overlap
+    seconds for rows stamped before their transaction committed.
+    """
+
+    def __init__(self, sync_interval: float = 5.0, sync_overlap: float = 30.0):
+        self.sync_interval = sync_interval
+        self.sync_overlap = sync_overlap
+        self._matrix = np.zeros((0, EMBEDDING_SIZE), dtype=np.float32)
+        self._names: List[Optional[str]] = []
+        self._live = np.zeros(0, dtype=bool)  # False for rows left behind by removed players
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._synced_at = None
+        self._next_sync = 0.0
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _set(self, name: str, embedding: Sequence[float]):
+        vector = normalize(embedding) if embedding else None
+        row = self._rows.get(name)
+        if vector is None:
+            if row is not None:
+                # Leave a dead row behind; _top_k scores it below every real match
+                self._matrix[row] = 0
+                self._names[row] = None
+                self._live[row] = False
+                del self._rows[name]
+            return
+        if row is None:
+            if self._size == len(self._matrix):
+                grown = np.zeros((max(2 * self._size, 1024), EMBEDDING_SIZE), dtype=np.float32)
+                grown[:self._size] = self._matrix[:self._size]
+                self._matrix = grown
+                self._live = np.concatenate((self._live, np.zeros(len(grown) - len(self._live), dtype=bool)))
+            row = self._size
+            self._size += 1
+            self._rows[name] = row
+            self._names.append(name)
+            self._live[row] = True
+        self._matrix[row] = vector
+
+    def update(self, player_name: str, embedding: Sequence[float]):
+        """Refresh one player's row; no-op until the index is loaded"""
+        with self._lock:
+            if self._loaded:
+                self._set(player_name, embedding)
+
+    def _pull(self, queryset):
+        rows = queryset.exclude(behavioral_embedding=[]).values_list(
+            'player_name', 'behavioral_embedding'
+        ).iterator(chunk_size=LOAD_CHUNK)
+        for name, embedding in rows:
+            self._set(name, embedding)
+
+    def ensure_fresh(self):
+        """Load on first use, then pull rows other workers changed"""
+        from .ai_models import PlayerBehaviorProfile
+
+        with self._lock:
+            now = time.monotonic()
+            if self._loaded and now < self._next_sync:
+                return
+            synced_at = timezone.now()
+            queryset = PlayerBehaviorProfile.objects.all()
+            if self._loaded:
+                queryset = queryset.filter(
+                    last_updated__gte=self._synced_at - timedelta(seconds=self.sync_interval + self.sync_overlap)
+                )
+            self._pull(queryset)
+            self._loaded = True
+            self._synced_at = synced_at
+            self._next_sync = now + self.sync_interval
+
+    def _top_k(self, scores: np.ndarray, k: int, exclude: Optional[int]) -> List[Tuple[str, float]]:
+        # Before partitioning, so dead rows never take one of the k slots
+        scores[~self._live[:len(scores)]] = -np.inf
+        if exclude is not None:
+            scores[exclude] = -np.inf
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self._names[i], float(scores[i]))
+            for i in top if self._names[i] is not None and np.isfinite(scores[i])
+        ]
+
+    def similar(self, player_name: str, k: int = 10) -> Optional[List[Tuple[str, float]]]:
+        """Top-k most similar players by cosine similarity, None if not indexed"""
+        return self.similar_many([player_name], k)[player_name]
+
+    def similar_many(self, player_names: List[str], k: int = 10) -> Dict[str, Optional[List[Tuple[str, float]]]]:
+        """Top-k for several players with one batched matrix multiply"""
+        self.ensure_fresh()
+        with self._lock:
+            rows = {name: self._rows.get(name) for name in player_names}
+            indexed = [name for name, row in rows.items() if row is not None]
+            results = {name: None for name in player_names}
+            if not indexed:
+                return results
+            queries = self._matrix[[rows[name] for name in indexed]]
+            scores = self._matrix[:self._size] @ queries.T
+            for column, name in enumerate(indexed):
+                results[name] = self._top_k(scores[:, column].copy(), k, rows[name])
+            return results
+
+    def nearest(self, embedding: Sequence[float], k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k players closest to an arbitrary embedding"""
+        vector = normalize(embedding)
+        if vector is None:
+            return []
+        self.ensure_fresh()
+        with self._lock:
+            return self._top_k(self._matrix[:self._size] @ vector, k, None)
+
+
+_index: Optional[EmbeddingIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_embedding_index() -> EmbeddingIndex:
+    """Process-wide embedding index"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = EmbeddingIndex(
+                sync_interval=getattr(settings, 'BEHAVIOR_SIMILARITY_SYNC_INTERVAL', 5.0),
+                sync_overlap=getattr(settings, 'BEHAVIOR_SYNC_OVERLAP', 30.0),
+            )
+        return _index
@@ -0,0 +1,218 @@
+"""
+Perfect-Play Solver for Tic-Tac-Toe Positions
+Precomputed minimax tables over every reachable board, for either side to
+move, since X or O may open
+"""
+
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+
+
+BOARD_CELLS = 9
+POSITION_COUNT = 3 ** BOARD_CELLS
+
+# Cell encoding: board[i] contributes CELL_CODES[mark] * 3**i
+MARKS = ('', 'X', 'O')
+CELL_CODES = {'': 0, 'X': 1, 'O': 2}
+X, O = CELL_CODES['X'], CELL_CODES['O']
+POWERS = tuple(3 ** i for i in range(BOARD_CELLS))
+
+WIN_LINES = (
+    (0, 1, 2), (3, 4, 5), (6, 7, 8),
+    (0, 3, 6), (1, 4, 7), (2, 5, 8),
+    (0, 4, 8), (2, 4, 6),
+)
+
+UNREACHABLE = -128
+
+
+class Evaluation(NamedTuple):
+    """Solved position, scored for the side to move"""
+    value: int  # 1 = win, 0 = draw, -1 = loss
+    best_moves: List[int]  # Every move that preserves the value
+    optimal_move: Optional[int]  # Fastest win / slowest loss, None if terminal
+    distance: int  # Plies until the game ends under perfect play
+
+
+def encode(board: List[str]) -> int:
+    """Pack a 9-cell board into its base-3 integer code"""
+    if len(board) != BOARD_CELLS:
+        raise ValueError(f'Board must have {BOARD_CELLS} cells')
+    try:
+        return sum(CELL_CODES[cell] * POWERS[i] for i, cell in enumerate(board))
+    except KeyError as e:
+        raise ValueError(f'Invalid cell value: {e.args[0]!r}')
+
+
+def decode(code: int) -> List[str]:
+    """Unpack a base-3 integer code into a 9-cell board"""
+    board = []
+    for _ in range(BOARD_CELLS):
+        code, cell = divmod(code, 3)
+        board.append(MARKS[cell])
+    return board
+
+
+def _digits(code: int) -> List[int]:
+    digits = []
+    for _ in range(BOARD_CELLS):
+        code, cell = divmod(code, 3)
+        digits.append(cell)
+    return digits
+
+
+def _winner(digits: List[int]) -> int:
+    for a, b, c in WIN_LINES:
+        if digits[a] and digits[a] == digits[b] == digits[c]:
+            return digits[a]
+    return 0
+
+
+def side_to_move(code: int) -> Optional[int]:
+    """Mark to move on a packed board from its mark counts, None when X and O are level
+
+    Level counts happen in both games: X to move if X opened, O if O did.
+    """
+    digits = _digits(code)
+    x_count, o_count = digits.count(X), digits.count(O)
+    if x_count == o_count + 1:
+        return O
+    if o_count == x_count + 1:
+        return X
+    return None
+
+
+def _build_tables() -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Solve every position reachable from the empty board with either side opening
+
+    Tables are indexed by [side to move - 1, board code].
+    """
+    shape = (2, POSITION_COUNT)
+    values = np.full(shape, UNREACHABLE, dtype=np.int8)
+    best = np.zeros(shape, dtype=np.uint16)  # Bitmask of best moves
+    primary = np.full(shape, -1, dtype=np.int8)
+    distance = np.zeros(shape, dtype=np.uint8)
+
+    def solve(code: int, to_move: int):
+        side = to_move - 1
+        if values[side, code] != UNREACHABLE:
+            return
+        digits = _digits(code)
+        if _winner(digits) or 0 not in digits:
+            # The previous mover completed a line, or the board is full
+            values[side, code] = -1 if _winner(digits) else 0
+            return
+
+        scored = []
+        for move in range(BOARD_CELLS):
+            if digits[move]:
+                continue
+            child = code + to_move * POWERS[move]
+            solve(child, 3 - to_move)
+            scored.append((-int(values[2 - to_move, child]), int(distance[2 - to_move, child]) + 1, move))
+
+        value = max(score for score, _, _ in scored)
+        candidates = [(plies, move) for score, plies, move in scored if score == value]
+        # Winner wants the shortest game, everyone else the longest
+        if value > 0:
+            plies, move = min(candidates)
+        else:
+            plies, move = max(candidates, key=lambda c: (c[0], -c[1]))
+
+        values[side, code] = value
+        best[side, code] = sum(1 << m for _, m in candidates)
+        primary[side, code] = move
+        distance[side, code] = plies
+
+    solve(0, X)
+    solve(0, O)
+    return values, best, primary, distance
+
+
+VALUES, BEST_MOVES, PRIMARY_MOVES, DISTANCES = _build_tables()
+REACHABLE_POSITIONS = int(np.count_nonzero(VALUES != UNREACHABLE))  # (board, side to move) pairs
+
+
+def evaluate(board: List[str], to_move: Optional[str] = None) -> Evaluation:
+    """Look up the perfect-play evaluation of a board
+
+    The side to move comes from the mark counts; `to_move` ('X' or 'O') is
+    only needed when they are level on a non-empty board.
+    """
+    code = encode(board)
+    if to_move is not None:
+        if to_move not in ('X', 'O'):
+            raise ValueError("toMove must be 'X' or 'O'")
+        mark = CELL_CODES[to_move]
+    else:
+        mark = side_to_move(code)
+        if mark is None:
+            if code:
+                raise ValueError('Side to move is ambiguous with equal X and O counts; pass toMove')
+            mark = X  # The empty board evaluates the same for either side
+    side = mark - 1
+    value = int(VALUES[side, code])
+    if value == UNREACHABLE:
+        raise ValueError(f'Position is not reachable with {MARKS[mark]} to move')
+    mask = int(BEST_MOVES[side, code])
+    move = int(PRIMARY_MOVES[side, code])
+    return Evaluation(
+        value=value,
+        best_moves=[m for m in range(BOARD_CELLS) if mask >> m & 1],
+        optimal_move=move if move >= 0 else None,
+        distance=int(DISTANCES[side, code]),
+    )
+
+
+def optimal_move(board: List[str], to_move: Optional[str] = None) -> Optional[int]:
+    """Best move for the side to move, None if the game is over"""
+    return evaluate(board, to_move).optimal_move
+
+
+def is_optimal(board: List[str], move: int, to_move: Optional[str] = None) -> Optional[bool]:
+    """Whether a move preserves the minimax value, None if it cannot be scored
+
+    Accepts the board either before the move or, as the client records it,
+    with the move already placed; a placed move names the mover itself.
+    """
+    if not 0 <= move < BOARD_CELLS or len(board) != BOARD_CELLS:
+        return None
+    try:
+        code = encode(board)
+    except ValueError:
+        return None
+    return is_optimal_code(code, move, CELL_CODES.get(to_move) if to_move else None)
+
+
+def is_optimal_code(code: int, move: int, to_move: Optional[int] = None) -> Optional[bool]:
+    """is_optimal() for a board already packed with encode(), with to_move as a mark code"""
+    if not 0 <= move < BOARD_CELLS or not 0 <= code < POSITION_COUNT:
+        return None
+    placed = code // POWERS[move] % 3
+    if placed:
+        to_move = placed
+        code -= placed * POWERS[move]  # Clear the move's own cell
+    elif to_move is None:
+        to_move = side_to_move(code)
+        if to_move is None:
+            if code:
+                return None  # Level counts before the move: either side could be moving
+            to_move = X
+    if to_move not in (X, O):
+        return None
+    side = to_move - 1
+    if VALUES[side, code] == UNREACHABLE or not BEST_MOVES[side, code]:
+        return None
+    return bool(int(BEST_MOVES[side, code]) >> move & 1)
+
+
+def optimal_move_rate(positions: Iterable[Tuple[List[str], int]]) -> Tuple[int, int]:
+    """Count (optimal, scored) over a stream of (board, move) pairs"""
+    matched = scored = 0
+    for board, move in positions:
+        result = is_optimal(board, move)
+        if result is None:
+            continue
+        scored += 1
+        matched += result
+    return matched, scored
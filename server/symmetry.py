@@ -0,0 +1,120 @@
+"""
+Board Symmetry Tables
+Precomputed cell permutations for the 8 rotations and reflections of the
+board, used to fold move statistics onto one canonical orientation
+"""
+
+from typing import List
+
+import numpy as np
+from django.conf import settings
+
+from .sequence_sketch import SEQUENCE_CODES
+
+
+BOARD_CELLS = 9
+TRIPLE_SPACE = BOARD_CELLS ** 3  # a*81 + b*9 + c, the Markov table layout
+
+
+def _build_transforms() -> np.ndarray:
+    """TRANSFORMS[k, cell] is where cell lands under symmetry k"""
+    rotate = [(cell % 3) * 3 + 2 - cell // 3 for cell in range(BOARD_CELLS)]
+    mirror = [cell // 3 * 3 + 2 - cell % 3 for cell in range(BOARD_CELLS)]
+    transforms = [list(range(BOARD_CELLS))]
+    for _ in range(3):
+        transforms.append([rotate[cell] for cell in transforms[-1]])
+    transforms += [[mirror[cell] for cell in transform] for transform in transforms]
+    return np.array(transforms, dtype=np.intp)
+
+
+TRANSFORMS = _build_transforms()
+
+# Orbit representative of every cell: 0 for corners, 1 for edges, 4 for the centre
+CANONICAL_CELLS = TRANSFORMS.min(axis=0)
+
+
+def _build_triples():
+    codes = np.arange(TRIPLE_SPACE)
+    a, b, c = codes // BOARD_CELLS ** 2, codes // BOARD_CELLS % BOARD_CELLS, codes % BOARD_CELLS
+    images = (TRANSFORMS[:, a] * BOARD_CELLS + TRANSFORMS[:, b]) * BOARD_CELLS + TRANSFORMS[:, c]
+    canonical = images.min(axis=0)
+    # Cells c that share (a, b, c)'s representative within the same (a, b) context
+    context = codes // BOARD_CELLS
+    _, group = np.unique(context * TRIPLE_SPACE + canonical, return_inverse=True)
+    multiplicity = np.bincount(group)[group]
+    return canonical, multiplicity
+
+
+# Representative code of every (a, b, c) triple: the smallest code among its 8 images.
+# A folded table keeps the 81x9 layout with counts only at representatives.
+CANONICAL_TRIPLES, TRIPLE_MULTIPLICITY = _build_triples()
+CANONICAL_CODES = np.unique(CANONICAL_TRIPLES)  # 105 orbits
+# Folded sequences of three distinct cells land on 66 of them
+SEQUENCE_ORBITS = len(np.unique(CANONICAL_TRIPLES[SEQUENCE_CODES]))
+
+
+def symmetry_enabled() -> bool:
+    return getattr(settings, 'BEHAVIOR_SYMMETRY', False)
+
+
+def sequence_space() -> int:
+    """Distinct 3-move sequences a player's counts can hold under the current setting"""
+    return SEQUENCE_ORBITS if symmetry_enabled() else len(SEQUENCE_CODES)
+
+
+def canonical_cell(cell: int) -> int:
+    return int(CANONICAL_CELLS[cell])
+
+
+def canonical_sequence(cells: List[int]) -> List[int]:
+    """Three-move sequence in its canonical orientation"""
+    code = int(CANONICAL_TRIPLES[(cells[0] * BOARD_CELLS + cells[1]) * BOARD_CELLS + cells[2]])
+    return [code // BOARD_CELLS ** 2, code // BOARD_CELLS % BOARD_CELLS, code % BOARD_CELLS]
+
+
+def fold(counts: np.ndarray) -> np.ndarray:
+    """Move every count onto its triple's representative
+
+    Works on one 81x9 table or a stack of flattened tables (players x 729).
+    """
+    flat = counts.reshape(-1, TRIPLE_SPACE)
+    folded = np.zeros(flat.shape, dtype=np.int64)
+    np.add.at(folded.T, CANONICAL_TRIPLES, flat.T.astype(np.int64))
+    return folded.astype(counts.dtype).reshape(counts.shape)
+
+
+def fold_sequences(counts: np.ndarray) -> np.ndarray:
+    """Fold dense 504 sequence counts the same way as a transition table"""
+    table = np.zeros(TRIPLE_SPACE, dtype=counts.dtype)
+    table[SEQUENCE_CODES] = counts
+    return fold(table)[SEQUENCE_CODES]
+
+
+def compact(table: np.ndarray) -> np.ndarray:
+    """The 105 representative counts of a folded table"""
+    return table.reshape(TRIPLE_SPACE)[CANONICAL_CODES]
+
+
+def expand(counts: np.ndarray, shape) -> np.ndarray:
+    """Folded table from its 105 representative counts"""
+    table = np.zeros(TRIPLE_SPACE, dtype=counts.dtype)
+    table[CANONICAL_CODES] = counts
+    return table.reshape(shape)
+
+
+def oriented_row(table: np.ndarray, context: int) -> np.ndarray:
+    """Next-move weights for a real (prev, last) context from a folded table
+
+    Counts shared by cells that are equivalent given the context are split
+    evenly between them.
+    """
+    codes = slice(context * BOARD_CELLS, (context + 1) * BOARD_CELLS)
+    return table.reshape(TRIPLE_SPACE)[CANONICAL_TRIPLES[codes]] / TRIPLE_MULTIPLICITY[codes]
+
+
+def oriented_cell(canonical: int, board: List[str]) -> int:
+    """First empty cell in the orbit of a canonical cell, or the cell itself"""
+    for cell in np.flatnonzero(CANONICAL_CELLS == canonical).tolist():
+        if board[cell] == '':
+            return cell
+    return canonical
@@ -0,0 +1,24 @@
+"""
+Tests for the behavior analysis app
+"""
+
+from typing import Dict, List
+
+from django.test import TestCase
+
+from ..ai_models import BehaviorAnalyzer
+from ..profile_cache import get_profile_cache
+from ..response_cache import get_body_cache
+
+
+class BehaviorTestCase(TestCase):
+    """Clears the process-wide caches, which outlive each test's rolled-back transaction"""
+
+    def setUp(self):
+        get_profile_cache().clear()
+        get_body_cache().clear()
+
+    def record(self, games: List[Dict]):
+        """Ingest games and run their on-commit cache invalidation"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return BehaviorAnalyzer.record_games(games)
@@ -0,0 +1,42 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import override_settings
+
+from ..ai_models import GameRecord, MoveEvent, PatternAnalysis, PlayerBehaviorProfile
+from ..benchmarks import SyntheticPlayers
+from . import BehaviorTestCase
+
+
+class GameRecordTests(BehaviorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.players = SyntheticPlayers(3, seed=12)
+
+    def records(self):
+        return {
+            (player_id, game_id): (result_code, bytes(packed_moves))
+            for player_id, game_id, result_code, packed_moves in GameRecord.objects.values_list(
+                'player_id', 'game_id', 'result_code', 'packed_moves'
+            )
+        }
+
+    @override_settings(BEHAVIOR_STORE_MOVE_EVENTS=False)
+    def test_move_events_are_only_stored_when_enabled(self):
+        self.record([self.players.game(i % 3) for i in range(6)])
+        self.assertEqual(GameRecord.objects.count(), 6)
+        self.assertFalse(MoveEvent.objects.exists())
+
+    @override_settings(BEHAVIOR_STORE_MOVE_EVENTS=True)
+    def test_build_game_records_repacks_missing_games(self):
+        self.record([self.players.game(i % 3) for i in range(12)])
+        expected = self.records()
+        untouched = PlayerBehaviorProfile.objects.get(player_name=self.players.names[0])
+        GameRecord.objects.exclude(player=untouched).delete()
+
+        call_command('build_game_records', batch_size=2, stdout=StringIO())
+        self.assertEqual(self.records(), expected)
+        self.assertEqual(
+            dict(PatternAnalysis.objects.values_list('player_id', 'markov_built')),
+            {pk: pk == untouched.pk for pk in PlayerBehaviorProfile.objects.values_list('pk', flat=True)},
+        )
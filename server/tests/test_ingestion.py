@@ -0,0 +1,105 @@
+import json
+from unittest import mock
+
+from django.db.models import F
+from django.test import override_settings
+
+from .. import profile_aggregator
+from ..ai_models import BehaviorAnalyzer, GameRecord, PlayerBehaviorProfile
+from ..benchmarks import SyntheticPlayers
+from ..profile_aggregator import ProfileAggregator
+from . import BehaviorTestCase
+
+
+class IngestionTests(BehaviorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.players = SyntheticPlayers(3, seed=4)
+
+    def post(self, path, payload):
+        return self.client.post(path, json.dumps(payload), content_type='application/json')
+
+    def test_counters_are_written_as_deltas(self):
+        self.record([self.players.game(0)])
+        name = self.players.names[0]
+        apply_game = BehaviorAnalyzer._apply_game
+
+        def concurrent_write(profile, game_data):
+            # Another worker commits three games between our read and our write
+            PlayerBehaviorProfile.objects.filter(pk=profile.pk).update(total_games=F('total_games') + 3)
+            apply_game(profile, game_data)
+
+        with mock.patch.object(BehaviorAnalyzer, '_apply_game', side_effect=concurrent_write):
+            self.record([self.players.game(0), self.players.game(0)])
+        self.assertEqual(PlayerBehaviorProfile.objects.get(player_name=name).total_games, 1 + 2 * 3 + 2)
+
+    def test_record_games_endpoint(self):
+        games = [self.players.game(i % 3) for i in range(9)]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post('/api/behavior/record-games', {'games': games})
+        self.assertEqual(response.status_code, 200)
+        profiles = response.json()['profiles']
+        self.assertEqual(sum(profile['totalGames'] for profile in profiles.values()), 9)
+        self.assertEqual(GameRecord.objects.count(), 9)
+
+    def test_invalid_games_are_rejected(self):
+        invalid = [
+            {'result': 'win', 'moves': []},
+            {'playerName': 'ann', 'result': 'forfeit', 'moves': []},
+            {'playerName': 'ann', 'result': 'win', 'moves': {}},
+            {'playerName': 'ann', 'result': 'win', 'moves': [{'moveIndex': 9}]},
+            {'playerName': 'ann', 'result': 'win', 'moves': [{'moveIndex': True}]},
+            {'playerName': 'ann', 'result': 'win', 'moves': [{'moveIndex': 4, 'responseTime': 'slow'}]},
+        ]
+        for game in invalid:
+            with self.subTest(game=game):
+                self.assertEqual(self.post('/api/behavior/record-game', game).status_code, 400)
+                self.assertEqual(self.post('/api/behavior/record-games', {'games': [game]}).status_code, 400)
+        self.assertFalse(PlayerBehaviorProfile.objects.exists())
+
+
+@override_settings(BEHAVIOR_WRITE_BEHIND=True)
+class WriteBehindTests(BehaviorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.players = SyntheticPlayers(2, seed=5)
+        # Not started: the test flushes by hand instead of on the flusher thread
+        self.aggregator = ProfileAggregator(max_attempts=2)
+        patcher = mock.patch.object(profile_aggregator, '_aggregator', self.aggregator)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def flush(self) -> int:
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.aggregator.flush()
+
+    def test_queued_games_are_written_on_flush(self):
+        games = [self.players.game(i % 2) for i in range(6)]
+        response = self.client.post('/api/behavior/record-games', json.dumps({'games': games}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.aggregator.pending_games, 6)
+        self.assertFalse(PlayerBehaviorProfile.objects.exists())
+
+        self.assertEqual(self.flush(), 6)
+        self.assertEqual(self.aggregator.pending_games, 0)
+        self.assertEqual(sum(PlayerBehaviorProfile.objects.values_list('total_games', flat=True)), 6)
+
+    def test_failing_games_are_retried_then_dropped(self):
+        good = self.players.game(0)
+        bad = {'playerName': good['playerName'], 'result': 'win', 'moves': [{'moveNumber': 1}]}
+        self.aggregator.submit(good['playerName'], good)
+        self.aggregator.submit(good['playerName'], bad)
+        self.aggregator.submit(self.players.names[1], self.players.game(1))
+
+        with self.assertLogs(profile_aggregator.logger, 'ERROR'):
+            self.assertEqual(self.flush(), 1)
+        self.assertEqual(self.aggregator.pending_games, 2)  # Requeued for the next flush
+
+        with self.assertLogs(profile_aggregator.logger, 'ERROR') as logs:
+            self.assertEqual(self.flush(), 1)
+        self.assertTrue(any('Dropping' in message for message in logs.output))
+        self.assertEqual(self.aggregator.pending_games, 0)
+        self.assertEqual(
+            PlayerBehaviorProfile.objects.get(player_name=good['playerName']).total_games, 1
+        )
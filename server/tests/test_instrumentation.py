@@ -0,0 +1,46 @@
+import cProfile
+import threading
+from unittest import mock
+
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from .. import instrumentation
+from ..instrumentation import MetricsMiddleware
+
+
+@override_settings(BEHAVIOR_SLOW_REQUEST_MS=60000, BEHAVIOR_PROFILE_SAMPLE_RATE=1.0)
+class SampledProfilingTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def get_response(self, request):
+        if request.path == '/slow':
+            self.entered.set()
+            self.release.wait(5)
+        return HttpResponse('ok')
+
+    def test_one_request_is_profiled_at_a_time(self):
+        middleware = MetricsMiddleware(self.get_response)
+        with mock.patch.object(instrumentation.cProfile, 'Profile', wraps=cProfile.Profile) as profile:
+            slow = threading.Thread(target=middleware, args=(self.factory.get('/slow'),))
+            slow.start()
+            self.assertTrue(self.entered.wait(5))
+            self.assertEqual(middleware(self.factory.get('/fast')).status_code, 200)
+            self.release.set()
+            slow.join(5)
+            self.assertEqual(profile.call_count, 1)
+
+            middleware(self.factory.get('/fast'))
+            self.assertEqual(profile.call_count, 2)
+
+    def test_request_survives_another_active_profiler(self):
+        middleware = MetricsMiddleware(self.get_response)
+        busy = mock.Mock(**{'enable.side_effect': ValueError('Another profiling tool is already active')})
+        with mock.patch.object(instrumentation.cProfile, 'Profile', return_value=busy):
+            self.assertEqual(middleware(self.factory.get('/fast')).status_code, 200)
+            self.assertEqual(middleware(self.factory.get('/fast')).status_code, 200)
+        self.assertEqual(busy.enable.call_count, 2)  # The sampling slot was released
+        busy.disable.assert_not_called()
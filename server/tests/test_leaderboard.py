@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from ..ai_models import PlayerBehaviorProfile
+from ..leaderboard import Leaderboard, encode_cursor
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        PlayerBehaviorProfile.objects.bulk_create([
+            PlayerBehaviorProfile(
+                player_name=f'player-{i:02d}', wins=i % 7, losses=i % 5, draws=0,
+                total_games=i % 7 + i % 5, last_game_at=now - timedelta(hours=i),
+            )
+            for i in range(30)
+        ])
+        self.board = Leaderboard(min_games=5, sync_interval=0)
+
+    def pages(self, ordering, limit=7):
+        entries, cursor = self.board.page(ordering, limit=limit)
+        while cursor is not None:
+            page, cursor = self.board.page(ordering, cursor, limit)
+            entries += page
+        return entries
+
+    def test_cursor_pages_cover_every_player_once_in_order(self):
+        profiles = PlayerBehaviorProfile.objects.filter(total_games__gte=1)
+        expected = sorted(profiles, key=lambda p: (-p.wins, p.losses, p.player_name))
+
+        entries = self.pages('wins')
+        self.assertEqual([entry['playerName'] for entry in entries], [p.player_name for p in expected])
+        self.assertEqual([entry['rank'] for entry in entries], list(range(1, len(expected) + 1)))
+
+    def test_win_rate_needs_min_games(self):
+        names = {entry['playerName'] for entry in self.pages('win_rate')}
+        expected = set(PlayerBehaviorProfile.objects.filter(total_games__gte=5).values_list('player_name', flat=True))
+        self.assertEqual(names, expected)
+        self.assertIsNone(self.board.rank('player-01', 'win_rate'))
+
+    def test_rank_matches_page_position(self):
+        entries = self.pages('wins')
+        for position in (0, len(entries) // 2, len(entries) - 1):
+            name = entries[position]['playerName']
+            rank = self.board.rank(name, neighbours=2)
+            self.assertEqual(rank['rank'], position + 1)
+            self.assertIn(name, [entry['playerName'] for entry in rank['neighbours']])
+
+    def test_sync_picks_up_rows_stamped_before_the_previous_sync(self):
+        self.board.page('wins')
+        # Another worker stamped this row before our last scan but committed after it
+        PlayerBehaviorProfile.objects.filter(player_name='player-00').update(
+            wins=100, total_games=100, last_updated=timezone.now() - timedelta(seconds=10)
+        )
+        entries, _ = self.board.page('wins', limit=1)
+        self.assertEqual(entries[0]['playerName'], 'player-00')
+
+    def test_malformed_cursors_are_rejected(self):
+        _, cursor = self.board.page('wins', limit=3)
+        with self.assertRaises(ValueError):
+            self.board.page('recent', cursor)  # A cursor from another ordering
+        for key in (['a', 1], [1, 2], [1, 2, 3], [True, 0, 'x'], 'abc', {'a': 1}):
+            with self.subTest(key=key), self.assertRaises(ValueError):
+                self.board.page('wins', encode_cursor(key))
+        with self.assertRaises(ValueError):
+            self.board.page('wins', 'not base64!')
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        response = self.client.get('/api/behavior/leaderboard', {'cursor': encode_cursor(['a', 1])})
+        self.assertEqual(response.status_code, 400)
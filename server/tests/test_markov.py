@@ -0,0 +1,50 @@
+import numpy as np
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..ai_models import WARM_START_GAMES, BehaviorAnalyzer, PatternAnalysis, PlayerBehaviorProfile
+from ..benchmarks import SyntheticPlayers
+from ..profile_cache import get_profile_cache
+from . import BehaviorTestCase
+
+
+class MarkovTableTests(BehaviorTestCase):
+    def _record_batches(self, players: SyntheticPlayers, batches: int = 4, games: int = 12):
+        recorded = []
+        for _ in range(batches):  # Each batch increments the table stored by the previous one
+            batch = [players.game(i % len(players.names)) for i in range(games)]
+            self.record(batch)
+            recorded += batch
+        return recorded
+
+    def _assert_matches_rebuild(self, recorded):
+        for profile in PlayerBehaviorProfile.objects.all():
+            stored = PatternAnalysis.objects.get(player=profile).get_markov_table()
+            np.testing.assert_array_equal(stored, BehaviorAnalyzer._rebuild_markov_table(profile))
+            expected = sum(
+                max(len(game['moves']) - 2, 0) for game in recorded if game['playerName'] == profile.player_name
+            )
+            self.assertEqual(int(stored.sum()), expected)
+
+    def test_incremental_table_matches_full_rebuild(self):
+        recorded = self._record_batches(SyntheticPlayers(3, seed=1))
+        self._assert_matches_rebuild(recorded)
+
+    @override_settings(BEHAVIOR_SYMMETRY=True)
+    def test_folded_table_matches_full_rebuild(self):
+        recorded = self._record_batches(SyntheticPlayers(3, seed=2))
+        self._assert_matches_rebuild(recorded)
+
+    def test_cold_prediction_queries_do_not_grow_with_history(self):
+        players = SyntheticPlayers(2, skew=0, seed=3)
+        self.record([players.game(0) for _ in range(WARM_START_GAMES)])
+        self.record([players.game(1) for _ in range(8 * WARM_START_GAMES)])
+
+        counts = []
+        for name in players.names:
+            get_profile_cache().invalidate(name)
+            with CaptureQueriesContext(connection) as captured:
+                self.assertIsNotNone(BehaviorAnalyzer.predict_distribution(name, ['X', '', '', '', 'O', '', '', '', ''], [0, 4]))
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
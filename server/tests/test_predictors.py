@@ -0,0 +1,143 @@
+import numpy as np
+from django.test import SimpleTestCase, override_settings
+
+from ..ai_models import WARM_START_GAMES, BehaviorAnalyzer, PatternAnalysis, PlayerBehaviorProfile
+from ..benchmarks import SyntheticPlayers
+from ..context_trie import ContextTrie, mover_symbol
+from ..predictors import MovePredictor, legal_cells
+from . import BehaviorTestCase
+
+
+class ContextTrieTests(SimpleTestCase):
+    def setUp(self):
+        players = SyntheticPlayers(1, seed=7)
+        self.trie = ContextTrie(order=3, node_limit=64)
+        for i in range(40):
+            self.trie.add_game([move['moveIndex'] for move in players.game(0)['moves']], i % 2)
+
+    def test_round_trip_is_identical(self):
+        restored = ContextTrie.from_bytes(self.trie.to_bytes())
+        self.assertEqual(restored.node_count, self.trie.node_count)
+        self.assertEqual(restored.node_limit, self.trie.node_limit)
+        np.testing.assert_array_equal(restored.children, self.trie.children[:self.trie.node_count])
+        np.testing.assert_array_equal(restored.counts, self.trie.counts[:self.trie.node_count])
+        self.assertEqual(restored.to_bytes(), self.trie.to_bytes())
+
+        legal = np.ones(9, dtype=bool)
+        for history in ([], [4], [4, 0], [4, 0, 8, 2]):
+            np.testing.assert_array_equal(
+                restored.distribution(history, 0, legal), self.trie.distribution(history, 0, legal)
+            )
+
+    def test_distributions_sum_to_one_over_legal_cells(self):
+        rng = np.random.default_rng(0)
+        for _ in range(50):
+            history = rng.permutation(9)[:rng.integers(0, 6)].tolist()
+            legal = np.ones(9, dtype=bool)
+            legal[history] = False
+            distribution = self.trie.distribution(history, len(history) % 2, legal)
+            self.assertAlmostEqual(distribution.sum(), 1.0)
+            self.assertFalse(distribution[~legal].any())
+
+    def test_node_limit_stops_growth(self):
+        self.assertLessEqual(self.trie.node_count, 64)
+
+
+    def test_mover_symbol_accepts_boards_before_and_after_the_move(self):
+        self.assertEqual(mover_symbol([''] * 9, 4), 0)
+        self.assertEqual(mover_symbol(['', '', '', '', 'X', '', '', '', ''], 4), 0)
+        self.assertEqual(mover_symbol(['O', '', '', '', '', '', '', '', ''], 4), 1)
+        self.assertEqual(mover_symbol(['O', '', '', '', 'X', '', '', '', ''], 4), 1)
+
+
+class PredictorBaseTests(SimpleTestCase):
+    def test_distribution_is_abstract(self):
+        class Incomplete(MovePredictor):
+            name = 'incomplete'
+
+        with self.assertRaises(TypeError):
+            Incomplete()
+
+
+def placed_boards(game):
+    """The game as the browser client records it: each board with its move already placed"""
+    for move in game['moves']:
+        move['boardState'] = list(move['boardState'])
+        move['boardState'][move['moveIndex']] = 'X'
+    return game
+
+
+class StoredTrieTests(BehaviorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.players = SyntheticPlayers(3, seed=8)
+        self.players.preferences[0] = np.full(9, 0.01)
+        self.players.preferences[0, 4] = 1.0  # Nearly always opens in the centre
+
+    def assert_stored_tries_match_rebuild(self):
+        for profile in PlayerBehaviorProfile.objects.all():
+            stored = PatternAnalysis.objects.get(player=profile).get_context_trie()
+            self.assertEqual(stored.to_bytes(), BehaviorAnalyzer._rebuild_context_trie(profile).to_bytes())
+
+    def test_stored_trie_matches_rebuild(self):
+        self.record([self.players.game(i % 3) for i in range(15)])
+        self.assert_stored_tries_match_rebuild()
+
+    @override_settings(BEHAVIOR_PREDICTOR='ppm')
+    def test_client_boards_count_the_opening_player_as_first(self):
+        name = self.players.names[0]
+        replies = [{
+            'playerName': name, 'result': 'loss',
+            'moves': [{'moveIndex': 0, 'moveNumber': 1, 'boardState': ['X', '', '', '', 'O', '', '', '', '']}],
+        }] * 10  # Games the AI opened in the centre, answered in the corner
+        self.record([placed_boards(self.players.game(0)) for _ in range(10)] + replies)
+        self.assert_stored_tries_match_rebuild()
+
+        opening = BehaviorAnalyzer.predict_distribution(name, [''] * 9, [])
+        self.assertEqual(int(opening.argmax()), 4)
+        reply = BehaviorAnalyzer.predict_distribution(name, ['', '', '', '', 'O', '', '', '', ''], [])
+        self.assertEqual(int(reply.argmax()), 0)
+
+
+class BatchPredictionTests(BehaviorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.players = SyntheticPlayers(4, seed=8)
+        self.record([self.players.game(i % 4) for i in range(4 * WARM_START_GAMES)])
+        # Every position of a few fresh games, as (player, board, history) items
+        self.items = []
+        for player in range(4):
+            moves = self.players.game(player)['moves']
+            for i, move in enumerate(moves):
+                history = [previous['moveIndex'] for previous in moves[:i]]
+                self.items.append((self.players.names[player], move['boardState'], history))
+        self.items.append(('nobody', [''] * 9, [0, 4]))
+
+    def assert_batch_matches_single(self):
+        batch = BehaviorAnalyzer.predict_batch(self.items)
+        for item, distribution in zip(self.items, batch):
+            with self.subTest(item=item):
+                single = BehaviorAnalyzer.predict_distribution(*item)
+                if single is None:
+                    self.assertIsNone(distribution)
+                else:
+                    np.testing.assert_allclose(distribution, single)
+                    self.assertAlmostEqual(distribution.sum(), 1.0)
+                    self.assertFalse(distribution[~legal_cells(item[1])].any())
+
+    def test_markov_batch_matches_single(self):
+        self.assert_batch_matches_single()
+
+    @override_settings(BEHAVIOR_PREDICTOR='ppm')
+    def test_context_tree_batch_matches_single(self):
+        self.assert_batch_matches_single()
+
+    @override_settings(BEHAVIOR_SYMMETRY=True)
+    def test_folded_markov_batch_matches_single(self):
+        self.assert_batch_matches_single()
+
+    def test_batch_difficulties_match_single(self):
+        names = self.players.names + ['nobody']
+        difficulties = BehaviorAnalyzer.calculate_difficulties(names)
+        for name in names:
+            self.assertAlmostEqual(difficulties[name], BehaviorAnalyzer.calculate_difficulty(name))
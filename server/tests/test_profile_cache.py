@@ -0,0 +1,95 @@
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from ..ai_models import BehaviorAnalyzer
+from ..benchmarks import SyntheticPlayers
+from ..profile_cache import (
+    DjangoCacheBackend, LocalLRUBackend, ProfileCache, get_profile_cache, isolated_profile_cache,
+)
+from . import BehaviorTestCase
+
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+class CountingLoader:
+    """Loader returning a fresh version number per call"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, player_name):
+        self.calls += 1
+        return (player_name, self.calls)
+
+    def many(self, player_names):
+        return {name: self(name) for name in player_names}
+
+
+class ProfileCacheTests(SimpleTestCase):
+    def backend(self):
+        return LocalLRUBackend()
+
+    def setUp(self):
+        self.cache = ProfileCache(self.backend())
+        self.cache.clear()
+        self.loader = CountingLoader()
+
+    def test_invalidate_forces_a_reload(self):
+        self.assertEqual(self.cache.get_or_load('ann', self.loader), ('ann', 1))
+        self.assertEqual(self.cache.get_or_load('ann', self.loader), ('ann', 1))
+        self.cache.invalidate('ann')
+        self.assertEqual(self.cache.get_or_load('ann', self.loader), ('ann', 2))
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 2))
+
+    def test_load_racing_an_invalidation_is_not_served(self):
+        def racing_loader(player_name):
+            entry = self.loader(player_name)
+            self.cache.invalidate(player_name)  # A write commits while the stale row is decoded
+            return entry
+
+        self.assertEqual(self.cache.get_or_load('ann', racing_loader), ('ann', 1))
+        self.assertEqual(self.cache.get_or_load('ann', self.loader), ('ann', 2))
+
+    def test_batch_loads_only_misses(self):
+        self.cache.get_or_load('ann', self.loader)
+        self.cache.invalidate('bob')
+        entries = self.cache.get_or_load_many(['ann', 'bob', 'ann'], self.loader.many)
+        self.assertEqual(entries, {'ann': ('ann', 1), 'bob': ('bob', 2)})
+        self.cache.invalidate('ann')
+        entries = self.cache.get_or_load_many(['ann', 'bob'], self.loader.many)
+        self.assertEqual(entries, {'ann': ('ann', 3), 'bob': ('bob', 2)})
+
+    def test_clear_drops_every_entry(self):
+        self.cache.get_or_load('ann', self.loader)
+        self.cache.clear()
+        self.assertEqual(self.cache.get_or_load('ann', self.loader), ('ann', 2))
+
+
+@override_settings(CACHES=LOCMEM)
+class DjangoBackendTests(ProfileCacheTests):
+    def backend(self):
+        return DjangoCacheBackend()
+
+    def test_clear_leaves_other_keys_alone(self):
+        caches['default'].set('unrelated', 1)
+        self.cache.get_or_load('ann', self.loader)
+        self.cache.clear()
+        self.assertEqual(caches['default'].get('unrelated'), 1)
+
+
+class CachedProfileTests(BehaviorTestCase):
+    def test_recorded_game_invalidates_cached_profile(self):
+        players = SyntheticPlayers(1, seed=6)
+        self.record([players.game(0)])
+        name = players.names[0]
+        self.assertEqual(BehaviorAnalyzer.get_cached_profile(name).profile.total_games, 1)
+        self.record([players.game(0)])
+        self.assertEqual(BehaviorAnalyzer.get_cached_profile(name).profile.total_games, 2)
+
+    def test_isolated_cache_restores_the_process_cache(self):
+        cache = get_profile_cache()
+        with isolated_profile_cache() as isolated:
+            self.assertIs(get_profile_cache(), isolated)
+            self.assertIsNot(isolated, cache)
+        self.assertIs(get_profile_cache(), cache)
@@ -0,0 +1,43 @@
+from django.utils.http import http_date
+
+from ..benchmarks import SyntheticPlayers
+from . import BehaviorTestCase
+
+
+class ConditionalResponseTests(BehaviorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.players = SyntheticPlayers(1, seed=10)
+        self.record([self.players.game(0)])
+        self.name = self.players.names[0]
+
+    def test_unchanged_profile_is_answered_with_304(self):
+        for path in (f'/api/behavior/profile/{self.name}', f'/api/behavior/difficulty/{self.name}'):
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotIn('Last-Modified', response)
+                etag = response['ETag']
+
+                with self.assertNumQueries(0):
+                    response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+                self.assertEqual(response['ETag'], etag)
+
+    def test_update_within_the_same_second_changes_the_etag(self):
+        path = f'/api/behavior/profile/{self.name}'
+        response = self.client.get(path)
+        etag = response['ETag']
+        self.record([self.players.game(0)])
+
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['profile']['totalGames'], 2)
+
+    def test_leaderboard_page_is_answered_with_304(self):
+        response = self.client.get('/api/behavior/leaderboard')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get('/api/behavior/leaderboard', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+import numpy as np
+from django.test import override_settings
+from django.utils import timezone
+
+from ..ai_models import (
+    BehaviorAnalyzer, DailySummary, GameRecord, MoveEvent, PatternAnalysis, PlayerBehaviorProfile,
+)
+from ..batch_analysis import reanalyze_all
+from ..benchmarks import SyntheticPlayers
+from ..retention import retention_cutoff, roll_up
+from ..sequence_sketch import SEQUENCE_CODES
+from . import BehaviorTestCase
+
+
+class RollUpTests(BehaviorTestCase):
+    def setUp(self):
+        super().setUp()
+        self.players = SyntheticPlayers(3, seed=9)
+
+    def backdate(self, records, days=100):
+        GameRecord.objects.filter(pk__in=[record.pk for record in records]).update(
+            created_at=timezone.now() - timedelta(days=days)
+        )
+
+    def test_rebuilds_are_unchanged_by_roll_up(self):
+        self.record([self.players.game(i % 3) for i in range(30)])
+        old = list(GameRecord.objects.order_by('id')[:20])
+        self.backdate(old)
+        self.record([self.players.game(i % 3) for i in range(9)])
+
+        profiles = list(PlayerBehaviorProfile.objects.all())
+        before = {
+            profile.pk: (BehaviorAnalyzer._rebuild_markov_table(profile),
+                         BehaviorAnalyzer._rebuild_response_stats(profile))
+            for profile in profiles
+        }
+        rolled = roll_up(retention_cutoff(90), batch_size=7)
+        self.assertEqual(rolled['games'], 20)
+        self.assertEqual(GameRecord.objects.count(), 19)
+        self.assertEqual(sum(DailySummary.objects.values_list('games', flat=True)), 20)
+
+        for profile in profiles:
+            table, stats = before[profile.pk]
+            np.testing.assert_array_equal(BehaviorAnalyzer._rebuild_markov_table(profile), table)
+            rebuilt = BehaviorAnalyzer._rebuild_response_stats(profile)
+            self.assertEqual(rebuilt.count, stats.count)
+            self.assertAlmostEqual(rebuilt.mean, stats.mean)
+            self.assertAlmostEqual(rebuilt.m2, stats.m2, delta=1e-6 * max(stats.m2, 1))
+
+        self.assertEqual(roll_up(retention_cutoff(90)), {'games': 0, 'moves': 0, 'summaries': 0})
+
+    @override_settings(BEHAVIOR_STORE_MOVE_EVENTS=True)
+    def test_colliding_game_ids_only_roll_up_the_expired_game(self):
+        first, second = self.players.game(0, 'shared'), self.players.game(1, 'shared')
+        self.record([first, second])
+        expired_player, kept_player = (
+            PlayerBehaviorProfile.objects.get(player_name=game['playerName']) for game in (first, second)
+        )
+        self.backdate(GameRecord.objects.filter(player=expired_player))
+
+        roll_up(retention_cutoff(90))
+        self.assertFalse(GameRecord.objects.filter(player=expired_player).exists())
+        self.assertFalse(MoveEvent.objects.filter(player=expired_player).exists())
+        self.assertTrue(GameRecord.objects.filter(player=kept_player, game_id='shared').exists())
+        self.assertEqual(MoveEvent.objects.filter(player=kept_player).count(), len(second['moves']))
+
+    @override_settings(BEHAVIOR_STORE_MOVE_EVENTS=True)
+    def test_unpacked_events_roll_up_by_player_and_game(self):
+        first, second = self.players.game(0, 'legacy'), self.players.game(1, 'legacy')
+        self.record([first, second])
+        GameRecord.objects.all().delete()  # History stored before games were packed
+        expired_player = PlayerBehaviorProfile.objects.get(player_name=first['playerName'])
+        MoveEvent.objects.filter(player=expired_player).update(created_at=timezone.now() - timedelta(days=100))
+
+        rolled = roll_up(retention_cutoff(90))
+        self.assertEqual((rolled['games'], rolled['moves']), (1, len(first['moves'])))
+        self.assertFalse(MoveEvent.objects.filter(player=expired_player).exists())
+        self.assertEqual(MoveEvent.objects.count(), len(second['moves']))
+        summary = DailySummary.objects.get(player=expired_player)
+        self.assertEqual(summary.moves, len(first['moves']))
+
+    @override_settings(BEHAVIOR_SYMMETRY=True)
+    def test_reanalysis_reaches_players_with_only_summaries(self):
+        self.record([self.players.game(i % 3) for i in range(12)])
+        rolled_up = PlayerBehaviorProfile.objects.get(player_name=self.players.names[0])
+        self.backdate(GameRecord.objects.filter(player=rolled_up))
+        roll_up(retention_cutoff(90))
+        embedding = PlayerBehaviorProfile.objects.get(pk=rolled_up.pk).behavioral_embedding
+
+        self.assertEqual(reanalyze_all(), 3)
+        analysis = PatternAnalysis.objects.get(player=rolled_up)
+        self.assertTrue(analysis.markov_symmetric)
+        np.testing.assert_array_equal(analysis.get_markov_table(), BehaviorAnalyzer._rebuild_markov_table(rolled_up))
+        profile = PlayerBehaviorProfile.objects.get(pk=rolled_up.pk)
+        self.assertEqual(profile.get_sequence_counts().total, analysis.get_markov_table().reshape(-1)[SEQUENCE_CODES].sum())
+        self.assertEqual(profile.behavioral_embedding, embedding)
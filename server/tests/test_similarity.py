@@ -0,0 +1,34 @@
+import numpy as np
+from django.test import TestCase
+
+from ..similarity import EMBEDDING_SIZE, EmbeddingIndex
+
+
+class EmbeddingIndexTests(TestCase):
+    def setUp(self):
+        self.index = EmbeddingIndex(sync_interval=60)
+        self.index.ensure_fresh()  # Nothing stored: updates below are the whole index
+        rng = np.random.default_rng(13)
+        self.names = [f'player-{i}' for i in range(20)]
+        for name in self.names:
+            self.index.update(name, rng.standard_normal(EMBEDDING_SIZE).tolist())
+
+    def test_removed_players_do_not_take_top_k_slots(self):
+        query = np.eye(EMBEDDING_SIZE)[0]
+        self.index.update(self.names[0], query.tolist())
+        for name in self.names[1:15]:
+            self.index.update(name, [])
+        # Dissimilar survivors score below the zeroed rows of removed players
+        for i, name in enumerate(self.names[15:]):
+            self.index.update(name, (-query + 0.1 * np.eye(EMBEDDING_SIZE)[i % 5 + 1]).tolist())
+
+        similar = self.index.similar(self.names[0], k=5)
+        self.assertEqual({name for name, _ in similar}, set(self.names[15:]))
+
+    def test_results_are_sorted_and_exclude_the_player(self):
+        similar = self.index.similar(self.names[0], k=10)
+        scores = [score for _, score in similar]
+        self.assertEqual(len(similar), 10)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+        self.assertNotIn(self.names[0], [name for name, _ in similar])
+        self.assertIsNone(self.index.similar('nobody'))
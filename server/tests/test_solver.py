@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from .. import solver
+
+
+class SolverTests(SimpleTestCase):
+    def test_empty_board_is_a_draw(self):
+        evaluation = solver.evaluate([''] * 9)
+        self.assertEqual(evaluation.value, 0)
+        self.assertEqual(evaluation.best_moves, list(range(9)))
+        self.assertEqual(evaluation.distance, 9)
+
+    def test_o_to_move_wins_in_one(self):
+        board = ['X', 'X', '', 'O', 'O', '', 'X', '', '']
+        evaluation = solver.evaluate(board)
+        self.assertEqual(evaluation.value, 1)
+        self.assertEqual(evaluation.optimal_move, 5)
+        self.assertEqual(evaluation.distance, 1)
+
+    def test_o_opening_is_reachable(self):
+        evaluation = solver.evaluate(['', '', '', '', 'O', '', '', '', ''])
+        self.assertEqual(evaluation.value, 0)
+
+    def test_level_counts_need_side_to_move(self):
+        board = ['X', 'X', '', 'O', 'O', '', '', '', '']
+        with self.assertRaises(ValueError):
+            solver.evaluate(board)
+        self.assertEqual(solver.optimal_move(board, 'X'), 2)
+        self.assertEqual(solver.optimal_move(board, 'O'), 5)
+
+    def test_placed_move_names_the_mover(self):
+        self.assertTrue(solver.is_optimal(['X', 'X', 'X', 'O', 'O', '', '', '', ''], 2))
+        self.assertFalse(solver.is_optimal(['X', 'X', '', 'O', 'O', '', 'X', '', ''], 6))
+        self.assertIsNone(solver.is_optimal(['X', '', '', 'O', '', '', '', '', ''], 1))
+
+    def test_tables_are_symmetric_under_swapping_marks(self):
+        codes = np.arange(solver.POSITION_COUNT)
+        digits = codes[:, None] // np.array(solver.POWERS) % 3
+        swapped = ((3 - digits) % 3 * np.array(solver.POWERS)).sum(axis=1)
+        np.testing.assert_array_equal(solver.VALUES[0], solver.VALUES[1, swapped])
+        np.testing.assert_array_equal(solver.BEST_MOVES[0], solver.BEST_MOVES[1, swapped])
+        np.testing.assert_array_equal(solver.DISTANCES[0], solver.DISTANCES[1, swapped])
+
+    def test_evaluate_position_endpoint(self):
+        response = self.client.post(
+            '/api/behavior/evaluate-position',
+            json.dumps({'boardState': ['X', 'X', '', 'O', 'O', '', '', '', ''], 'toMove': 'O'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['optimalMove'], 5)
+
+        response = self.client.post(
+            '/api/behavior/evaluate-position',
+            json.dumps({'boardState': ['X', 'X', '', 'O', 'O', '', '', '', '']}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 400)
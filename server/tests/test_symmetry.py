@@ -0,0 +1,28 @@
+from django.test import override_settings
+
+from ..ai_models import PlayerBehaviorProfile
+from ..benchmarks import SyntheticPlayers
+from ..symmetry import SEQUENCE_ORBITS, sequence_space
+from . import BehaviorTestCase
+
+
+class ExploitabilityTests(BehaviorTestCase):
+    def record_uniform_player(self, games: int = 200) -> PlayerBehaviorProfile:
+        players = SyntheticPlayers(1, seed=11)
+        players.preferences[:] = 1 / 9  # No cell preferences at all
+        self.record([players.game(0) for _ in range(games)])
+        return PlayerBehaviorProfile.objects.get(player_name=players.names[0])
+
+    def test_sequence_space_follows_the_setting(self):
+        self.assertEqual(SEQUENCE_ORBITS, 66)
+        with self.settings(BEHAVIOR_SYMMETRY=False):
+            self.assertEqual(sequence_space(), 504)
+        with self.settings(BEHAVIOR_SYMMETRY=True):
+            self.assertEqual(sequence_space(), SEQUENCE_ORBITS)
+
+    def test_uniform_player_is_not_exploitable(self):
+        self.assertLess(self.record_uniform_player().exploitability_score, 15)
+
+    @override_settings(BEHAVIOR_SYMMETRY=True)
+    def test_uniform_player_is_not_exploitable_when_folded(self):
+        self.assertLess(self.record_uniform_player().exploitability_score, 15)
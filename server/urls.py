@@ -7,10 +7,17 @@ from .api import views
 
 urlpatterns = [
     path('api/behavior/record-game', views.record_game, name='record_game'),
+    path('api/behavior/record-games', views.record_games, name='record_games'),
     path('api/behavior/profile/<str:player_name>', views.get_profile, name='get_profile'),
     path('api/behavior/predict-move', views.predict_move, name='predict_move'),
+    path('api/behavior/predict-moves', views.predict_moves, name='predict_moves'),
+    path('api/behavior/evaluate-position', views.evaluate_position, name='evaluate_position'),
+    path('api/behavior/similar-players/<str:player_name>', views.similar_players, name='similar_players'),
     path('api/behavior/difficulty/<str:player_name>', views.get_difficulty, name='get_difficulty'),
+    path('api/behavior/difficulties', views.get_difficulties, name='get_difficulties'),
     path('api/behavior/check-anomalies', views.check_anomalies, name='check_anomalies'),
     path('api/behavior/leaderboard', views.leaderboard, name='leaderboard'),
+    path('api/behavior/leaderboard/rank/<str:player_name>', views.leaderboard_rank, name='leaderboard_rank'),
+    path('metrics', views.metrics, name='metrics'),
 ]
 